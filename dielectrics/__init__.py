@@ -1,12 +1,26 @@
-"""Top-level package: shared paths, the column-name Key enum and plotting defaults."""
+"""Top-level package: shared paths, the column-name Key enum and struct_hash.
 
+Deliberately free of plotting and database imports so headless jobs (hull distances,
+DB cleanup, ...) start fast. Plotting defaults live in dielectrics.plots and the Mongo
+client in dielectrics.db is only created on first access. Check import time with
+python -m dielectrics.import_time.
+"""
+
+from __future__ import annotations
+
+import hashlib
 import os
 from datetime import UTC, datetime
-from enum import unique
+from enum import StrEnum, unique
+from typing import TYPE_CHECKING
+
+import numpy as np
+
 
-import plotly.express as px
-import pymatviz as pmv
-from matplotlib import pyplot as plt
+if TYPE_CHECKING:
+    from typing import Self
+
+    from pymatgen.core import Structure
 
 
 PKG_DIR = os.path.dirname(__file__)
@@ -16,12 +30,42 @@ DATA_DIR = f"{ROOT}/data"
 SCRIPTS_DIR = f"{ROOT}/scripts"
 today = f"{datetime.now(tz=UTC):%Y-%m-%d}"
 
-pmv.set_plotly_template("pymatviz_white")
-plt.rcParams["figure.constrained_layout.use"] = True
+
+class LabelEnum(StrEnum):
+    """StrEnum with label and description attributes, same interface as
+    pymatviz.enums.LabelEnum but without importing pymatviz (and with it plotly).
+
+    Add label and optional description as a tuple starting with the key's value.
+    """
+
+    def __new__(cls, val: str, label: str, desc: str = "") -> Self:
+        """Create a member from a value, label and optional description."""
+        member = str.__new__(cls, val)
+        member._value_ = val
+        member.__dict__ |= dict(label=label, desc=desc)
+        return member
+
+    def __repr__(self) -> str:
+        """Return label if available, else type name and value."""
+        return self.label or f"{type(self).__name__}.{self.name}"
+
+    def __reduce_ex__(self, proto: object) -> tuple[type, tuple[str]]:
+        """Pickle as plain string so pickles don't depend on this class."""
+        return str, (self.value,)
+
+    @property
+    def label(self) -> str:
+        """Make label read-only."""
+        return self.__dict__["label"]
+
+    @property
+    def description(self) -> str:
+        """Make description read-only."""
+        return self.__dict__["desc"]
 
 
 @unique
-class Key(pmv.enums.LabelEnum):
+class Key(LabelEnum):
     """Dataframe column names."""
 
     bandgap = "bandgap", "Band gap"
@@ -114,47 +158,7 @@ class Key(pmv.enums.LabelEnum):
     wyckoff = "wyckoff", "Wyckoff position"
 
 
-ev_per_atom = pmv.utils.html_tag("(eV/atom)", tag="span", style="small")
-eV = pmv.utils.html_tag("(eV)", tag="span", style="small")  # noqa: N816
-
-px.defaults.labels |= {
-    Key.bandgap_hse: f"E<sub>gap HSE</sub> {eV}",
-    Key.bandgap_mp: f"E<sub>gap MP</sub> {eV}",
-    Key.bandgap_pbe: f"E<sub>gap PBE</sub> {eV}",
-    Key.bandgap_us: f"E<sub>gap us</sub> {eV}",
-    Key.bandgap_wren: f"E<sub>gap Wren</sub> {eV}",
-    Key.crystal_sys: "Crystal system",
-    Key.date: "Date",
-    Key.diel_elec_pbe: "ε<sub>elec</sub>",
-    Key.diel_elec_mp: "ε<sub>elec MP</sub>",
-    Key.diel_elec_wren: "ε<sub>elec Wren</sub>",
-    Key.diel_ionic_pbe: "ε<sub>ionic</sub>",
-    Key.diel_ionic_mp: "ε<sub>ionic MP</sub>",
-    Key.diel_ionic_wren: "ε<sub>ionic Wren</sub>",
-    Key.diel_total: "ε<sub>total</sub>",
-    Key.diel_total_mp: "ε<sub>total MP</sub>",
-    Key.diel_total_pbe: "ε<sub>total PBE</sub>",
-    Key.diel_total_us: "ε<sub>total us</sub>",
-    Key.diel_total_wren: "ε<sub>total Wren</sub>",
-    Key.e_above_hull_mp: f"E<sub>hull dist MP</sub> {ev_per_atom}",
-    Key.e_above_hull_pbe: f"E<sub>hull dist PBE</sub> {ev_per_atom}",
-    Key.e_above_hull_wren: f"E<sub>hull dist Wren</sub> {ev_per_atom}",
-    Key.e_per_atom: f"energy {ev_per_atom}",  # usually PBE energy
-    Key.fom: "Φ",
-    Key.fom_pbe: "Φ<sub>PBE</sub>",  # figure of merit from PBE band gap and eps_total
-    Key.fom_wren: "Φ<sub>Wren</sub>",
-    Key.fom_wren_std_adj: "Φ<sub>Wren - std</sub>",
-    Key.formula: "Formula",
-    Key.freq: "Frequency (Hz)",  # of electric field in exp. impedance/reflectance plots
-    Key.mat_id: "Material ID",
-    Key.spg: "Space group",
-    Key.structure: "Structure",
-    Key.symmetry: "Symmetry",
-    Key.selection_status: "Selection status",
-}
-
-
-class SelectionStatus(pmv.enums.LabelEnum):
+class SelectionStatus(LabelEnum):
     """Enum for synthesis selection status of candidate materials."""
 
     # according to literature mention
@@ -165,3 +169,16 @@ class SelectionStatus(pmv.enums.LabelEnum):
     weak_candidate = "weak candidate", "Weak candidate"
     # to be synthesized if time/resources allow
     selected_for_synthesis = "selected for synthesis", "Selected for synthesis"
+
+
+def struct_hash(struct: Structure, decimals: int = 5) -> str:
+    """Hash of a structure's lattice, species and (wrapped) fractional coordinates,
+    rounded to decimals to be stable against float noise from serialization. Used as
+    cache key for per-structure results (fingerprints, graphs, ...).
+    """
+    frac_coords = np.round(struct.frac_coords % 1, decimals) % 1
+    key = (
+        f"{np.round(struct.lattice.matrix, decimals).tolist()}"
+        f"{[site.species_string for site in struct]}{frac_coords.tolist()}"
+    )
+    return hashlib.sha256(key.encode()).hexdigest()[:16]
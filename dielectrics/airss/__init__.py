@@ -0,0 +1,305 @@
+"""Structure fingerprinting and dissimilarity helpers for comparing AIRSS outputs with
+each other and with our DFPT candidate structures.
+
+Fingerprints are persisted per featurizer setting in an on-disk store keyed by
+structure hash so each structure is only ever featurized once. A KD-tree over the
+fingerprints of all task DB structures answers nearest-neighbor queries like "which
+candidates are within 0.9 of this AIRSS structure" without recomputing anything.
+"""
+
+import functools
+import hashlib
+import os
+from collections.abc import Sequence
+from concurrent.futures import ProcessPoolExecutor
+from typing import Literal
+
+import numpy as np
+import pandas as pd
+from matminer.featurizers.site import CrystalNNFingerprint
+from matminer.featurizers.structure import SiteStatsFingerprint
+from numpy.typing import NDArray
+from pymatgen.core import Structure
+from scipy.spatial import cKDTree
+from scipy.spatial.distance import cdist, pdist, squareform
+from tqdm import tqdm
+
+from dielectrics import DATA_DIR, Key, struct_hash
+from dielectrics.db.fetch_data import load_task_docs
+
+
+default_fp_stats = ("mean", "std_dev", "minimum", "maximum")
+FP_STORE_DIR = f"{DATA_DIR}/.db_cache/site-stats-fingerprints"
+
+
+def fp_store_path(stats: Sequence[str], store_dir: str = FP_STORE_DIR) -> str:
+    """Path of the fingerprint store for one featurizer setting."""
+    settings_key = hashlib.sha256(f"ops-{tuple(stats)}".encode()).hexdigest()[:16]
+    return f"{store_dir}/site-stats-{settings_key}.npz"
+
+
+def load_fp_store(
+    stats: Sequence[str], store_dir: str = FP_STORE_DIR
+) -> dict[str, NDArray[np.float64]]:
+    """Map of structure hash to fingerprint for one featurizer setting."""
+    if not os.path.isfile(path := fp_store_path(stats, store_dir)):
+        return {}
+    with np.load(path) as npz:
+        return dict(zip(npz["hashes"].tolist(), npz["fingerprints"], strict=True))
+
+
+@functools.cache
+def get_site_stats_featurizer(stats: tuple[str, ...]) -> SiteStatsFingerprint:
+    """CrystalNN site fingerprint (ops preset) aggregated over sites by stats. Cached
+    so each worker process builds the featurizer only once.
+    """
+    cnn_fp = CrystalNNFingerprint.from_preset("ops")
+    return SiteStatsFingerprint(cnn_fp, stats=stats)
+
+
+def featurize_struct(
+    struct: Structure, stats: tuple[str, ...] = default_fp_stats
+) -> NDArray[np.float64]:
+    """Site stats fingerprint of a single structure."""
+    return np.array(get_site_stats_featurizer(stats).featurize(struct), dtype=float)
+
+
+def get_site_stats_fingerprints(
+    structures: Sequence[Structure],
+    *,
+    stats: Sequence[str] = default_fp_stats,
+    n_workers: int | None = None,
+    chunksize: int = 8,
+    cache: bool = True,
+    store_dir: str = FP_STORE_DIR,
+) -> NDArray[np.float64]:
+    """Compute site stats fingerprints for many structures in a process pool.
+
+    Args:
+        structures (Sequence[Structure]): Structures to featurize.
+        stats (Sequence[str], optional): Stats to aggregate site fingerprints with.
+            Defaults to ('mean', 'std_dev', 'minimum', 'maximum').
+        n_workers (int, optional): Number of worker processes. Defaults to
+            os.cpu_count(). 1 featurizes in the current process.
+        chunksize (int, optional): Structures sent to a worker at a time. Defaults
+            to 8.
+        cache (bool, optional): If True (default), read fingerprints of previously
+            seen structures from the store in store_dir and add new ones to it.
+        store_dir (str, optional): Fingerprint store directory. Defaults to
+            FP_STORE_DIR.
+
+    Returns:
+        np.ndarray: Fingerprints stacked into shape (n_structures, n_features).
+    """
+    stats = tuple(stats)
+    hashes = [struct_hash(struct) for struct in structures]
+    fp_store = load_fp_store(stats, store_dir) if cache else {}
+    # featurize each unique unseen structure once
+    todo = dict(zip(hashes, structures, strict=True))
+    todo = {hsh: struct for hsh, struct in todo.items() if hsh not in fp_store}
+
+    featurize = functools.partial(featurize_struct, stats=stats)
+    if n_workers == 1 or len(todo) < 2:
+        new_fps = list(map(featurize, todo.values()))
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            new_fps = list(executor.map(featurize, todo.values(), chunksize=chunksize))
+    fp_store |= dict(zip(todo, new_fps, strict=True))
+
+    if cache and todo:
+        os.makedirs(store_dir, exist_ok=True)
+        store_path = fp_store_path(stats, store_dir)
+        # write to temp file first so an interrupted run never leaves a corrupt store,
+        # via file handle since np.savez appends .npz to paths not ending in it
+        tmp_path = f"{store_path}.{os.getpid()}.tmp"
+        with open(tmp_path, mode="wb") as file:
+            np.savez(
+                file,
+                hashes=np.array(list(fp_store)),
+                fingerprints=np.array(list(fp_store.values()), dtype=float),
+            )
+        os.replace(tmp_path, store_path)
+
+    n_features = len(get_site_stats_featurizer(stats).feature_labels())
+    fingerprints = [fp_store[hsh] for hsh in hashes]
+    return np.array(fingerprints, dtype=float).reshape(len(structures), n_features)
+
+
+def get_pairwise_struct_distances(
+    df: pd.DataFrame,
+    structure_col: str = str(Key.structure),
+    fingerprint_col: str = "site_stats_fingerprint",
+    # show only half of symmetric matrix by default, set to False to show all
+    triangular: Literal["lower", "upper", False] = "lower",
+    stats: Sequence[str] = default_fp_stats,
+    *,
+    n_workers: int | None = None,
+) -> pd.DataFrame:
+    """Get pairwise distances between structures in a DataFrame.
+
+    SiteStatsFingerprint compares local coordination environments across sites in
+    different crystals to measure dissimilarity. Anything above 0.9 is said to be
+    different structure prototypes. The AIRSS structures are 1.66 - 1.75 from the WBM
+    structure with the much higher permittivity but more similar to each other (1.02).
+    https://docs.materialsproject.org/methodology/related-materials
+
+    Args:
+        df (pd.DataFrame): DataFrame with structures
+        structure_col (str, optional): Column name of structures.
+            Defaults to 'structure'.
+        fingerprint_col (str, optional): Column name of fingerprints.
+            Defaults to 'site_stats_fingerprint'.
+        triangular ('lower' | 'upper' | False, optional):
+            Show only half of symmetric matrix by default, set to False to show all.
+            Defaults to 'lower'.
+        stats (Sequence[str], optional): Stats to use in fingerprint. Defaults to
+            ('mean', 'std_dev', 'minimum', 'maximum').
+        n_workers (int, optional): Processes used to compute fingerprints. Defaults to
+            os.cpu_count().
+
+    Returns:
+        pd.DataFrame: df with pairwise distances.
+    """
+    fingerprints = get_site_stats_fingerprints(
+        df[structure_col].tolist(), stats=stats, n_workers=n_workers
+    )
+    df[fingerprint_col] = list(fingerprints)
+
+    dist_mat = squareform(pdist(fingerprints, metric="euclidean"))
+    if triangular == "lower":
+        dist_mat[np.triu_indices_from(dist_mat, k=1)] = np.nan
+    elif triangular == "upper":
+        dist_mat[np.tril_indices_from(dist_mat, k=-1)] = np.nan
+
+    return pd.DataFrame(dist_mat, index=df.index, columns=df.index)
+
+
+def get_struct_distances(
+    df_query: pd.DataFrame,
+    df_ref: pd.DataFrame,
+    structure_col: str = str(Key.structure),
+    *,
+    stats: Sequence[str] = default_fp_stats,
+    n_workers: int | None = None,
+) -> pd.DataFrame:
+    """Distances between every structure in df_query (e.g. AIRSS outputs) and every
+    structure in df_ref (e.g. our DFPT candidates) in a single cdist call.
+
+    Returns:
+        pd.DataFrame: Shape (len(df_query), len(df_ref)) with the indices of the
+            two input dataframes as index and columns.
+    """
+    fps_query, fps_ref = (
+        get_site_stats_fingerprints(
+            df[structure_col].tolist(), stats=stats, n_workers=n_workers
+        )
+        for df in (df_query, df_ref)
+    )
+    dist_mat = cdist(fps_query, fps_ref, metric="euclidean")
+    return pd.DataFrame(dist_mat, index=df_query.index, columns=df_ref.index)
+
+
+@functools.cache
+def load_task_db_fp_index(
+    stats: tuple[str, ...] = default_fp_stats,
+) -> tuple[cKDTree, pd.DataFrame]:
+    """KD-tree over the fingerprints of all structures in the published task data.
+
+    Args:
+        stats (tuple[str, ...], optional): Fingerprint stats. Defaults to
+            ('mean', 'std_dev', 'minimum', 'maximum').
+
+    Returns:
+        tuple[cKDTree, pd.DataFrame]: Tree and a dataframe with material ID and
+            reduced formula of each tree point (in tree order).
+    """
+    rows, structures, seen_ids = [], [], set()
+    for doc in tqdm(load_task_docs(), desc="Loading task DB structures"):
+        mat_id = doc.get(str(Key.mat_id))
+        struct_dict = (doc.get("output") or {}).get("structure")
+        if mat_id in seen_ids or not struct_dict:
+            continue
+        seen_ids.add(mat_id)
+        struct = Structure.from_dict(struct_dict)
+        structures.append(struct)
+        rows.append({Key.mat_id: mat_id, Key.formula: struct.reduced_formula})
+
+    fingerprints = get_site_stats_fingerprints(structures, stats=stats)
+    return cKDTree(np.nan_to_num(fingerprints)), pd.DataFrame(rows)
+
+
+def query_task_db_neighbors(
+    structures: pd.Series,
+    max_dist: float = 0.9,
+    *,
+    stats: Sequence[str] = default_fp_stats,
+) -> pd.DataFrame:
+    """Find all task DB structures within max_dist fingerprint distance of each query
+    structure. Anything below 0.9 is usually considered the same structure prototype.
+
+    Args:
+        structures (pd.Series): Query structures. Index is used to label results.
+        max_dist (float, optional): Max Euclidean fingerprint distance. Defaults to 0.9.
+        stats (Sequence[str], optional): Fingerprint stats. Defaults to
+            ('mean', 'std_dev', 'minimum', 'maximum').
+
+    Returns:
+        pd.DataFrame: One row per (query, neighbor) pair with columns query_id,
+            material_id, formula, same_formula and dist, sorted by query_id and dist.
+    """
+    tree, df_tree = load_task_db_fp_index(tuple(stats))
+    fps = np.nan_to_num(get_site_stats_fingerprints(list(structures), stats=stats))
+    tree_ids = df_tree[Key.mat_id].to_numpy()
+    tree_formulas = df_tree[Key.formula].to_numpy()
+
+    rows = []
+    for query_id, struct, fp, neighbors in zip(
+        structures.index,
+        structures,
+        fps,
+        tree.query_ball_point(fps, r=max_dist),
+        strict=True,
+    ):
+        formula = struct.reduced_formula
+        for idx in neighbors:
+            nb_formula = tree_formulas[idx]
+            dist = float(np.linalg.norm(fp - tree.data[idx]))
+            rows.append(
+                (query_id, tree_ids[idx], nb_formula, nb_formula == formula, dist)
+            )
+
+    cols = ["query_id", Key.mat_id, Key.formula, "same_formula", "dist"]
+    return pd.DataFrame(rows, columns=cols).sort_values(["query_id", "dist"])
+
+
+def find_task_db_duplicates(
+    structures: pd.Series,
+    max_dist: float = 0.1,
+    *,
+    stats: Sequence[str] = default_fp_stats,
+) -> pd.Series:
+    """Match structures (e.g. new AIRSS outputs) to already computed DFPT structures
+    with the same reduced formula and near-identical fingerprint. Fingerprints only
+    encode local coordination so the formula check is what distinguishes a duplicate
+    from an isostructural material with different elements.
+
+    Args:
+        structures (pd.Series): Structures to check.
+        max_dist (float, optional): Max fingerprint distance to count as duplicate.
+            Defaults to 0.1.
+        stats (Sequence[str], optional): Fingerprint stats. Defaults to
+            ('mean', 'std_dev', 'minimum', 'maximum').
+
+    Returns:
+        pd.Series: Same index as structures, material ID of the closest duplicate in
+            the task DB or None if the structure is new.
+    """
+    df_nbs = query_task_db_neighbors(structures, max_dist, stats=stats)
+    df_dupes = df_nbs.query("same_formula").drop_duplicates("query_id")
+    dupe_ids = df_dupes.set_index("query_id")[Key.mat_id]
+    return pd.Series(
+        [dupe_ids.get(idx) for idx in structures.index],
+        index=structures.index,
+        name="task_db_duplicate",
+        dtype=object,
+    )
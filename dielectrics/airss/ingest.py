@@ -0,0 +1,175 @@
+"""Parallel ingestion of AIRSS search results (good_castep/*.res files) into a
+deduplicated, energy-ranked table ready for workflow submission.
+
+AIRSS revisits the same minima many times so a search directory typically holds many
+copies of a few structures. Duplicates are clustered by (reduced formula, space group)
+first, then within each group by site stats fingerprint distance and energy. Only the
+lowest-energy member of each cluster is marked as unique.
+"""
+
+from collections.abc import Sequence
+from concurrent.futures import ProcessPoolExecutor
+from glob import glob
+from typing import Any
+
+import numpy as np
+import pandas as pd
+from pymatgen.core import Structure
+from pymatgen.io.res import AirssProvider
+from pymatgen.symmetry.analyzer import SpacegroupAnalyzer
+from scipy.spatial.distance import cdist
+
+from dielectrics import Key
+from dielectrics.airss import default_fp_stats, get_site_stats_fingerprints
+
+
+def parse_res_file(filepath: str, symprec: float = 0.1) -> dict[str, Any]:
+    """Parse one AIRSS .res file into a flat dict with structure, energy per atom and
+    space group number. Runs in worker processes of ingest_airss_res().
+    """
+    dct = AirssProvider.from_file(filepath).as_dict(verbose=False)
+    struct = dct[Key.structure]
+    if isinstance(struct, dict):
+        struct = Structure.from_dict(struct)
+    try:
+        spg_num = SpacegroupAnalyzer(struct, symprec=symprec).get_space_group_number()
+    except (TypeError, ValueError):  # spglib fails on some distorted cells
+        spg_num = 1
+    return dct | {
+        "filepath": filepath,
+        Key.structure: struct,
+        Key.formula: struct.reduced_formula,
+        Key.n_sites: len(struct),
+        Key.e_per_atom: dct["energy"] / len(struct),
+        "spg_num": spg_num,
+    }
+
+
+def cluster_duplicate_structs(
+    df_res: pd.DataFrame,
+    *,
+    max_fp_dist: float = 0.1,
+    max_mev_diff: float = 5,
+    stats: Sequence[str] = default_fp_stats,
+) -> pd.Series:
+    """Assign cluster IDs to AIRSS results such that structures with equal reduced
+    formula and space group, fingerprint distance below max_fp_dist and energy
+    difference below max_mev_diff (meV/atom) share a cluster.
+
+    Clustering is greedy in order of increasing energy, so each cluster's first member
+    is its lowest-energy structure. Fingerprints are only computed for structures
+    that share formula and space group with at least one other structure.
+
+    Returns:
+        pd.Series: Integer cluster IDs, same index as df_res.
+    """
+    cluster_ids = pd.Series(-1, index=df_res.index, name="cluster_id")
+    df_sorted = df_res.sort_values(Key.e_per_atom)
+    group_keys = [Key.formula, "spg_num"]
+    is_multi = df_sorted.duplicated(group_keys, keep=False)
+
+    fps = pd.Series(dtype=object)
+    if is_multi.any():
+        multi_structs = df_sorted[Key.structure][is_multi]
+        fp_arr = get_site_stats_fingerprints(multi_structs.tolist(), stats=stats)
+        fps = pd.Series(list(np.nan_to_num(fp_arr)), index=multi_structs.index)
+
+    next_id = 0
+    for _, df_group in df_sorted.groupby(group_keys, sort=False):
+        if len(df_group) == 1:
+            cluster_ids[df_group.index[0]] = next_id
+            next_id += 1
+            continue
+        group_fps = np.stack(fps[df_group.index].to_numpy())
+        fp_dists = cdist(group_fps, group_fps)
+        energies = 1e3 * df_group[Key.e_per_atom].to_numpy()
+        rep_idx: list[int] = []  # positions of cluster representatives in df_group
+        rep_ids: list[int] = []
+        for pos, idx in enumerate(df_group.index):
+            for rep_pos, rep_id in zip(rep_idx, rep_ids, strict=True):
+                e_diff = abs(energies[pos] - energies[rep_pos])
+                if fp_dists[pos, rep_pos] < max_fp_dist and e_diff < max_mev_diff:
+                    cluster_ids[idx] = rep_id
+                    break
+            else:
+                cluster_ids[idx] = next_id
+                rep_idx.append(pos)
+                rep_ids.append(next_id)
+                next_id += 1
+
+    return cluster_ids
+
+
+def ingest_airss_res(
+    res_files: str | Sequence[str],
+    *,
+    max_mev_above_lowest: float | None = None,
+    symprec: float = 0.1,
+    max_fp_dist: float = 0.1,
+    max_mev_diff: float = 5,
+    n_workers: int | None = None,
+    chunksize: int = 64,
+) -> pd.DataFrame:
+    """Parse AIRSS .res files in a process pool, rank them by energy per atom and mark
+    duplicates.
+
+    Args:
+        res_files (str | Sequence[str]): Glob pattern or list of .res file paths.
+        max_mev_above_lowest (float, optional): Drop structures more than this many
+            meV/atom above the lowest-energy one before clustering. Defaults to None
+            (keep all).
+        symprec (float, optional): Symmetry tolerance for space group detection.
+            Defaults to 0.1.
+        max_fp_dist (float, optional): Max fingerprint distance between duplicates.
+            Defaults to 0.1.
+        max_mev_diff (float, optional): Max energy difference between duplicates in
+            meV/atom. Defaults to 5.
+        n_workers (int, optional): Number of parser processes. Defaults to
+            os.cpu_count().
+        chunksize (int, optional): Files sent to a worker at a time. Defaults to 64.
+
+    Returns:
+        pd.DataFrame: Indexed by AIRSS seed, sorted by energy with columns from
+            AirssProvider.as_dict() plus filepath, structure, formula, n_sites,
+            e_per_atom, mev_above_lowest, spg_num, cluster_id, n_duplicates (cluster
+            size) and is_unique (True for the lowest-energy member of each cluster).
+    """
+    if isinstance(res_files, str):
+        res_files = sorted(glob(res_files))
+    if len(res_files) == 0:
+        raise FileNotFoundError("no AIRSS .res files to ingest")
+
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        symprecs = [symprec] * len(res_files)
+        rows = list(
+            executor.map(parse_res_file, res_files, symprecs, chunksize=chunksize)
+        )
+
+    df_res = pd.DataFrame(rows).set_index("seed").sort_values(Key.e_per_atom)
+    df_res["mev_above_lowest"] = 1e3 * (
+        df_res[Key.e_per_atom] - df_res[Key.e_per_atom].min()
+    )
+    if max_mev_above_lowest is not None:
+        df_res = df_res.query(f"mev_above_lowest <= {max_mev_above_lowest}")
+
+    df_res["cluster_id"] = cluster_duplicate_structs(
+        df_res, max_fp_dist=max_fp_dist, max_mev_diff=max_mev_diff
+    )
+    df_res["n_duplicates"] = df_res.groupby("cluster_id")["cluster_id"].transform(
+        "size"
+    )
+    # df_res is sorted by energy so the first of each cluster is its lowest member
+    df_res["is_unique"] = ~df_res["cluster_id"].duplicated()
+
+    n_unique = df_res.is_unique.sum()
+    print(f"Ingested {len(df_res):,} AIRSS structures, {n_unique:,} unique")
+    return df_res
+
+
+def select_unique_low_energy(
+    df_res: pd.DataFrame, n_structs: int = 3, max_mev_above_lowest: float = 50
+) -> pd.DataFrame:
+    """Lowest-energy unique structures from ingest_airss_res() for submission."""
+    df_unique = df_res[df_res.is_unique]
+    df_unique = df_unique.query(f"mev_above_lowest <= {max_mev_above_lowest}")
+    return df_unique.nsmallest(n_structs, Key.e_per_atom)
@@ -1,21 +1,15 @@
 # %%
-import itertools
-from collections.abc import Sequence
 from glob import glob
-from typing import Literal
 
-import numpy as np
 import pandas as pd
-import pymatviz as pmv
-from matminer.featurizers.site import CrystalNNFingerprint
-from matminer.featurizers.structure import SiteStatsFingerprint
-from pymatgen.core import Structure
 from pymatgen.ext.matproj import MPRester
-from pymatgen.io.res import AirssProvider
 from robocrys import StructureCondenser, StructureDescriber
 
 from dielectrics import DATA_DIR, Key, today
+from dielectrics.airss import get_pairwise_struct_distances, query_task_db_neighbors
+from dielectrics.airss.ingest import ingest_airss_res
 from dielectrics.db.fetch_data import df_diel_from_task_coll
+from dielectrics.plots import pmv  # side-effect import sets plotly template and plt.rc
 
 
 __author__ = "Janosh Riebesell"
@@ -26,70 +20,16 @@ res_files = glob(f"{DATA_DIR}/airss/{formula}/good_castep/*.res")
 castep_files = glob(f"{DATA_DIR}/airss/{formula}/good_castep/*.castep")
 
 
-# %% 2022-06-30
-def get_pairwise_struct_distances(
-    df: pd.DataFrame,
-    structure_col: str = str(Key.structure),
-    fingerprint_col: str = "site_stats_fingerprint",
-    # show only half of symmetric matrix by default, set to False to show all
-    triangular: Literal["lower", "upper", False] = "lower",
-    stats: Sequence[str] = ("mean", "std_dev", "minimum", "maximum"),
-) -> pd.DataFrame:
-    """Get pairwise distances between structures in a DataFrame.
-
-    SiteStatsFingerprint compares local coordination environments across sites in
-    different crystals to measure dissimilarity. Anything above 0.9 is said to be
-    different structure prototypes. The AIRSS structures are 1.66 - 1.75 from the WBM
-    structure with the much higher permittivity but more similar to each other (1.02).
-    https://docs.materialsproject.org/methodology/related-materials
-
-    Args:
-        df (pd.DataFrame): DataFrame with structures
-        structure_col (str, optional): Column name of structures.
-            Defaults to 'structure'.
-        fingerprint_col (str, optional): Column name of fingerprints.
-            Defaults to 'site_stats_fingerprint'.
-        triangular ('lower' | 'upper' | False, optional):
-            Show only half of symmetric matrix by default, set to False to show all.
-            Defaults to 'lower'.
-        stats (Sequence[str], optional): Stats to use in fingerprint. Defaults to
-            ('mean', 'std_dev', 'minimum', 'maximum').
-
-    Returns:
-        pd.DataFrame: df with pairwise distances.
-    """
-    cnn_fp = CrystalNNFingerprint.from_preset("ops")
-    site_stats_fp = SiteStatsFingerprint(cnn_fp, stats=stats)
-
-    df[fingerprint_col] = df[structure_col].map(site_stats_fp.featurize).map(np.array)
-
-    df_out = pd.DataFrame(index=df.index, columns=df.index, dtype=float)
-
-    for (idx1, fp1), (idx2, fp2) in itertools.combinations_with_replacement(
-        df[fingerprint_col].items(), 2
-    ):
-        if triangular in ("lower", False):
-            df_out.loc[idx2, idx1] = np.linalg.norm(fp1 - fp2)
-        if triangular in ("upper", False):
-            df_out.loc[idx1, idx2] = np.linalg.norm(fp1 - fp2)
-
-    return df_out
-
-
 # %%
-df_res = pd.DataFrame(
-    [AirssProvider.from_file(file).as_dict(verbose=False) for file in res_files]
-).set_index("seed")
+df_res = ingest_airss_res(res_files)
+# n_duplicates counts repeat hits of the same minimum, is_unique marks lowest of each
+df_res.query("is_unique")[[Key.formula, "spg_num", "mev_above_lowest", "n_duplicates"]]
 
-df_res[Key.structure] = df_res[Key.structure].map(Structure.from_dict)
-df_res[Key.n_sites] = df_res[Key.structure].map(len)
 
-df_res[Key.e_per_atom] = df_res.energy / df_res[Key.n_sites]
-df_res = df_res.sort_values(by=Key.e_per_atom)
-
-df_res["mev_above_lowest"] = 1e3 * (
-    df_res[Key.e_per_atom] - df_res[Key.e_per_atom].min()
-)
+# %% which of our DFPT candidates share a structure prototype (fingerprint distance
+# < 0.9) with the AIRSS results, fingerprints are cached so reruns are instant
+df_res_neighbors = query_task_db_neighbors(df_res[Key.structure], max_dist=0.9)
+df_res_neighbors.groupby("query_id").head(3)
 
 
 # %% 2022-06-24
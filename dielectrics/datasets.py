@@ -0,0 +1,243 @@
+"""Columnar dataset I/O: zstd-compressed Parquet with packed crystal structures.
+
+The MP training/screening sets and enrichment splits used to be written with
+to_json(default_handler=as_dict) and read back with pd.read_json, so every script paid
+for bz2 decompression plus JSON parsing of all columns incl. every structure. Here,
+Structure columns are packed into three Arrow columns (row-major lattice matrix, atomic
+numbers, flattened fractional coords) and everything is stored as Parquet, so
+read_dataset(name, columns=...) decodes only the requested columns.
+
+Packing keeps lattice, species and coords of ordered structures. Site properties and
+oxidation states are dropped, structure columns that can't be packed (e.g. disordered
+sites) are stored as JSON strings instead.
+"""
+
+import json
+import os
+from collections.abc import Sequence
+from typing import Any
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from pymatgen.core import Lattice, Structure
+
+from dielectrics import DATA_DIR
+
+
+packed_struct_keys = ("lattice", "atomic_nums", "frac_coords")
+# Parquet schema metadata keys listing columns that need decoding on read
+struct_cols_key, json_cols_key = b"dielectrics.struct_cols", b"dielectrics.json_cols"
+
+
+def dataset_path(name: str) -> str:
+    """Parquet path of a dataset given by name relative to DATA_DIR without extension
+    (e.g. 'mp-exploration/mp-diel-train') or an explicit .parquet path.
+    """
+    if name.endswith(".parquet"):
+        return name
+    return f"{DATA_DIR}/{name}.parquet"
+
+
+def packed_struct_fields(col: str) -> list[pa.Field]:
+    """Arrow fields holding the packed structures of column col."""
+    return [
+        pa.field(f"{col}.lattice", pa.list_(pa.float64(), 9)),
+        pa.field(f"{col}.atomic_nums", pa.list_(pa.int16())),
+        pa.field(f"{col}.frac_coords", pa.list_(pa.float64())),
+    ]
+
+
+def pack_structures(structures: Sequence[Structure | None]) -> list[list[Any]]:
+    """Pack structures into lattice, atomic number and frac coord lists (None stays
+    None in all three).
+
+    Raises:
+        AttributeError: If a structure has disordered sites.
+    """
+    lattices, atomic_nums, frac_coords = [], [], []
+    for struct in structures:
+        if struct is None:
+            lattices.append(None)
+            atomic_nums.append(None)
+            frac_coords.append(None)
+            continue
+        lattices.append(struct.lattice.matrix.ravel())
+        atomic_nums.append(struct.atomic_numbers)
+        frac_coords.append(struct.frac_coords.ravel())
+    return [lattices, atomic_nums, frac_coords]
+
+
+def unpack_structures(df: pd.DataFrame, col: str) -> list[Structure | None]:
+    """Rebuild Structures from (and pop) the packed columns of col in df."""
+    packed = [df.pop(f"{col}.{key}") for key in packed_struct_keys]
+    return [
+        None
+        if lattice is None
+        else Structure(
+            Lattice(np.reshape(lattice, (3, 3))),
+            atomic_nums.tolist(),
+            np.reshape(frac_coords, (-1, 3)),
+        )
+        for lattice, atomic_nums, frac_coords in zip(*packed, strict=True)
+    ]
+
+
+def _is_struct_col(series: pd.Series) -> bool:
+    first = series.dropna().iloc[:1]
+    if first.empty:
+        return False
+    val = first.iloc[0]
+    return isinstance(val, Structure) or (
+        isinstance(val, dict) and val.get("@class") == "Structure"
+    )
+
+
+def write_dataset(df: pd.DataFrame, name: str) -> str:
+    """Write a DataFrame to zstd-compressed Parquet, packing Structure columns.
+
+    Args:
+        df (pd.DataFrame): Dataset. Structure columns may hold Structure objects or
+            their as_dict() dicts (as returned by pd.read_json).
+        name (str): Dataset name relative to DATA_DIR or .parquet path.
+
+    Returns:
+        str: Path of the written Parquet file.
+    """
+    df_out = df.copy()
+    struct_cols, json_cols = [], []
+    for col in df.select_dtypes(include="object"):
+        if _is_struct_col(df[col]):
+            structs = [
+                Structure.from_dict(val) if isinstance(val, dict) else val
+                for val in df[col]
+            ]
+            try:
+                packed = pack_structures(structs)
+            except AttributeError:  # disordered structures can't be packed
+                df_out[col] = [json.dumps(s and s.as_dict()) for s in structs]
+                json_cols.append(col)
+                continue
+            for key, vals in zip(packed_struct_keys, packed, strict=True):
+                df_out[f"{col}.{key}"] = vals
+            df_out = df_out.drop(columns=col)
+            struct_cols.append(col)
+        else:
+            try:
+                pa.array(df[col])
+            except (pa.ArrowInvalid, pa.ArrowTypeError):  # e.g. mixed-type dicts
+                df_out[col] = [json.dumps(val, default=str) for val in df[col]]
+                json_cols.append(col)
+
+    schema = pa.Schema.from_pandas(df_out)
+    for col in struct_cols:
+        for field in packed_struct_fields(col):
+            schema = schema.set(schema.get_field_index(field.name), field)
+    schema = schema.with_metadata(
+        (schema.metadata or {})
+        | {
+            struct_cols_key: json.dumps(struct_cols),
+            json_cols_key: json.dumps(json_cols),
+        }
+    )
+    table = pa.Table.from_pandas(df_out, schema=schema)
+
+    path = dataset_path(name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    pq.write_table(table, path, compression="zstd")
+    return path
+
+
+def convert_json_dataset(json_path: str, name: str | None = None) -> str:
+    """Convert a legacy to_json(default_handler=as_dict) dataset to Parquet.
+
+    Args:
+        json_path (str): Path to .json(.bz2|.gz) file.
+        name (str, optional): Output dataset name. Defaults to json_path relative to
+            DATA_DIR without the .json* extension.
+
+    Returns:
+        str: Path of the written Parquet file.
+    """
+    if name is None:
+        rel_path = os.path.relpath(json_path, DATA_DIR)
+        name = rel_path.split(".json")[0]
+    return write_dataset(pd.read_json(json_path), name)
+
+
+def dataset_exists(name: str) -> bool:
+    """Whether a dataset exists as Parquet or legacy .json.bz2."""
+    path = dataset_path(name)
+    return os.path.isfile(path) or os.path.isfile(
+        f"{path.removesuffix('.parquet')}.json.bz2"
+    )
+
+
+def read_dataset(
+    name: str,
+    columns: Sequence[str] | None = None,
+    *,
+    exclude: Sequence[str] = (),
+) -> pd.DataFrame:
+    """Read a dataset, converting its legacy .json.bz2 version on first use.
+
+    Args:
+        name (str): Dataset name relative to DATA_DIR (e.g.
+            'mp-exploration/mp-diel-train') or .parquet path.
+        columns (Sequence[str], optional): Columns to load. Structure columns are
+            requested by their original name. Defaults to None (all columns).
+        exclude (Sequence[str], optional): Columns to skip, e.g. ['structure'] to
+            load everything except structures. Defaults to ().
+
+    Returns:
+        pd.DataFrame: Dataset with Structure columns unpacked into Structure objects.
+    """
+    path = dataset_path(name)
+    json_path = f"{path.removesuffix('.parquet')}.json.bz2"
+    if not os.path.isfile(path) and os.path.isfile(json_path):
+        print(f"Converting {json_path} to {path}")
+        convert_json_dataset(json_path, path)
+
+    schema = pq.read_schema(path)
+    metadata = schema.metadata or {}
+    struct_cols = json.loads(metadata.get(struct_cols_key, b"[]"))
+    json_cols = json.loads(metadata.get(json_cols_key, b"[]"))
+
+    if exclude:
+        # index columns are added by read_pandas, packed columns by struct name below
+        pandas_meta = json.loads(metadata.get(b"pandas", b"{}"))
+        index_cols = pandas_meta.get("index_columns", [])
+        # RangeIndex is stored as a dict in metadata rather than as a column
+        skip_cols = {*exclude, *(col for col in index_cols if isinstance(col, str))}
+        packed_cols = {
+            f"{col}.{key}" for col in struct_cols for key in packed_struct_keys
+        }
+        all_cols = [col for col in schema.names if col not in packed_cols]
+        columns = [
+            col
+            for col in [*all_cols, *struct_cols]
+            if col not in skip_cols and (columns is None or col in columns)
+        ]
+
+    read_cols = None
+    if columns is not None:
+        read_cols = []
+        for col in columns:
+            if col in struct_cols:
+                read_cols += [f"{col}.{key}" for key in packed_struct_keys]
+            else:
+                read_cols += [str(col)]
+
+    df_data = pq.read_pandas(path, columns=read_cols).to_pandas()
+    for col in struct_cols:
+        if f"{col}.lattice" in df_data:
+            df_data[col] = unpack_structures(df_data, col)
+    for col in json_cols:
+        if col in df_data:
+            df_data[col] = df_data[col].map(json.loads)
+            if _is_struct_col(df_data[col]):  # unpackable (e.g. disordered) structures
+                df_data[col] = df_data[col].map(
+                    lambda dct: dct and Structure.from_dict(dct)
+                )
+    return df_data
@@ -1,5 +1,6 @@
 """MongoDB access and (de)serialization helpers for the dielectrics task collection."""
 
+import functools
 import os
 import re
 from collections.abc import Sequence
@@ -18,9 +19,22 @@ from dielectrics import Key
 # export MONGO_SRV=mongodb+srv://<user>:<password>@<cluster-host>/<db>
 # Only needed to (re)generate data or run the discovery pipeline; analysis reads the
 # published task dataset (fetch_data.df_diel_from_task_coll), so MONGO_SRV may be unset.
-# pymongo connects lazily, so importing this module never reaches the DB on its own.
+# The client is only created on first access of db (see __getattr__), so importing
+# this module for its helpers neither builds a MongoClient nor reaches the DB.
 MONGO_SRV = os.getenv("MONGO_SRV")
-db = MongoClient(MONGO_SRV).dielectrics
+
+
+@functools.cache
+def get_db() -> Database:
+    """The dielectrics database, with the MongoClient created on first call."""
+    return MongoClient(MONGO_SRV).dielectrics
+
+
+def __getattr__(name: str) -> Any:
+    """Create the Mongo client lazily on first use of dielectrics.db.db."""
+    if name == "db":
+        return get_db()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 md_field_map = {"fireworks": "spec.", "workflows": "metadata.", "tasks": ""}
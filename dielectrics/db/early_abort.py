@@ -0,0 +1,350 @@
+"""Flag and defuse DFPT workflows that are doomed before they burn more compute.
+
+Two kinds of doomed runs are detected:
+
+1. Diverging calculations: the tails of vasp.out and std_err.txt that add_trackers
+   stores in each RUNNING launch doc (refreshed on every FireWorks ping) are parsed
+   for ionic energies rising away from their minimum, too many ionic steps, SCF cycles
+   hitting the electronic step limit and fatal errors custodian can't correct.
+2. Hopeless candidates: once the relaxation finished, its PBE band gap times an
+   optimistic dielectric constant (Wren prediction + n_std * std) bounds the FoM the
+   expensive DFPT step can reach. If that is below min_fom, there's no point in
+   running it. Before the relaxation finished, the Wren band gap is used instead.
+
+The parsers work on plain text, so assess_launch_dir() checks recorded launch
+directories offline with the same rules scan_running_launches() applies to live
+launches. defuse_doomed_wfs() defuses the remaining Fireworks of flagged workflows and
+optionally writes a STOPCAR to abort VASP in running launch dirs (only works on the
+filesystem the calcs run on, like dielectrics.fireworks).
+"""
+
+import gzip
+import os
+import re
+from collections.abc import Sequence
+from typing import Any
+
+import numpy as np
+import pandas as pd
+import yaml
+from fireworks import LaunchPad
+from pymongo.database import Database
+
+from dielectrics import ROOT, Key
+from dielectrics.db import get_db
+
+
+# lines of vasp.out and std_err.txt tails add_trackers stores in launch docs (see
+# dielectrics.db.workflows.build_dielectric_wf). Each ionic step of a struggling
+# relaxation prints 20-40 lines (SCF steps plus line search output), so the default
+# n_rising=5 of check_vasp_out needs the last 6 ionic steps, i.e. up to ~250 lines
+tracked_tail_lines = 500
+# ionic step summary lines in vasp.out, e.g. '  12 F= -.84E+02 E0= -.84E+02  d E =...'
+ionic_step_re = re.compile(r"^\s*(\d+) F=\s*([-+.\dEe]+)", re.MULTILINE)
+# electronic step lines, e.g. 'DAV:  17    -0.849E+02   -0.31E-05 ...'
+scf_step_re = re.compile(r"^(?:DAV|RMM|CG|SDA):\s*(\d+)", re.MULTILINE)
+# errors custodian can't correct, so the run will fizzle anyway
+fatal_error_patterns = {
+    "segfault": r"segmentation fault|SIGSEGV",
+    "out of memory": r"out of memory|oom-kill|cannot allocate memory",
+    "fortran runtime error": r"forrtl: severe",
+    "bus error": r"bus error|SIGBUS",
+}
+
+
+def parse_vasp_out(text: str) -> dict[str, Any]:
+    """Ionic step numbers and free energies plus the number of SCF steps of the
+    current ionic step from (the tail of) a vasp.out file.
+
+    Args:
+        text (str): vasp.out content. Partial tails are fine.
+
+    Returns:
+        dict[str, Any]: ionic_steps (list[int]) and energies (np.ndarray in eV) of
+            the current VASP run and n_scf_current (int).
+    """
+    ionic = ionic_step_re.findall(text)
+    ionic_steps = [int(step) for step, _ in ionic]
+    energies = np.array([float(energy) for _, energy in ionic])
+    # custodian's double relaxation restarts the step count, energies of the first
+    # relaxation (half the k-points) aren't comparable to the second
+    restarts = [
+        idx
+        for idx in range(1, len(ionic_steps))
+        if ionic_steps[idx] <= ionic_steps[idx - 1]
+    ]
+    if restarts:
+        ionic_steps, energies = ionic_steps[restarts[-1] :], energies[restarts[-1] :]
+
+    last_ionic = list(ionic_step_re.finditer(text))
+    scf_tail = text[last_ionic[-1].end() :] if last_ionic else text
+    scf_steps = [int(step) for step in scf_step_re.findall(scf_tail)]
+
+    return {
+        "ionic_steps": ionic_steps,
+        "energies": energies,
+        "n_scf_current": max(scf_steps, default=0),
+    }
+
+
+def check_vasp_out(
+    text: str,
+    *,
+    max_ionic_steps: int = 150,
+    max_scf_steps: int = 100,
+    energy_rise_tol: float = 1.0,
+    n_rising: int = 5,
+) -> list[str]:
+    """Reasons a run looks like it diverges, judging by its vasp.out.
+
+    Args:
+        text (str): vasp.out content.
+        max_ionic_steps (int, optional): Flag runs beyond this many ionic steps.
+            Defaults to 150.
+        max_scf_steps (int, optional): Flag if the current ionic step needed this
+            many SCF steps without converging. Defaults to 100.
+        energy_rise_tol (float, optional): Flag if the latest free energy is this many
+            eV above the lowest seen. Defaults to 1.
+        n_rising (int, optional): Flag if the energy rose in each of the last n_rising
+            ionic steps. Needs n_rising + 1 ionic steps in text, see
+            tracked_tail_lines. Defaults to 5.
+
+    Returns:
+        list[str]: Reasons, empty if nothing looks off.
+    """
+    parsed = parse_vasp_out(text)
+    reasons = []
+    steps, energies = parsed["ionic_steps"], parsed["energies"]
+
+    if steps and steps[-1] > max_ionic_steps:
+        reasons.append(f"{steps[-1]} ionic steps > {max_ionic_steps}")
+    if parsed["n_scf_current"] >= max_scf_steps:
+        reasons.append(f"SCF not converged after {parsed['n_scf_current']} steps")
+    if len(energies) > 1 and (rise := energies[-1] - energies.min()) > energy_rise_tol:
+        reasons.append(f"energy rose {rise:.2f} eV above its minimum")
+    if len(energies) > n_rising and (np.diff(energies[-n_rising - 1 :]) > 0).all():
+        reasons.append(f"energy rose in each of the last {n_rising} ionic steps")
+    return reasons
+
+
+def check_std_err(text: str) -> list[str]:
+    """Fatal errors in (the tail of) std_err.txt."""
+    return [
+        f"std_err: {name}"
+        for name, pattern in fatal_error_patterns.items()
+        if re.search(pattern, text, flags=re.IGNORECASE)
+    ]
+
+
+def assess_tracked_files(files: dict[str, str], **kwargs: Any) -> list[str]:
+    """Apply check_vasp_out and check_std_err to a map of file name to content.
+
+    Args:
+        files (dict[str, str]): e.g. {"vasp.out": ..., "std_err.txt": ...}.
+        **kwargs: Thresholds passed to check_vasp_out.
+
+    Returns:
+        list[str]: Reasons the run looks doomed, empty if none.
+    """
+    reasons = []
+    if vasp_out := files.get("vasp.out"):
+        reasons += check_vasp_out(vasp_out, **kwargs)
+    if std_err := files.get("std_err.txt"):
+        reasons += check_std_err(std_err)
+    return reasons
+
+
+def assess_launch_dir(launch_dir: str, **kwargs: Any) -> list[str]:
+    """Check the (possibly gzipped) vasp.out and std_err.txt in a launch directory,
+    e.g. recorded output of a past run.
+
+    Args:
+        launch_dir (str): Directory containing vasp.out and/or std_err.txt.
+        **kwargs: Thresholds passed to check_vasp_out.
+
+    Returns:
+        list[str]: Reasons the run looks doomed, empty if none.
+    """
+    files = {}
+    for filename in ("vasp.out", "std_err.txt"):
+        for path, opener in ((filename, open), (f"{filename}.gz", gzip.open)):
+            if os.path.isfile(full_path := f"{launch_dir}/{path}"):
+                with opener(full_path, mode="rt", errors="replace") as file:
+                    files[filename] = file.read()
+                break
+    return assess_tracked_files(files, **kwargs)
+
+
+def scan_running_launches(db: Database, **kwargs: Any) -> pd.DataFrame:
+    """Check the tracked vasp.out and std_err.txt tails of all RUNNING launches.
+
+    Args:
+        db (Database): The dielectrics database.
+        **kwargs: Thresholds passed to check_vasp_out.
+
+    Returns:
+        pd.DataFrame: fw_id, launch_dir and reasons of flagged launches, indexed by
+            launch_id.
+    """
+    launches = db.launches.find(
+        {"state": "RUNNING"}, ["launch_id", "fw_id", "launch_dir", "trackers"]
+    )
+    rows = []
+    for launch in launches:
+        files = {
+            os.path.basename(tracker["filename"]): tracker.get("content") or ""
+            for tracker in launch.get("trackers") or []
+        }
+        if reasons := assess_tracked_files(files, **kwargs):
+            rows.append(
+                {
+                    "launch_id": launch["launch_id"],
+                    "fw_id": launch["fw_id"],
+                    "launch_dir": launch.get("launch_dir"),
+                    "reasons": reasons,
+                }
+            )
+    df_flagged = pd.DataFrame(
+        rows, columns=["launch_id", "fw_id", "launch_dir", "reasons"]
+    )
+    print(f"{len(df_flagged)} running launches look doomed")
+    return df_flagged.set_index("launch_id")
+
+
+def fom_upper_bound(
+    bandgap: pd.Series, diel_total: pd.Series, diel_total_std: pd.Series, n_std: float
+) -> pd.Series:
+    """Optimistic FoM: band gap times dielectric constant n_std stds above its
+    prediction. Missing stds count as 0.
+    """
+    return bandgap.clip(lower=0) * (diel_total + n_std * diel_total_std.fillna(0))
+
+
+def find_hopeless_dfpt_fws(
+    db: Database, min_fom: float = 150, n_std: float = 2
+) -> pd.DataFrame:
+    """Not yet started 'static dielectric' Fireworks that can't reach min_fom even
+    with an optimistic dielectric constant.
+
+    Args:
+        db (Database): The dielectrics database.
+        min_fom (float, optional): FoM below which a result isn't worth the DFPT
+            calc. Defaults to 150.
+        n_std (float, optional): Stds added to the predicted dielectric constant.
+            Defaults to 2.
+
+    Returns:
+        pd.DataFrame: fw_id, bandgap (PBE from the relaxation if available, else
+            Wren), bandgap_source and fom_bound of hopeless Fireworks, indexed by
+            material ID.
+    """
+    fields = [Key.bandgap_wren, Key.diel_total_wren, "diel_total_wren_std"]
+    fws = db.fireworks.find(
+        {
+            "name": {"$regex": "static dielectric"},
+            "state": {"$in": ["WAITING", "READY"]},
+        },
+        ["fw_id", *(f"spec.{key}" for key in (Key.mat_id, *fields))],
+    )
+    df_fws = pd.DataFrame(
+        [{"fw_id": fw["fw_id"]} | fw.get("spec", {}) for fw in fws],
+        columns=["fw_id", Key.mat_id, *fields],
+    ).dropna(subset=[Key.mat_id, Key.diel_total_wren])
+    df_fws = df_fws.set_index(Key.mat_id)
+
+    relax_docs = db.tasks.find(
+        {
+            "task_label": "structure optimization",
+            Key.mat_id: {"$in": df_fws.index.tolist()},
+        },
+        [Key.mat_id, "output.bandgap"],
+    )
+    bandgap_pbe = {doc[Key.mat_id]: doc["output"]["bandgap"] for doc in relax_docs}
+    df_fws["bandgap"] = df_fws.index.map(bandgap_pbe)
+    df_fws["bandgap_source"] = np.where(df_fws.bandgap.isna(), "wren", "pbe relax")
+    df_fws["bandgap"] = df_fws.bandgap.fillna(df_fws[Key.bandgap_wren])
+
+    df_fws["fom_bound"] = fom_upper_bound(
+        df_fws.bandgap,
+        df_fws[Key.diel_total_wren],
+        df_fws.diel_total_wren_std,
+        n_std,
+    )
+    df_hopeless = df_fws.query("fom_bound < @min_fom")
+    print(
+        f"{len(df_hopeless)} of {len(df_fws)} pending DFPT Fireworks can't reach "
+        f"FoM >= {min_fom} (bound uses +{n_std} std dielectric constant)"
+    )
+    return df_hopeless[["fw_id", "bandgap", "bandgap_source", "fom_bound"]]
+
+
+# only Fireworks in these states are defused. LaunchPad.defuse_fw (and defuse_wf, even
+# with defuse_all_states=False) reruns Fireworks in any other state first, e.g. resets
+# COMPLETED relaxations and archives their launches, throwing away finished DFT
+defusable_states = ("WAITING", "READY", "PAUSED")
+
+
+def defuse_doomed_wfs(
+    launchpad: LaunchPad,
+    fw_ids: Sequence[int],
+    *,
+    stop_running_dirs: Sequence[str] = (),
+    dry_run: bool = True,
+) -> list[int]:
+    """Defuse all not yet started Fireworks in the workflows of flagged Fireworks.
+    COMPLETED, RUNNING and FIZZLED Fireworks are left untouched.
+
+    FireWorks can't defuse RUNNING Fireworks, so VASP runs in stop_running_dirs are
+    aborted by writing a STOPCAR with LABORT (VASP stops at the next electronic step).
+
+    Args:
+        launchpad (LaunchPad): FireWorks launchpad.
+        fw_ids (Sequence[int]): IDs of flagged Fireworks.
+        stop_running_dirs (Sequence[str], optional): Launch dirs of running flagged
+            calcs to abort. Defaults to ().
+        dry_run (bool, optional): If True, only print what would be done. Defaults
+            to True.
+
+    Returns:
+        list[int]: IDs of the (to be) defused Fireworks.
+    """
+    prefix = "dry run: would " if dry_run else ""
+    wf_fw_ids: dict[int, None] = {}
+    for fw_id in dict.fromkeys(map(int, fw_ids)):
+        wf_doc = launchpad.workflows.find_one({"nodes": fw_id}, ["nodes"])
+        wf_fw_ids |= dict.fromkeys((wf_doc or {}).get("nodes", [fw_id]))
+    pending_fws = launchpad.fireworks.find(
+        {"fw_id": {"$in": list(wf_fw_ids)}, "state": {"$in": list(defusable_states)}},
+        ["fw_id"],
+    )
+    defuse_ids = sorted(fw["fw_id"] for fw in pending_fws)
+
+    print(f"{prefix}defuse {len(defuse_ids)} pending Fireworks of flagged workflows")
+    if not dry_run:
+        for fw_id in defuse_ids:
+            launchpad.defuse_fw(fw_id)
+
+    for launch_dir in stop_running_dirs:
+        if not os.path.isdir(launch_dir):
+            print(f"{launch_dir=} not found, run this on the HPC filesystem")
+            continue
+        print(f"{prefix}write STOPCAR to {launch_dir}")
+        if not dry_run:
+            with open(f"{launch_dir}/STOPCAR", mode="w") as file:
+                file.write("LABORT = .TRUE.\n")
+
+    return defuse_ids
+
+
+if __name__ == "__main__":
+    with open(f"{ROOT}/fireworks-config/my_launchpad.yaml") as yml_file:
+        lpad = LaunchPad.from_dict(yaml.safe_load(yml_file))
+
+    df_diverging = scan_running_launches(get_db())
+    df_hopeless = find_hopeless_dfpt_fws(get_db(), min_fom=150)
+    defuse_doomed_wfs(
+        lpad,
+        [*df_diverging.fw_id, *df_hopeless.fw_id],
+        stop_running_dirs=df_diverging.launch_dir.dropna().tolist(),
+        dry_run=True,
+    )
@@ -0,0 +1,252 @@
+"""Where did the compute go? Core-hours per series, task label and fizzle cause.
+
+fetch_launch_table streams the 'fireworks' and 'launches' collections with narrow
+projections (never the full launch docs with their stored trackers and outputs) into
+one row per launch with runtime, cores, state and, for FIZZLED launches, the exception
+that killed them. Structure features come from the Fireworks themselves: nsites is
+counted server-side from the structure in the first Firetask of each relaxation, the
+number of elements from the formula in the Firework name and the DFPT k-point mesh
+size from the 'static dielectric' task docs. core_hours_report aggregates the table by
+any column and fit_runtime_model fits the DFPT cost model of dielectrics.db.scheduler
+to the completed workflows.
+"""
+
+from collections.abc import Sequence
+from typing import Any
+
+import numpy as np
+import pandas as pd
+from pymatgen.core import Composition
+from pymongo.database import Database
+from tqdm import tqdm
+
+from dielectrics import Key
+from dielectrics.db.scheduler import cost_features, fit_cost_model, predict_core_hours
+
+
+stacktrace_key = "action.stored_data._exception._stacktrace"
+
+
+def fizzle_reason(stacktrace: str | None) -> str:
+    """Exception class name from the last line of a FireWorks stack trace, e.g.
+    'MaxCorrectionsPerJobError' or 'NonZeroExitCode'.
+    """
+    if not stacktrace:
+        # no stored exception usually means the job was killed, e.g. by the walltime
+        return "no exception (killed?)"
+    last_line = stacktrace.strip().splitlines()[-1]
+    exc_type = last_line.split(":", maxsplit=1)[0].strip()
+    return exc_type.rsplit(".", maxsplit=1)[-1] or "unknown"
+
+
+def _stacktrace(launch_doc: dict[str, Any]) -> str | None:
+    stored_data = (launch_doc.get("action") or {}).get("stored_data") or {}
+    return (stored_data.get("_exception") or {}).get("_stacktrace")
+
+
+def _n_kpts(task_doc: dict[str, Any]) -> float:
+    kpts = ((task_doc.get("input") or {}).get("kpoints") or {}).get("kpoints")
+    return np.prod(kpts[0]) if kpts else np.nan
+
+
+def _max_cores(run_stats: dict[str, Any] | None) -> float:
+    # task docs hold one OUTCAR run_stats dict per VASP run (e.g. relax1, relax2)
+    # plus an 'overall' dict with summed times
+    cores = [
+        stats.get("cores")
+        for name, stats in (run_stats or {}).items()
+        if name != "overall" and isinstance(stats, dict)
+    ]
+    return max((c for c in cores if c), default=np.nan)
+
+
+def fetch_launch_table(
+    db: Database,
+    query: dict[str, Any] | None = None,
+    *,
+    cores_per_job: int = 1,
+    batch_size: int = 5_000,
+) -> pd.DataFrame:
+    """One row per launch with runtime, cores, state, fizzle reason and structure
+    features of the Firework it ran.
+
+    Args:
+        db (Database): The dielectrics database.
+        query (dict, optional): Filter on the 'fireworks' collection, e.g.
+            {"spec.series": ...}. Defaults to None (all Fireworks).
+        cores_per_job (int, optional): Cores assumed for launches without a task
+            doc recording them (e.g. fizzled ones). Defaults to 1.
+        batch_size (int, optional): Cursor batch size. Defaults to 5000.
+
+    Returns:
+        pd.DataFrame: Indexed by launch_id with fw_id, material_id, series,
+            task_label, fw_state, state, runtime_secs, cores, core_hours,
+            fizzle_reason, nsites, nelements and n_kpts.
+    """
+    pipeline: list[dict[str, Any]] = [
+        {"$match": query or {}},
+        {
+            "$project": {
+                "_id": 0,
+                "fw_id": 1,
+                "name": 1,
+                "fw_state": "$state",
+                "launch_ids": {
+                    "$concatArrays": [
+                        {"$ifNull": ["$launches", []]},
+                        {"$ifNull": ["$archived_launches", []]},
+                    ]
+                },
+                Key.mat_id: f"$spec.{Key.mat_id}",
+                "series": "$spec.series",
+                # count sites of the input structure server-side instead of
+                # transferring it, only relaxations carry one in their first task
+                "nsites": {
+                    "$size": {
+                        "$ifNull": [
+                            {"$arrayElemAt": ["$spec._tasks.structure.sites", 0]},
+                            [],
+                        ]
+                    }
+                },
+            }
+        },
+    ]
+    fw_rows = list(
+        tqdm(
+            db.fireworks.aggregate(pipeline, batchSize=batch_size),
+            desc="Fireworks",
+        )
+    )
+    df_fws = pd.DataFrame(fw_rows)
+    if df_fws.empty:
+        return df_fws
+    # atomate names Fireworks '{reduced formula}-{task label}'
+    df_fws[["formula", "task_label"]] = df_fws.pop("name").str.split(
+        "-", n=1, expand=True
+    )
+    df_fws["nsites"] = df_fws.nsites.replace(0, np.nan)
+    # static dielectric FWs get their structure from the preceding relaxation
+    df_fws["nsites"] = df_fws.groupby(Key.mat_id).nsites.transform("max")
+    df_fws["nelements"] = [
+        len(Composition(formula)) if formula else np.nan
+        for formula in df_fws.formula.fillna("")
+    ]
+
+    df_fws = df_fws.explode("launch_ids").dropna(subset="launch_ids")
+    df_fws = df_fws.rename(columns={"launch_ids": "launch_id"})
+    df_fws["launch_id"] = df_fws.launch_id.astype(int)
+
+    launches = db.launches.find(
+        {"launch_id": {"$in": df_fws.launch_id.tolist()}},
+        ["launch_id", "state", "runtime_secs", stacktrace_key],
+        batch_size=batch_size,
+    )
+    launch_rows = [
+        {
+            "launch_id": doc["launch_id"],
+            "state": doc.get("state"),
+            "runtime_secs": doc.get("runtime_secs") or 0,
+            "fizzle_reason": fizzle_reason(_stacktrace(doc))
+            if doc.get("state") == "FIZZLED"
+            else None,
+        }
+        for doc in tqdm(launches, desc="Launches")
+    ]
+    df_launches = pd.DataFrame(
+        launch_rows, columns=["launch_id", "state", "runtime_secs", "fizzle_reason"]
+    )
+    df_launches = df_launches.merge(df_fws, on="launch_id", how="left")
+
+    tasks = db.tasks.find(
+        {Key.mat_id: {"$in": df_fws[Key.mat_id].dropna().unique().tolist()}},
+        [Key.mat_id, "task_label", "run_stats", "input.kpoints.kpoints"],
+        batch_size=batch_size,
+    )
+    df_tasks = pd.DataFrame(
+        [
+            {
+                Key.mat_id: doc[Key.mat_id],
+                "task_label": doc.get("task_label"),
+                "cores": _max_cores(doc.get("run_stats")),
+                "n_kpts": _n_kpts(doc),
+            }
+            for doc in tqdm(tasks, desc="Tasks")
+        ],
+        columns=[Key.mat_id, "task_label", "cores", "n_kpts"],
+    ).drop_duplicates([Key.mat_id, "task_label"])
+
+    df_launches = df_launches.merge(
+        df_tasks.drop(columns="n_kpts"), on=[Key.mat_id, "task_label"], how="left"
+    )
+    # cost model features use the DFPT k-point mesh for the whole workflow
+    dfpt_kpts = df_tasks.query("task_label == 'static dielectric'")
+    df_launches["n_kpts"] = df_launches[Key.mat_id].map(
+        dfpt_kpts.set_index(Key.mat_id).n_kpts
+    )
+    df_launches["cores"] = df_launches.cores.fillna(cores_per_job)
+    df_launches["core_hours"] = df_launches.runtime_secs * df_launches.cores / 3600
+    return df_launches.set_index("launch_id")
+
+
+def core_hours_report(
+    df_launches: pd.DataFrame, by: str | Sequence[str]
+) -> pd.DataFrame:
+    """Total, share and mean core-hours and launch counts per group, most expensive
+    group first.
+
+    Args:
+        df_launches (pd.DataFrame): Output of fetch_launch_table().
+        by (str | Sequence[str]): Column(s) to group by, e.g. 'series',
+            'task_label' or 'fizzle_reason'.
+
+    Returns:
+        pd.DataFrame: n_launches, core_hours, share (of all core-hours in
+            df_launches), mean_core_hours and n_fizzled per group.
+    """
+    grouped = df_launches.groupby(by, dropna=False)
+    df_report = pd.DataFrame(
+        {
+            "n_launches": grouped.size(),
+            "core_hours": grouped.core_hours.sum(),
+            "mean_core_hours": grouped.core_hours.mean(),
+            "n_fizzled": grouped.state.agg(lambda states: (states == "FIZZLED").sum()),
+        }
+    )
+    df_report.insert(2, "share", df_report.core_hours / df_launches.core_hours.sum())
+    return df_report.sort_values("core_hours", ascending=False)
+
+
+def fit_runtime_model(
+    df_launches: pd.DataFrame, min_samples: int = 20
+) -> tuple[pd.Series, pd.DataFrame]:
+    """Fit the scheduler's log-linear cost model to completed workflows.
+
+    Core-hours of all COMPLETED launches of a material (relaxations + DFPT) are
+    summed, materials with fizzled launches are included with their completed
+    launches' cost only.
+
+    Args:
+        df_launches (pd.DataFrame): Output of fetch_launch_table().
+        min_samples (int, optional): Passed to fit_cost_model. Defaults to 20.
+
+    Returns:
+        tuple[pd.Series, pd.DataFrame]: Model coefficients and per-material
+            core_hours, features and core_hours_pred.
+    """
+    df_done = df_launches.query("state == 'COMPLETED'")
+    df_wfs = df_done.groupby(Key.mat_id).agg(
+        core_hours=("core_hours", "sum"),
+        **{feat: (feat, "first") for feat in cost_features},
+    )
+    df_wfs = df_wfs.dropna().query("core_hours > 0")
+    coefs = fit_cost_model(df_wfs, min_samples=min_samples)
+    df_wfs["core_hours_pred"] = predict_core_hours(df_wfs, coefs)
+
+    log_err = np.log(df_wfs.core_hours_pred / df_wfs.core_hours)
+    print(
+        f"runtime model on {len(df_wfs):,} workflows: median abs. factor off "
+        f"{np.exp(log_err.abs().median()):.2f}, "
+        f"R2 (log) {1 - log_err.var() / np.log(df_wfs.core_hours).var():.2f}"
+    )
+    return coefs, df_wfs
@@ -7,6 +7,11 @@ from tqdm import tqdm
 
 from dielectrics import Key
 from dielectrics.db import db, md_field_map
+from dielectrics.db.launch_analytics import (
+    core_hours_report,
+    fetch_launch_table,
+    fit_runtime_model,
+)
 
 
 # %%
@@ -196,3 +201,12 @@ assert len(updated_ids) == len(fws)
 db.launches.count_documents(
     {"state": "FIZZLED", "launch_dir_deleted": {"$exists": False}}
 )
+
+
+# %% where did the compute go? core-hours per series, task label and fizzle cause
+df_launches = fetch_launch_table(db)
+for group in ("series", "task_label", "fizzle_reason"):
+    print(core_hours_report(df_launches, group).round(2).head(15), end="\n\n")
+
+# runtime model fit to completed workflows, used for DFPT priorities
+runtime_coefs, df_wf_runtimes = fit_runtime_model(df_launches)
@@ -0,0 +1,176 @@
+"""Cost-aware FireWorks priorities for DFPT workflows.
+
+With the default priority of 1 for every workflow, cheap and expensive candidates with
+similar predicted figures of merit run in submission order. Here, the core-hours of a
+whole dielectric workflow (relaxations + DFPT) are predicted with a log-linear model
+in number of sites, number of elements and size of the DFPT k-point mesh. The model
+is fit to completed launches by dielectrics.db.launch_analytics.fit_runtime_model,
+the single source of past runtimes and core counts. Candidates are then ranked by
+std-adjusted FoM per predicted core-hour. Running jobs in this order maximizes the
+summed FoM of finished calcs for any fixed allocation (greedy solution of the
+fractional knapsack). FireWorks runs higher priorities first.
+"""
+
+from collections.abc import Sequence
+
+import numpy as np
+import pandas as pd
+from pymatgen.io.vasp import Kpoints
+from pymongo import UpdateMany
+from pymongo.database import Database
+
+from dielectrics import Key
+
+
+cost_features = ("nsites", "nelements", "n_kpts")
+# exponents used when there are too few completed launches to fit: DFPT runs 3 *
+# nsites displacements each scaling ~nsites^2 with plane-wave count and linearly with
+# k-points, intercept ~1 core-hour for a 2-atom cell on a 1000 k-point mesh
+default_cost_coefs = pd.Series(
+    {"intercept": np.log(1 / 8e3), "nsites": 3.0, "nelements": 0.0, "n_kpts": 1.0}
+)
+
+
+def get_cost_features(structures: pd.Series, kpts_density: int = 3000) -> pd.DataFrame:
+    """Number of sites, number of elements and DFPT k-point mesh size of candidate
+    structures.
+
+    Args:
+        structures (pd.Series): Candidate structures.
+        kpts_density (int, optional): k-points per reciprocal atom, same as used by
+            dielectrics.db.workflows.build_dielectric_wf. Defaults to 3000.
+
+    Returns:
+        pd.DataFrame: Cost features with the same index as structures.
+    """
+    rows = [
+        {
+            "nsites": len(struct),
+            "nelements": len(struct.composition),
+            "n_kpts": np.prod(Kpoints.automatic_density(struct, kpts_density).kpts[0]),
+        }
+        for struct in structures
+    ]
+    return pd.DataFrame(rows, index=structures.index)
+
+
+def _design_matrix(df_features: pd.DataFrame) -> np.ndarray:
+    log_feats = np.log(df_features[list(cost_features)].to_numpy(dtype=float))
+    return np.column_stack([np.ones(len(df_features)), log_feats])
+
+
+def fit_cost_model(df_runtimes: pd.DataFrame, min_samples: int = 20) -> pd.Series:
+    """Fit log(core_hours) = intercept + sum(coef * log(feature)) by least squares.
+
+    Args:
+        df_runtimes (pd.DataFrame): core_hours and cost features per completed
+            workflow, as aggregated by launch_analytics.fit_runtime_model() from
+            launch_analytics.fetch_launch_table().
+        min_samples (int, optional): Below this many completed workflows, return
+            default_cost_coefs instead of fitting. Defaults to 20.
+
+    Returns:
+        pd.Series: Intercept and exponent per cost feature.
+    """
+    if len(df_runtimes) < min_samples:
+        print(
+            f"only {len(df_runtimes)} completed workflows < {min_samples=}, using "
+            "default cost model"
+        )
+        return default_cost_coefs.copy()
+    coefs, *_ = np.linalg.lstsq(
+        _design_matrix(df_runtimes), np.log(df_runtimes.core_hours), rcond=None
+    )
+    return pd.Series(coefs, index=default_cost_coefs.index)
+
+
+def predict_core_hours(df_features: pd.DataFrame, coefs: pd.Series) -> pd.Series:
+    """Predicted core-hours of dielectric workflows from their cost features."""
+    log_cost = _design_matrix(df_features) @ coefs[default_cost_coefs.index].to_numpy()
+    return pd.Series(np.exp(log_cost), index=df_features.index, name="core_hours_pred")
+
+
+def dfpt_priorities(
+    df_cands: pd.DataFrame,
+    coefs: pd.Series,
+    *,
+    fom_col: str = Key.fom_wren_std_adj,
+    kpts_density: int = 3000,
+    budget_core_hours: float | None = None,
+) -> pd.DataFrame:
+    """Rank candidates by std-adjusted FoM per predicted core-hour and turn the ranks
+    into FireWorks priorities.
+
+    Args:
+        df_cands (pd.DataFrame): Candidates with structure and fom_col columns.
+        coefs (pd.Series): Cost model from launch_analytics.fit_runtime_model().
+        fom_col (str, optional): Column to maximize. Defaults to
+            Key.fom_wren_std_adj. Negative values count as 0.
+        kpts_density (int, optional): k-points per reciprocal atom of the DFPT calc.
+            Defaults to 3000.
+        budget_core_hours (float, optional): If given, mark the highest-priority
+            candidates whose cumulative predicted cost fits in this budget.
+
+    Returns:
+        pd.DataFrame: Cost features, core_hours_pred, fom_per_core_hour, priority
+            (int, higher runs first, lowest is 1) and cum_core_hours (plus in_budget
+            if budget_core_hours was given), same index as df_cands.
+    """
+    df_prio = get_cost_features(df_cands[Key.structure], kpts_density)
+    df_prio["core_hours_pred"] = predict_core_hours(df_prio, coefs)
+    df_prio["fom_per_core_hour"] = (
+        df_cands[fom_col].clip(lower=0).fillna(0) / df_prio.core_hours_pred
+    )
+    rank = df_prio.fom_per_core_hour.rank(ascending=False, method="first")
+    df_prio["priority"] = (len(df_prio) - rank + 1).astype(int)
+
+    order = df_prio.priority.sort_values(ascending=False).index
+    df_prio["cum_core_hours"] = df_prio.core_hours_pred.loc[order].cumsum()
+    if budget_core_hours is not None:
+        df_prio["in_budget"] = df_prio.cum_core_hours <= budget_core_hours
+        n_fit, total = df_prio.in_budget.sum(), df_prio.core_hours_pred.sum()
+        print(
+            f"{n_fit:,} of {len(df_prio):,} candidates fit in {budget_core_hours:,.0f} "
+            f"core-hours (all: {total:,.0f})"
+        )
+    return df_prio
+
+
+def reprioritize_queued_fws(
+    db: Database,
+    priorities: pd.Series,
+    states: Sequence[str] = ("READY", "WAITING"),
+    *,
+    dry_run: bool = True,
+) -> int:
+    """Set spec._priority of not-yet-run Fireworks of already submitted workflows in
+    one bulk write.
+
+    Args:
+        db (Database): The dielectrics database.
+        priorities (pd.Series): Priorities indexed by material ID, e.g.
+            dfpt_priorities(...).priority.
+        states (Sequence[str], optional): Firework states to update. Defaults to
+            ("READY", "WAITING").
+        dry_run (bool, optional): If True, only count matching Fireworks. Defaults to
+            True.
+
+    Returns:
+        int: Number of Fireworks (to be) updated.
+    """
+    filters = {
+        mat_id: {f"spec.{Key.mat_id}": mat_id, "state": {"$in": list(states)}}
+        for mat_id in priorities.index
+    }
+    if dry_run:
+        return db.fireworks.count_documents(
+            {
+                f"spec.{Key.mat_id}": {"$in": list(filters)},
+                "state": {"$in": list(states)},
+            }
+        )
+    ops = [
+        UpdateMany(filters[mat_id], {"$set": {"spec._priority": int(prio)}})
+        for mat_id, prio in priorities.items()
+    ]
+    return db.fireworks.bulk_write(ops, ordered=False).modified_count if ops else 0
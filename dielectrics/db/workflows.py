@@ -0,0 +1,329 @@
+"""Build atomate dielectric workflows in parallel and submit them to FireWorks in bulk.
+
+Building a workflow (wf_dielectric_constant, powerups and an automatic_density k-mesh)
+is pure CPU work, so build_dielectric_wfs spreads it over a process pool.
+submit_dielectric_wfs then checks all material IDs against one set of IDs already in
+the 'workflows' collection instead of querying per workflow, and inserts new workflows
+with LaunchPad.bulk_add_wfs in chunks, i.e. a few Mongo round trips per chunk rather
+than several per workflow. With dry_run=True nothing is written and the returned report
+shows what would have been submitted.
+"""
+
+import functools
+from collections.abc import Sequence
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any
+
+import numpy as np
+import pandas as pd
+from atomate.common.powerups import add_additional_fields_to_taskdocs, add_metadata
+from atomate.vasp.powerups import (
+    add_modify_incar,
+    add_modify_kpoints,
+    add_modify_potcar,
+    add_priority,
+    add_trackers,
+    use_custodian,
+)
+from atomate.vasp.workflows import wf_dielectric_constant
+from fireworks import LaunchPad, Workflow
+from pymatgen.core import Structure
+from pymatgen.io.vasp import Kpoints
+from pymongo.database import Database
+from tqdm import tqdm
+
+from dielectrics import Key
+from dielectrics.db.early_abort import tracked_tail_lines
+
+
+def get_existing_material_ids(db: Database) -> set[str]:
+    """Material IDs of all workflows in the DB. Uses the 'workflows' rather than the
+    'tasks' collection to include calcs yet to run.
+    """
+    return set(map(str, db.workflows.distinct(f"metadata.{Key.mat_id}")))
+
+
+def wf_metadata(mat_id: str, row: pd.Series, series: str) -> dict[str, Any]:
+    """Metadata dict attached to a workflow, its Fireworks and resulting task docs.
+
+    Args:
+        mat_id (str): Material ID of the workflow's structure.
+        row (pd.Series): Candidate properties. Keys containing '_mp', '_wren' or
+            'airss' and icsd_ids are copied into the metadata.
+        series (str): Name of the calculation series (see db/readme.md).
+
+    Returns:
+        dict[str, Any]: Workflow metadata.
+
+    Raises:
+        ValueError: If series doesn't match mat_id, i.e. element-substituted materials
+            (mat_id contains '->') must be in an 'elemsub' series and others must not.
+    """
+    meta_dict = {"series": series, Key.mat_id: mat_id}
+    for key, val in row.items():
+        if val is None:
+            continue
+
+        if any(x in str(key) for x in ("_mp", "_wren")) or key == "icsd_ids":
+            meta_dict[key] = val
+        if "airss" in str(key):
+            meta_dict[key] = val
+
+    is_elemsub = "->" in str(mat_id)
+    if is_elemsub != ("elemsub" in series):
+        raise ValueError(
+            f"{mat_id=} is {'' if is_elemsub else 'not '}element-substituted but "
+            f"{series=} {'lacks' if is_elemsub else 'contains'} 'elemsub'"
+        )
+
+    return meta_dict
+
+
+def build_dielectric_wf(
+    struct: Structure,
+    meta_dict: dict[str, Any],
+    priority: int = 1,
+    kpts_density: int = 3000,
+) -> Workflow:
+    """Dielectric workflow from atomate's wf_dielectric_constant with our INCAR,
+    k-point, POTCAR and custodian settings, metadata and priority.
+
+    Args:
+        struct (Structure): Structure to relax and run DFPT on.
+        meta_dict (dict[str, Any]): Workflow metadata, see wf_metadata().
+        priority (int, optional): FireWorks priority. Defaults to 1.
+        kpts_density (int, optional): k-points per reciprocal atom of the DFPT
+            calc's automatic_density mesh. Defaults to 3000.
+
+    Returns:
+        Workflow: Ready to add to a LaunchPad.
+    """
+    wf = wf_dielectric_constant(struct)
+    # sets IBRION = 8 which we need to get the electronic (static) as well as ionic
+    # contribution to the dielectric constant https://vasp.at/wiki/index.php/IBRION
+    # also sets ISIF = 2 which calculates forces and stress tensor, treating atom
+    # positions as degrees of freedom but keeping cell shape and volume fixed
+    # great advice on how to parallelize DFPT calcs in VASP:
+    # https://rehnd.github.io/tutorials/vasp/phonons
+
+    # run a coarse initial relaxation with half the k-points followed by a finer one
+    # with the full k-point density (likely especially helpful for structures generated
+    # by elemental substitutions which are further from equilibrium)
+    use_custodian(
+        wf,
+        custodian_params={
+            "job_type": "double_relaxation_run",
+            "half_kpts_first_relax": True,
+        },
+        fw_name_constraint="structure optimization",
+    )
+
+    # same INCAR and KPOINT settings for the DFPT calc as in https://rdcu.be/cjP5Z
+    # ---
+    # consider using KPAR <= 12 for better parallelization as suggested by
+    # https://bit.ly/2UA4XG5
+    add_modify_incar(
+        wf,
+        # using setup recommended by VASP for LINUX cluster linked by Infiniband, modern
+        # multi-core machines https://vasp.at/wiki/NCORE
+        modify_incar_params={"incar_update": {"NCORE": 4}},  # 2 up to # cores per node
+    )
+    add_modify_incar(
+        wf,
+        modify_incar_params={"incar_update": {"ENCUT": 700, "EDIFF": 1e-7}},
+        fw_name_constraint="static dielectric",
+    )
+    # TODO: can we turn off spin? MP does so if magmom of all sites is below 0.02
+    # (https://git.io/JRBiN) but we don't know that for structures generated via element
+    # substitution
+    # incar_update["ISPIN"] = 1
+    # TODO not interested in local potential, could try setting
+    # incar_update["LVHAR"] = ".FALSE."
+    # TODO could unset LORBIT = 11, gives unneeded orbital characters in band structure
+    # "incar_dictmod": {"LORBIT": {"$unset": ""}},
+    # unsure if either affect the dielectric workflow
+
+    # TODO: should we use damped molecular dynamics (IBRION=3) for elemsub structures
+    # as recommended when starting from very bad initial guesses? but then how to pick
+    # time step and damping factor? https://vasp.at/wiki/index.php/IBRION
+    add_modify_incar(
+        wf,
+        # TODO: figure out how to set ISMEAR = 0 only on first rough relax as suggested
+        # by Andrew Rosen
+        modify_incar_params={"incar_update": {"ISMEAR": 0}},
+        fw_name_constraint="structure optimization",
+    )
+
+    # tails of these files are stored in the launch docs on every ping, long enough
+    # for dielectrics.db.early_abort to follow several ionic steps in vasp.out
+    add_trackers(
+        wf, ["std_err.txt", "vasp.out", "custodian.json"], nlines=tracked_tail_lines
+    )
+
+    auto_kpts = Kpoints.automatic_density(struct, kpts_density)
+    add_modify_kpoints(
+        wf,
+        {"kpoints_update": {"kpts": auto_kpts.kpts}},
+        fw_name_constraint="static dielectric",
+    )
+
+    add_modify_potcar(wf, {"potcar_symbols": {"W": "W_sv"}})
+    # W_pv POTCAR available in older releases replaced by W_sv in v5.4
+    # https://bit.ly/3z8PETR
+
+    # Add metadata dictionary to a workflow and all its Fireworks. meta_dict is merged
+    # into WF's "metadata" key and each FWs "spec" key. If FW contains Firetasks ending
+    # in "ToDb", e.g. VaspToDb, meta_dict is also merged into "additional_fields" key of
+    # these tasks and included in the resulting 'tasks' collection documents.
+    add_metadata(wf, meta_dict)
+    add_priority(wf, priority)
+    # add metadata to DB insertion tasks
+    add_additional_fields_to_taskdocs(wf, meta_dict)
+
+    return wf
+
+
+def _build_wf_from_args(
+    args: tuple[Structure, dict[str, Any], int], **kwargs: Any
+) -> Workflow:
+    return build_dielectric_wf(*args, **kwargs)
+
+
+def build_dielectric_wfs(
+    structures: Sequence[Structure],
+    metadata: Sequence[dict[str, Any]],
+    priorities: Sequence[int] | int = 1,
+    *,
+    n_workers: int | None = None,
+    chunksize: int = 16,
+    **kwargs: Any,
+) -> list[Workflow]:
+    """Build many dielectric workflows in a process pool.
+
+    Args:
+        structures (Sequence[Structure]): Structures to build workflows for.
+        metadata (Sequence[dict[str, Any]]): Workflow metadata aligned with
+            structures.
+        priorities (Sequence[int] | int, optional): FireWorks priority per workflow or
+            one for all. Defaults to 1.
+        n_workers (int, optional): Number of worker processes. Defaults to
+            os.cpu_count(). 1 builds in the current process.
+        chunksize (int, optional): Workflows built per task sent to a worker.
+            Defaults to 16.
+        **kwargs: Passed to build_dielectric_wf, e.g. kpts_density.
+
+    Returns:
+        list[Workflow]: Workflows in the order of structures.
+    """
+    if isinstance(priorities, int):
+        priorities = [priorities] * len(structures)
+    args = list(zip(structures, metadata, map(int, priorities), strict=True))
+    build = functools.partial(_build_wf_from_args, **kwargs)
+
+    if n_workers == 1 or len(args) < 2:
+        return [build(arg) for arg in tqdm(args, desc="Building workflows")]
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        return list(
+            tqdm(
+                executor.map(build, args, chunksize=chunksize),
+                total=len(args),
+                desc="Building workflows",
+            )
+        )
+
+
+def submit_dielectric_wfs(
+    launchpad: LaunchPad,
+    df_submit: pd.DataFrame,
+    series: str,
+    *,
+    existing_ids: set[str],
+    priorities: pd.Series | int = 1,
+    dry_run: bool = True,
+    chunk_size: int = 500,
+    n_workers: int | None = None,
+    **kwargs: Any,
+) -> pd.DataFrame:
+    """Build dielectric workflows for new candidates and add them to the launchpad in
+    chunks of bulk inserts.
+
+    Args:
+        launchpad (LaunchPad): FireWorks launchpad to submit to.
+        df_submit (pd.DataFrame): Candidates indexed by material ID with structure and
+            formula columns plus metadata columns (see wf_metadata()).
+        series (str): Name of the calculation series.
+        existing_ids (set[str]): Material IDs already in the DB, e.g. from
+            get_existing_material_ids(). Candidates in this set are skipped and
+            submitted IDs are added to it.
+        priorities (pd.Series | int, optional): FireWorks priority per material ID
+            or one for all. Missing IDs get priority 1. Defaults to 1.
+        dry_run (bool, optional): If True, build workflows but don't submit them.
+            Defaults to True.
+        chunk_size (int, optional): Workflows per LaunchPad.bulk_add_wfs call.
+            Defaults to 500.
+        n_workers (int, optional): Processes for building workflows. Defaults to
+            os.cpu_count().
+        **kwargs: Passed to build_dielectric_wf, e.g. kpts_density.
+
+    Returns:
+        pd.DataFrame: Report indexed by material ID with formula, status ('new',
+            'in DB' or 'duplicate'), priority, number of Fireworks and whether the
+            workflow was submitted.
+
+    Raises:
+        ValueError: If some new workflows lack metadata keys others have or their
+            series doesn't match their material ID (see wf_metadata()). Raised before
+            any workflow is built.
+    """
+    mat_ids = df_submit.index.astype(str)
+    in_db = mat_ids.isin(list(existing_ids))
+    is_dup = mat_ids.duplicated() & ~in_db
+    is_new = ~(in_db | is_dup)
+
+    df_report = pd.DataFrame(
+        {Key.formula: df_submit[Key.formula].to_numpy()}, index=mat_ids
+    )
+    df_report.index.name = Key.mat_id
+    df_report["status"] = "new"
+    df_report.loc[in_db, "status"] = "in DB"
+    df_report.loc[is_dup, "status"] = "duplicate"
+    if isinstance(priorities, pd.Series):
+        priorities = priorities.reindex(df_submit.index).fillna(1).astype(int)
+        df_report["priority"] = priorities.to_numpy()
+    else:
+        df_report["priority"] = priorities
+
+    df_new = df_submit[is_new]
+    metadata = [
+        wf_metadata(str(mat_id), row, series) for mat_id, row in df_new.iterrows()
+    ]
+    # every new workflow should carry the same metadata keys, fail before building
+    df_meta = pd.DataFrame(metadata)
+    if (nans_per_col := df_meta.isna().sum()).any():
+        missing = nans_per_col[nans_per_col > 0]
+        raise ValueError(f"some new workflows have missing metadata:\n{missing}")
+
+    wfs = build_dielectric_wfs(
+        df_new[Key.structure].tolist(),
+        metadata,
+        df_report.priority[is_new].tolist(),
+        n_workers=n_workers,
+        **kwargs,
+    )
+    n_fws = np.zeros(len(df_report), dtype=int)
+    n_fws[is_new] = [len(wf.fws) for wf in wfs]
+    df_report["n_fws"] = n_fws
+
+    submitted = np.zeros(len(df_report), dtype=bool)
+    if not dry_run:
+        new_idx = np.flatnonzero(is_new)
+        for start in tqdm(range(0, len(wfs), chunk_size), desc="Submitting workflows"):
+            launchpad.bulk_add_wfs(wfs[start : start + chunk_size])
+            submitted[new_idx[start : start + chunk_size]] = True
+        existing_ids.update(df_report.index[is_new])
+    df_report["submitted"] = submitted
+
+    print(f"{'Dry run: ' if dry_run else ''}{len(wfs):,} new workflows ", end="")
+    print("(not submitted)" if dry_run else "submitted")
+    print(df_report.status.value_counts().to_string())
+    return df_report
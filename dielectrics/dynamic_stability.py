@@ -3,74 +3,34 @@ eigenvalues corresponding to imaginary phonon modes.
 """
 
 # %%
-from collections.abc import Sequence
-
 import numpy as np
-import pandas as pd
-import plotly.express as px
 import pymatviz as pmv
-from scipy.constants import milli, tera, value
 
 from dielectrics import PAPER_FIGS, Key
 from dielectrics.db.fetch_data import df_diel_from_task_coll
+from dielectrics.phonons import (
+    df_phonon_stability,
+    get_ph_freqs,
+    imaginary_tol,
+    load_normal_mode_eigenvals,
+)
+from dielectrics.phonons.mode_decomposition import df_ionic_mode_decomp
+from dielectrics.phonons.store import get_dyn_mat_array
+from dielectrics.plots import px  # side-effect import sets plotly template and plt.rc
 
 
 __author__ = "Janosh Riebesell"
 __date__ = "2024-04-04"
 
-# following Qu et al. https://www.nature.com/articles/s41597-020-0418-6 allow
-# imaginary frequencies up to 1 meV = 0.2417 THz before considering a material unstable
-meV_to_THz = value("electron volt-hertz relationship") / tera * milli  # noqa: N816
-imaginary_tol = -1 * meV_to_THz
-
-
-def ph_freqs_from_dyn_mat_evs(dyn_mat_evs: Sequence[float]) -> np.ndarray:
-    """Dynamical matrix eigenvalue to phonon frequency conversion.
 
-    Copied from https://github.com/hackingmaterials/amset/blob/92b67a30/amset/tools/phonon_frequency.py#L48
-    Thanks to Alex Ganose!
-    """
-    if dyn_mat_evs:
-        phonon_frequencies = -1 * np.sqrt(np.abs(dyn_mat_evs)) * np.sign(dyn_mat_evs)
-    else:
-        phonon_frequencies = np.array([])
-    return phonon_frequencies
-
-
-# %%
-# dyn_mat_keys = ["normalmode_eigenvals", "normalmode_eigenvecs", "force_constants"]
-dyn_mat_keys = ["normalmode_eigenvals"]
-df_phonon = df_diel_from_task_coll(
-    query={},
-    fields=[f"calcs_reversed.output.{key}" for key in dyn_mat_keys],
-    cache=False,
-    drop_dup_ids=True,
-)
-
-assert len(df_phonon) == 2532, f"{len(df_phonon)=}"
-
-
-# %% %
-df_tmp = pd.DataFrame(lst[-1]["output"] for lst in df_phonon.calcs_reversed)
-df_tmp.index = df_phonon.index
-col_map = dict(
-    normalmode_eigenvals=Key.dyn_mat_eigen_vals,
-    normalmode_eigenvecs=Key.dyn_mat_eigen_vecs,
-)
-df_tmp = df_tmp.rename(columns=col_map)
-df_phonon[list(df_tmp)] = df_tmp
-
-df_phonon[Key.phonon_freqs] = df_phonon[Key.dyn_mat_eigen_vals].map(
-    ph_freqs_from_dyn_mat_evs
-)
-
-df_phonon.isna().sum()
+# %% all normal-mode eigenvalues packed into one flat array plus per-material offsets
+mat_ids, dyn_mat_evs, ev_offsets = load_normal_mode_eigenvals()
 
 
 # %%
 # mat_data = dynamical_mats["mp-756175"]
 for mat_id in ("mp-756175", "mp-1225854:W->Te"):
-    phonon_freqs = df_phonon.loc[mat_id, Key.phonon_freqs]
+    phonon_freqs = get_ph_freqs(mat_id, mat_ids, dyn_mat_evs, ev_offsets)
 
     fig = px.scatter(
         x=range(len(phonon_freqs)),
@@ -98,12 +58,26 @@ for mat_id in ("mp-756175", "mp-1225854:W->Te"):
     pmv.save_fig(fig, f"{PAPER_FIGS}/{mat_id}-phonon-freqs.svg", width=300, height=200)
 
 
-# %%
-df_phonon[Key.min_ph_freq] = df_phonon[Key.phonon_freqs].map(
-    lambda ph_freqs: np.min(ph_freqs) if isinstance(ph_freqs, np.ndarray) else np.nan
-)
+# %% eigenvectors of the softest modes, lazily read from the float32 memory-mapped store
+# (run write_dyn_mat_store() once to extract them from the task data)
+for mat_id in ("mp-756175", "mp-1225854:W->Te"):
+    eigen_vecs = get_dyn_mat_array(mat_id, "normalmode_eigenvecs")
+    if eigen_vecs is None:
+        continue
+    phonon_freqs = get_ph_freqs(mat_id, mat_ids, dyn_mat_evs, ev_offsets)
+    softest_mode = np.asarray(eigen_vecs[phonon_freqs.argmin()])  # (n_sites, 3)
+    site_amplitudes = np.linalg.norm(softest_mode, axis=1)
+    print(f"{mat_id} softest mode site amplitudes: {site_amplitudes.round(2)}")
+
+
+# %% per-material min/max frequencies and imaginary mode counts as segment reductions
+df_phonon = df_phonon_stability()
+# restrict to materials with valid dielectric constants as in the paper
+df_phonon = df_phonon.loc[df_phonon.index.isin(df_diel_from_task_coll({}).index)]
+
+assert len(df_phonon) == 2532, f"{len(df_phonon)=}"
 
-n_stable = (df_phonon[Key.min_ph_freq] > imaginary_tol).sum()
+n_stable = df_phonon.is_dyn_stable.sum()
 
 stable_report = (
     f"{n_stable:,} Stable Materials out of {len(df_phonon):,} = "
@@ -160,3 +134,25 @@ fig.layout.update(showlegend=False)
 fig.show()
 
 pmv.save_fig(fig, f"{PAPER_FIGS}/min-phonon-freq-hist.svg", width=600, height=400)
+
+
+# %% mode-resolved ε_ionic: which polar modes drive high ionic permittivity
+df_modes = df_ionic_mode_decomp()
+df_modes[Key.diel_ionic_pbe] = df_diel_from_task_coll({})[Key.diel_ionic_pbe]
+
+# summed mode contributions should recover DFPT's ε_ionic, large deviations point at
+# inconsistent units or broken acoustic sum rules
+rel_err = (df_modes.diel_ionic_modes / df_modes[Key.diel_ionic_pbe] - 1).abs()
+print(
+    f"mode-summed vs DFPT ε_ionic: median rel. error {rel_err.median():.1%}, "
+    f"{(rel_err > 0.1).sum():,} / {rel_err.notna().sum():,} materials off by > 10%"
+)
+
+# soft-mode-driven permittivity: a single low-frequency mode dominates ε_ionic
+# (mode_1_freq in THz like all frequencies from ph_freqs_from_dyn_mat_evs)
+df_soft_mode = df_modes.query("mode_1_frac > 0.8 & mode_1_freq < 3")
+print(
+    f"{len(df_soft_mode):,} / {len(df_modes):,} materials have > 80% of ε_ionic from "
+    "one mode below 3 THz"
+)
+df_soft_mode.nlargest(20, "diel_ionic_modes")
@@ -7,14 +7,14 @@ import os
 import pickle
 import urllib.request
 from collections.abc import Sequence
+from concurrent.futures import ProcessPoolExecutor
 from string import digits
 from typing import Any
 
 import numpy as np
 import pandas as pd
-import pymatviz as pmv
 from numpy.typing import NDArray
-from pymatgen.core import Composition, Structure
+from pymatgen.core import Composition, Element, Structure
 
 from dielectrics import DATA_DIR, Key
 
@@ -105,7 +105,7 @@ def replace_similar_elem(
 
     # unlike Rhys' original code, this does not handle isotopes (mostly relevant for
     # Deuterium and Tritium, heavier isotopes are less different) https://git.io/JRUC7
-    z_orig = pmv.utils.atomic_numbers[orig_elem]
+    z_orig = Element(orig_elem).Z
 
     while True:
         z_new = rng.choice(atomic_nums, p=transition_matrix[z_orig - 1])
@@ -114,7 +114,7 @@ def replace_similar_elem(
         if z_new not in elem_list:
             break
 
-    new_elem = pmv.utils.element_symbols[z_new]
+    new_elem = Element.from_Z(int(z_new)).symbol
 
     return orig_elem, new_elem
 
@@ -138,12 +138,26 @@ def replace_elems_in_aflow_wyckoff(
     return f"{aflow_str}:{'-'.join(new_elems)}"
 
 
+def get_elem_diff(
+    orig_formula: str | Composition, new_formula: str | Composition
+) -> dict[Element, float]:
+    """Difference between reduced original and new compositions. A valid single
+    element substitution has exactly two entries (old element > 0, new element < 0)
+    that sum to zero.
+    """
+    return dict(
+        Composition(orig_formula, allow_negative=True).reduced_composition
+        - Composition(new_formula).reduced_composition
+    )
+
+
 def struct_apply_elem_substitution(
     orig_struct: Structure,
     new_formula: str | Composition,
     *,
     verbose: bool = True,
     strict: bool = True,
+    elem_diff: dict[Element, float] | None = None,
 ) -> Structure | None:
     """Generate a new Pymatgen structure given the original structure and a Pymatgen
     Composition object with one species replaced by another (usually chemically similar)
@@ -157,6 +171,8 @@ def struct_apply_elem_substitution(
             Defaults to True.
         strict (bool, optional): Whether to raise ValueError for invalid replacements.
             Defaults to True.
+        elem_diff (dict[Element, float], optional): Precomputed
+            get_elem_diff(orig_struct.formula, new_formula). Defaults to None.
 
     Raises:
         ValueError: If strict and the replacement is not balanced or not a single
@@ -166,10 +182,8 @@ def struct_apply_elem_substitution(
         Structure | None: New structure with substituted element, or None if the
             replacement was invalid and strict=False.
     """
-    elem_diff = dict(
-        Composition(orig_struct.formula, allow_negative=True).reduced_composition
-        - Composition(new_formula).reduced_composition
-    )
+    if elem_diff is None:
+        elem_diff = get_elem_diff(orig_struct.formula, new_formula)
 
     is_single_replacement = len(elem_diff) == 2
     is_balanced = sum(elem_diff.values()) == 0
@@ -185,10 +199,43 @@ def struct_apply_elem_substitution(
     # dicts are insertion ordered in py3.6+ so the old element is certain to come first
     old_el, new_el = elem_diff.keys()
 
-    new_struct = orig_struct.copy()
-    new_struct.replace_species({old_el: new_el})
+    # only species labels change, so build the new structure directly from the shared
+    # (immutable) lattice and coords instead of orig_struct.copy() + replace_species()
+    species = [
+        {
+            new_el if spec == old_el else spec: occu
+            for spec, occu in site.species.items()
+        }
+        for site in orig_struct
+    ]
+    return Structure(
+        orig_struct.lattice,
+        species,
+        orig_struct.frac_coords,
+        site_properties=orig_struct.site_properties,
+        # copy so substituted structures don't share (and mutate) the parent's dict
+        properties=dict(orig_struct.properties),
+    )
+
 
-    return new_struct
+def _struct_apply_elem_substitution_chunk(
+    orig_structs: Sequence[Structure],
+    new_formulas: Sequence[str | Composition],
+    kwargs: dict[str, Any],
+) -> list[Structure | None]:
+    # substitutions often share (orig_formula, new_formula) pairs (e.g. same prototype
+    # with different Wyckoff labels), so compute each composition difference once
+    elem_diffs: dict[tuple[str, str], dict[Element, float]] = {}
+    new_structs = []
+    for orig_struct, new_formula in zip(orig_structs, new_formulas, strict=True):
+        key = (orig_struct.formula, str(new_formula))
+        if key not in elem_diffs:
+            elem_diffs[key] = get_elem_diff(*key)
+        new_struct = struct_apply_elem_substitution(
+            orig_struct, new_formula, elem_diff=elem_diffs[key], **kwargs
+        )
+        new_structs.append(new_struct)
+    return new_structs
 
 
 def df_struct_apply_elem_substitution(
@@ -196,6 +243,9 @@ def df_struct_apply_elem_substitution(
     orig_struct_col: str = "orig_structure",
     new_formula_col: str = str(Key.formula),
     new_struct_col: str = str(Key.structure),
+    *,
+    n_workers: int | None = None,
+    chunksize: int = 256,
     **kwargs: Any,
 ) -> pd.DataFrame:
     """Apply struct_apply_elem_substitution to a DataFrame.
@@ -208,17 +258,31 @@ def df_struct_apply_elem_substitution(
             Defaults to "formula".
         new_struct_col (str, optional): Column name of new Structure objects.
             Defaults to "structure".
+        n_workers (int, optional): Number of processes to spread chunks over.
+            Defaults to os.cpu_count(). 1 runs serially in this process.
+        chunksize (int, optional): Rows per process pool task. Defaults to 256.
         **kwargs: Keyword arguments passed to struct_apply_elem_substitution.
 
     Returns:
         pd.DataFrame: DataFrame with new_struct_col added.
     """
-    df[new_struct_col] = [
-        struct_apply_elem_substitution(
-            getattr(row, orig_struct_col), getattr(row, new_formula_col), **kwargs
+    orig_structs = df[orig_struct_col].tolist()
+    new_formulas = df[new_formula_col].tolist()
+    starts = range(0, len(df), chunksize)
+    struct_chunks = [orig_structs[idx : idx + chunksize] for idx in starts]
+    formula_chunks = [new_formulas[idx : idx + chunksize] for idx in starts]
+
+    chunk_args = (struct_chunks, formula_chunks, [kwargs] * len(struct_chunks))
+    if n_workers == 1 or len(struct_chunks) <= 1:
+        new_struct_chunks = list(
+            map(_struct_apply_elem_substitution_chunk, *chunk_args)
         )
-        for row in df.itertuples()
-    ]
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            new_struct_chunks = list(
+                executor.map(_struct_apply_elem_substitution_chunk, *chunk_args)
+            )
+    df[new_struct_col] = [struct for chunk in new_struct_chunks for struct in chunk]
 
     if (n_missing_new_struct := sum(df[new_struct_col].isna())) > 0:
         print(
@@ -1,18 +1,19 @@
 # %%
 import pandas as pd
-import pymatviz as pmv
-from mp_api.client import MPRester
 from pymatgen.core import Composition
 from tqdm import tqdm
 
-from dielectrics import DATA_DIR, Key
+from dielectrics import Key
+from dielectrics.datasets import read_dataset
 from dielectrics.db.fetch_data import df_diel_from_task_coll
 from dielectrics.element_substitution import (
     load_icsd_trans_mat,
     mp_atom_nums,
-    replace_elems_in_aflow_wyckoff,
     replace_similar_elem,
 )
+from dielectrics.formula_index import is_known
+from dielectrics.ml.wren.protostructure import get_elemsub_protostructure_labels
+from dielectrics.plots import pmv  # side-effect import sets plotly template and plt.rc
 
 
 # %% original Wren-single candidates from MP+WBM
@@ -29,7 +30,7 @@ df_elem_sub_seeds = df_vasp_ens_std_adj.nlargest(200, Key.fom_pbe)
 
 
 # %%
-df_mp_diel = pd.read_json(f"{DATA_DIR}/mp-exploration/mp-diel-train.json.bz2")
+df_mp_diel = read_dataset("mp-exploration/mp-diel-train")
 
 # discard unstable and negative and unrealistically large dielectric constants
 df_mp_diel = df_mp_diel.query("0 < diel_total_mp < 2000 and e_above_hull_mp < 0.1")
@@ -68,22 +69,32 @@ print(
     "old compositions. This takes a while."
 )
 
-df_elemsub = df_elemsub.rename(columns={Key.formula: "orig_formula"})
-df_elemsub[Key.formula] = df_elemsub["composition"] = ""
-
-for idx, row in tqdm(enumerate(df_elemsub.itertuples()), total=n_unique):
-    mat_id = row.Index
-
-    df_elemsub.loc[idx, Key.mat_id] = f"{mat_id}:{'->'.join(row.elem_swap)}"
+# positional index so per-row assignments below can't append rows (the seed index
+# repeats once per iteration)
+df_elemsub = df_elemsub.rename(columns={Key.formula: "orig_formula"}).reset_index(
+    drop=True
+)
 
-    swap_dict = dict([row.elem_swap])
-    comp = Composition(row.orig_formula).replace(swap_dict)
-    df_elemsub.loc[idx, "composition"] = comp
-    df_elemsub.loc[idx, Key.formula] = comp.reduced_formula
+# substitutions keep the parent's symmetry, so swap elements in the parent labels
+# instead of re-running symmetry analysis on substituted structures
+df_elemsub[Key.wyckoff] = get_elemsub_protostructure_labels(
+    df_elemsub[Key.wyckoff], df_elemsub.elem_swap
+)
 
-    df_elemsub.loc[idx, Key.wyckoff] = replace_elems_in_aflow_wyckoff(
-        row.wyckoff, dict([row.elem_swap])
+df_elemsub[Key.mat_id] = [
+    f"{mat_id}:{'->'.join(elem_swap)}"
+    for mat_id, elem_swap in zip(
+        df_elemsub[Key.mat_id], df_elemsub.elem_swap, strict=True
+    )
+]
+df_elemsub["composition"] = [
+    Composition(orig_formula).replace(dict([elem_swap]))
+    for orig_formula, elem_swap in tqdm(
+        zip(df_elemsub.orig_formula, df_elemsub.elem_swap, strict=True),
+        total=n_unique,
     )
+]
+df_elemsub[Key.formula] = [comp.reduced_formula for comp in df_elemsub.composition]
 
 
 # %% https://ml-physics.slack.com/archives/DD8GBBRLN/p1624547833027400
@@ -106,30 +117,14 @@ noble_gases = df_clean.composition.map(lambda comp: any(el.is_noble_gas for el i
 print(f"removing nobel gases: {len(df_clean):,} -> {sum(~noble_gases):,}")
 df_clean = df_clean[~noble_gases]
 
-all_mp_formulas_csv = f"{DATA_DIR}/mp-exploration/all-mp-formulas.csv"
-try:
-    df_all_mp_formulas = pd.read_csv(all_mp_formulas_csv)
-except FileNotFoundError:
-    # if CSV doesn't exist, re-download all MP formulas
-    with MPRester() as mpr:
-        docs = mpr.materials.summary.search(fields=["material_id", "formula_pretty"])
-
-    df_all_mp_formulas = pd.DataFrame(
-        [
-            {Key.mat_id: str(doc.material_id), Key.formula: doc.formula_pretty}
-            for doc in docs
-        ]
-    ).set_index(Key.mat_id)
-    df_all_mp_formulas.round(4).to_csv(all_mp_formulas_csv)
-
 # We may want to keep only keep new compositions when substituting on a thoroughly
 # curated database like Materials Project since the formula already present is likely
 # the lowest lying polymorph. For something like WBM, this is much less likely, so makes
 # more sense to drop this filter.
-# NOTE: be careful to compare strings with strings here, not strings with tuples or
-# composition objects
+# is_known canonicalizes formulas before lookup so no need to worry about comparing
+# strings with tuples or composition objects
 prev_len = len(df_clean)
-df_clean = df_clean.query("formula not in @df_all_mp_formulas.formula")
+df_clean = df_clean[~is_known(df_clean[Key.formula], sources=("mp",))]
 print(f"removing existing MP compositions: {prev_len:,} -> {len(df_clean):,}")
 
 # removing Wyckoff strings already present in elemental subst. seeds: 187,176 -> 187,176
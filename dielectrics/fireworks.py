@@ -2,10 +2,14 @@
 be run on the same HPC filesystem where the fireworks ran.
 """
 
+import functools
+import hashlib
+import json
 import os
 import subprocess
 import time
-from collections.abc import Sequence
+from collections.abc import Callable, Sequence
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import UTC, datetime, timedelta
 from glob import glob
 from os.path import isfile
@@ -13,35 +17,192 @@ from shutil import rmtree
 from typing import Any
 
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 import yaml
 from pymongo import MongoClient
 from tqdm import tqdm
 
+from dielectrics import DATA_DIR
 from dielectrics.db import MONGO_SRV
 
 
-def round_floats_in_csvs(glob_pat: str = "**/*.csv") -> dict[str, Exception]:
+ROUNDED_CSVS_MANIFEST = f"{DATA_DIR}/.db_cache/rounded-csvs.json"
+
+
+def _file_hash(path: str, block_size: int = 2**20) -> str:
+    sha = hashlib.sha256()
+    with open(path, mode="rb") as file:
+        while block := file.read(block_size):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def _cast_like(df_chunk: pd.DataFrame, dtypes: pd.Series) -> pd.DataFrame:
+    """Cast columns of a CSV chunk to the dtypes inferred from the file's first chunk
+    so values are formatted the same in every chunk (e.g. 4 not 4.0 in an integer
+    column). Columns that can't be cast losslessly keep their own dtype.
+    """
+    for col, dtype in dtypes.items():
+        if col in df_chunk and df_chunk[col].dtype != dtype:
+            try:
+                df_chunk[col] = df_chunk[col].astype(dtype)
+            except (TypeError, ValueError):
+                pass
+    return df_chunk
+
+
+def _file_stat(path: str) -> dict[str, int]:
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def _round_csv(
+    csv: str, decimals: int, chunksize: int, *, to_parquet: bool
+) -> dict[str, Any]:
+    """Round floats in one CSV chunk by chunk, replacing the file atomically.
+
+    Returns:
+        dict[str, Any]: SHA256, size and mtime of the rounded CSV.
+    """
+    tmp_csv = f"{csv}.{os.getpid()}.tmp"
+    parquet_path = f"{csv.removesuffix('.csv')}.parquet"
+    tmp_parquet = f"{parquet_path}.{os.getpid()}.tmp"
+    writer = None
+    try:
+        # nullable dtypes keep integer columns with missing values integers
+        chunks = pd.read_csv(csv, chunksize=chunksize, dtype_backend="numpy_nullable")
+        for idx, df_chunk in enumerate(chunks):
+            is_first = idx == 0
+            if is_first:
+                dtypes = df_chunk.dtypes
+            df_in = _cast_like(df_chunk, dtypes)
+            id_cols = df_in.filter(like="id").columns
+            # move the first ID column to the front as index, else don't write the
+            # RangeIndex which would add an unnamed column on every pass
+            has_id_col = len(id_cols) > 0
+            df_out = df_in.set_index(id_cols[0]) if has_id_col else df_in
+            df_out = df_out.round(decimals)
+            df_out.to_csv(
+                tmp_csv,
+                mode="w" if is_first else "a",
+                header=is_first,
+                index=has_id_col,
+            )
+            if to_parquet:
+                # later chunks are cast to the schema inferred from the first one
+                table = pa.Table.from_pandas(
+                    df_out,
+                    schema=writer.schema if writer else None,
+                    preserve_index=has_id_col,
+                )
+                if writer is None:
+                    writer = pq.ParquetWriter(
+                        tmp_parquet, table.schema, compression="zstd"
+                    )
+                writer.write_table(table)
+        if writer is not None:
+            writer.close()
+            os.replace(tmp_parquet, parquet_path)
+        os.replace(tmp_csv, csv)
+    finally:
+        if writer is not None and writer.is_open:
+            writer.close()
+        for tmp_path in (tmp_csv, tmp_parquet):
+            if os.path.isfile(tmp_path):
+                os.remove(tmp_path)
+    return {"sha256": _file_hash(csv), **_file_stat(csv)}
+
+
+def round_floats_in_csvs(
+    glob_pat: str = "**/*.csv",
+    *,
+    decimals: int = 4,
+    chunksize: int = 100_000,
+    n_workers: int | None = None,
+    to_parquet: bool = False,
+    manifest_path: str = ROUNDED_CSVS_MANIFEST,
+) -> dict[str, Exception]:
     """Decrease floating point precision in CSV files matching provided glob pattern.
 
+    Files are processed in parallel, each one streamed in chunks so large prediction
+    CSVs never have to fit in memory, and replaced atomically via a temp file. The
+    size, mtime and SHA256 of every rounded file are recorded in manifest_path, so
+    files unchanged since they were last rounded are skipped without parsing them.
+    Files are only hashed if their size or mtime changed.
+
     Args:
         glob_pat (str, optional): Defaults to "**/*.csv".
+        decimals (int, optional): Decimal places to keep. Defaults to 4.
+        chunksize (int, optional): Rows read and written at a time. Defaults to
+            100_000.
+        n_workers (int, optional): Number of worker processes. Defaults to
+            os.cpu_count(). 1 processes files in the current process.
+        to_parquet (bool, optional): Also write each rounded CSV as zstd-compressed
+            Parquet next to it in the same pass. Defaults to False.
+        manifest_path (str, optional): JSON file with stats and hashes of rounded
+            CSVs.
+            Defaults to ROUNDED_CSVS_MANIFEST.
 
     Returns:
         dict[str, Exception]: CSV paths that couldn't be handled mapped to errors.
     """
     csvs = glob(glob_pat, recursive=True)
-    errors = {}
+    manifest: dict[str, dict[str, Any]] = {}
+    if os.path.isfile(manifest_path):
+        with open(manifest_path) as file:
+            manifest = json.load(file)
+
+    todo = []
+    n_restated = 0
+    for csv in csvs:
+        entry = manifest.get(os.path.abspath(csv), {})
+        is_rounded = entry.get("decimals") == decimals
+        if is_rounded and (stat := _file_stat(csv)) != {
+            key: entry.get(key) for key in stat
+        }:
+            # touched or copied files may still be rounded, compare contents
+            is_rounded = entry.get("sha256") == _file_hash(csv)
+            if is_rounded:
+                entry |= stat
+                n_restated += 1
+        has_parquet = not to_parquet or os.path.isfile(
+            f"{csv.removesuffix('.csv')}.parquet"
+        )
+        if not (is_rounded and has_parquet):
+            todo.append(csv)
+    print(f"{len(csvs) - len(todo)} of {len(csvs)} CSVs already rounded, skipping")
+
+    round_csv = functools.partial(
+        _round_csv, decimals=decimals, chunksize=chunksize, to_parquet=to_parquet
+    )
+    results: dict[str, dict[str, Any]] = {}
+    errors: dict[str, Exception] = {}
 
-    for csv in tqdm(csvs):
+    def collect(csv: str, get_entry: Callable[[], dict[str, Any]]) -> None:
         try:
-            df_csv = pd.read_csv(csv)
-            id_cols = df_csv.filter(like="id").columns
-            if len(id_cols) > 0:
-                df_csv = df_csv.set_index(id_cols[0])
-            df_csv.round(4).to_csv(csv)
-        except (ValueError, KeyError) as err:
+            results[csv] = get_entry()
+        except (ValueError, KeyError, pa.ArrowTypeError) as err:
             errors[csv] = err
 
+    if n_workers == 1 or len(todo) < 2:
+        for csv in tqdm(todo):
+            collect(csv, functools.partial(round_csv, csv))
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            futures = {executor.submit(round_csv, csv): csv for csv in todo}
+            for future in tqdm(as_completed(futures), total=len(futures)):
+                collect(futures[future], future.result)
+
+    for csv, entry in results.items():
+        manifest[os.path.abspath(csv)] = {**entry, "decimals": decimals}
+    if results or n_restated:
+        os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+        tmp_path = f"{manifest_path}.{os.getpid()}.tmp"
+        with open(tmp_path, mode="w") as file:
+            json.dump(manifest, file, indent=2)
+        os.replace(tmp_path, manifest_path)
+
     return errors
 
 
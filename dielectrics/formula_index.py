@@ -0,0 +1,184 @@
+"""Canonical formula and chemical system index for novelty filtering.
+
+Reduced formulas of all known materials (MP, WBM and our own task DB) are
+canonicalized once and stored on disk, so novelty checks are set lookups instead of
+parsing Composition objects or comparing differently formatted formula strings
+(e.g. 'Ba1 Ti1 O3' vs 'BaTiO3' vs 'TiBaO3') in every script.
+"""
+
+import functools
+import gzip
+import json
+import os
+from collections import defaultdict
+from collections.abc import Iterable, Sequence
+from typing import Literal
+
+import pandas as pd
+from mp_api.client import MPRester
+from pymatgen.core import Composition
+
+from dielectrics import DATA_DIR, Key
+from dielectrics.db.fetch_data import load_task_docs
+
+
+FORMULA_INDEX_PATH = f"{DATA_DIR}/.db_cache/formula-index.json.gz"
+ALL_MP_FORMULAS_CSV = f"{DATA_DIR}/mp-exploration/all-mp-formulas.csv"
+formula_sources = ("mp", "wbm", "tasks")
+
+
+# bounded so streaming millions of unique screened formulas keeps memory constant
+@functools.lru_cache(maxsize=2**18)
+def canonical_formula(formula: str | Composition) -> str:
+    """Reduced formula with pymatgen's element order, e.g. 'O3TiBa' -> 'BaTiO3'."""
+    return Composition(formula).reduced_formula
+
+
+@functools.lru_cache(maxsize=2**18)
+def canonical_chemsys(formula: str | Composition) -> str:
+    """Alphabetically sorted chemical system, e.g. 'BaTiO3' -> 'Ba-O-Ti'."""
+    return Composition(formula).chemical_system
+
+
+def fetch_all_mp_formulas() -> pd.DataFrame:
+    """Formulas of all MP materials from ALL_MP_FORMULAS_CSV, downloaded from the MP
+    API and written to that CSV if absent.
+
+    Returns:
+        pd.DataFrame: Indexed by material ID with a formula column.
+    """
+    if os.path.isfile(ALL_MP_FORMULAS_CSV):
+        return pd.read_csv(
+            ALL_MP_FORMULAS_CSV, keep_default_na=False, na_values=[""]
+        ).set_index(Key.mat_id)
+
+    with MPRester() as mpr:
+        docs = mpr.materials.summary.search(fields=["material_id", "formula_pretty"])
+
+    df_all_mp_formulas = pd.DataFrame(
+        [
+            {Key.mat_id: str(doc.material_id), Key.formula: doc.formula_pretty}
+            for doc in docs
+        ]
+    ).set_index(Key.mat_id)
+    os.makedirs(os.path.dirname(ALL_MP_FORMULAS_CSV), exist_ok=True)
+    df_all_mp_formulas.to_csv(ALL_MP_FORMULAS_CSV)
+    return df_all_mp_formulas
+
+
+def _get_source_formulas(source: str) -> Iterable[str]:
+    if source == "mp":
+        return fetch_all_mp_formulas()[Key.formula]
+    if source == "wbm":
+        # optional aflow_wyckoff_labels extra, only needed when indexing WBM
+        from matbench_discovery.data import DataFiles  # noqa: PLC0415
+
+        return pd.read_csv(
+            DataFiles.wbm_summary.path,
+            usecols=[Key.formula],
+            keep_default_na=False,
+            na_values=[""],
+        )[Key.formula]
+    if source == "tasks":
+        return [
+            doc["formula_pretty"]
+            for doc in load_task_docs()
+            if doc.get("formula_pretty")
+        ]
+    raise ValueError(f"unknown formula source {source!r}, must be in {formula_sources}")
+
+
+def build_formula_index(
+    sources: Sequence[str] = formula_sources, index_path: str = FORMULA_INDEX_PATH
+) -> dict[str, list[str]]:
+    """Canonicalize the formulas of each source and save them to index_path, keeping
+    entries of other sources already in the index.
+
+    Args:
+        sources (Sequence[str], optional): Any of 'mp', 'wbm', 'tasks'. Defaults to
+            all of them.
+        index_path (str, optional): Index .json.gz. Defaults to FORMULA_INDEX_PATH.
+
+    Returns:
+        dict[str, list[str]]: Map of source to its sorted unique canonical formulas.
+    """
+    index: dict[str, list[str]] = {}
+    if os.path.isfile(index_path):
+        with gzip.open(index_path, mode="rt", encoding="utf-8") as file:
+            index = json.load(file)
+
+    for source in sources:
+        formulas = set(_get_source_formulas(source))
+        index[source] = sorted({canonical_formula(formula) for formula in formulas})
+
+    os.makedirs(os.path.dirname(index_path), exist_ok=True)
+    with gzip.open(index_path, mode="wt", encoding="utf-8") as file:
+        json.dump(index, file)
+    return index
+
+
+@functools.cache
+def load_formula_index(
+    sources: tuple[str, ...] = ("mp",), index_path: str = FORMULA_INDEX_PATH
+) -> tuple[frozenset[str], dict[str, frozenset[str]]]:
+    """Known canonical formulas and chemsys -> formulas map for the given sources.
+    Sources missing from the on-disk index are (re)built and added to it.
+
+    Args:
+        sources (tuple[str, ...], optional): Which databases count as known. Defaults
+            to ('mp',).
+        index_path (str, optional): Index .json.gz. Defaults to FORMULA_INDEX_PATH.
+
+    Returns:
+        tuple[frozenset[str], dict[str, frozenset[str]]]: Set of known formulas and
+            map from chemical system to the known formulas in it.
+    """
+    index: dict[str, list[str]] = {}
+    if os.path.isfile(index_path):
+        with gzip.open(index_path, mode="rt", encoding="utf-8") as file:
+            index = json.load(file)
+    if missing := [src for src in sources if src not in index]:
+        index = build_formula_index(missing, index_path=index_path)
+
+    known_formulas = frozenset().union(*(index[src] for src in sources))
+    formulas_by_chemsys: dict[str, set[str]] = defaultdict(set)
+    for formula in known_formulas:
+        formulas_by_chemsys[canonical_chemsys(formula)].add(formula)
+    return known_formulas, {
+        chemsys: frozenset(formulas)
+        for chemsys, formulas in formulas_by_chemsys.items()
+    }
+
+
+def is_known(
+    formulas: pd.Series,
+    sources: tuple[str, ...] = ("mp",),
+    *,
+    level: Literal["formula", "chemsys"] = "formula",
+) -> pd.Series:
+    """Check which formulas (or their chemical systems) are already in the given
+    databases. Any formula format is accepted, each unique formula is parsed once.
+
+    Args:
+        formulas (pd.Series): Formula strings or Composition objects.
+        sources (tuple[str, ...], optional): Databases to check against. Defaults to
+            ('mp',).
+        level ('formula' | 'chemsys', optional): Whether to match exact reduced
+            formulas or any known material in the same chemical system. Defaults
+            to 'formula'.
+
+    Returns:
+        pd.Series: Boolean mask with the same index as formulas.
+    """
+    known_formulas, formulas_by_chemsys = load_formula_index(tuple(sources))
+    if level == "formula":
+        canonicalize, known = canonical_formula, known_formulas
+    elif level == "chemsys":
+        canonicalize, known = canonical_chemsys, formulas_by_chemsys.keys()
+    else:
+        raise ValueError(f"{level=} must be 'formula' or 'chemsys'")
+
+    is_known_map = {
+        formula: canonicalize(formula) in known for formula in set(formulas)
+    }
+    return formulas.map(is_known_map).astype(bool)
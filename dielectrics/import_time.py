@@ -0,0 +1,103 @@
+"""Import-time benchmark guarding the fast, plotting-free startup of the core package.
+
+Each module is imported in fresh interpreters (so nothing is cached in sys.modules)
+and the best wall time over several runs is compared against a budget. Also fails if
+importing it pulled in the plotting stack or created the Mongo client.
+
+Run with python -m dielectrics.import_time.
+"""
+
+import json
+import subprocess
+import sys
+
+
+# modules that must not be imported as a side effect of importing the core package
+heavy_modules = ("plotly", "pymatviz", "matplotlib", "seaborn", "dash")
+
+# time the import and report which heavy modules got loaded and whether the Mongo
+# client was created (dielectrics.db.get_db is only called on first access of db)
+probe_code = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+db_mod = sys.modules.get("dielectrics.db")
+print(json.dumps({{
+    "seconds": elapsed,
+    "loaded": sorted({{name.split(".")[0] for name in sys.modules}}),
+    "db_client": bool(db_mod and db_mod.get_db.cache_info().currsize),
+}}))
+"""
+
+
+def measure_import_time(module: str, n_repeats: int = 5) -> dict[str, object]:
+    """Import module in n_repeats fresh interpreters.
+
+    Args:
+        module (str): Dotted module name, e.g. 'dielectrics'.
+        n_repeats (int, optional): Number of interpreters to start. Defaults to 5.
+
+    Returns:
+        dict[str, object]: best and median import time in seconds, heavy modules
+            that were loaded and whether a Mongo client was created.
+
+    Raises:
+        subprocess.CalledProcessError: If importing module fails. Its stderr holds
+            the traceback of the failed import.
+    """
+    runs = []
+    for _ in range(n_repeats):
+        out = subprocess.run(  # noqa: S603
+            [sys.executable, "-c", probe_code.format(module=module)],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        runs.append(json.loads(out.stdout.splitlines()[-1]))
+
+    times = sorted(run["seconds"] for run in runs)
+    loaded = set(runs[0]["loaded"])
+    return {
+        "best": times[0],
+        "median": times[len(times) // 2],
+        "heavy_loaded": sorted(loaded.intersection(heavy_modules)),
+        "db_client": any(run["db_client"] for run in runs),
+    }
+
+
+def check_import_times(budgets: dict[str, float], n_repeats: int = 5) -> list[str]:
+    """Benchmark imports and collect budget or side-effect violations.
+
+    Args:
+        budgets (dict[str, float]): Map of module name to max best-of-n import time
+            in seconds.
+        n_repeats (int, optional): Fresh interpreters per module. Defaults to 5.
+
+    Returns:
+        list[str]: Violations, empty if all modules are within budget.
+    """
+    errors = []
+    for module, budget in budgets.items():
+        try:
+            result = measure_import_time(module, n_repeats)
+        except subprocess.CalledProcessError as err:
+            errors.append(f"{module} failed to import:\n{err.stderr.strip()}")
+            continue
+        print(
+            f"{module}: best {result['best']:.3f}s, median {result['median']:.3f}s "
+            f"(budget {budget:.1f}s)"
+        )
+        if result["best"] > budget:
+            errors.append(f"{module} took {result['best']:.3f}s > {budget}s")
+        if result["heavy_loaded"]:
+            errors.append(f"{module} imported {', '.join(result['heavy_loaded'])}")
+        if result["db_client"]:
+            errors.append(f"{module} created a MongoClient on import")
+    return errors
+
+
+if __name__ == "__main__":
+    # generous budgets: numpy and pymongo dominate, plotting libs alone take seconds
+    if errors := check_import_times({"dielectrics": 1.0, "dielectrics.db": 1.5}):
+        sys.exit("\n".join(errors))
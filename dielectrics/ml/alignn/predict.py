@@ -0,0 +1,146 @@
+"""Batched ALIGNN inference for large sets of (e.g. element-substituted) structures.
+
+Atom + line graphs are built in a process pool and written to an on-disk cache keyed
+by structure hash and graph settings, so repeated runs and additional models reuse
+them. Inference collates graphs into mini-batches with dgl.batch and runs all models
+on each batch on CPU with a fixed number of torch threads.
+"""
+
+import functools
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import dgl
+import numpy as np
+import pandas as pd
+import torch
+from alignn.pretrained import get_figshare_model
+from jarvis.core.graphs import Graph
+from pymatgen.core import Structure
+from pymatgen.io.jarvis import JarvisAtomsAdaptor
+from tqdm import tqdm
+
+from dielectrics import DATA_DIR, Key, struct_hash
+
+
+ALIGNN_GRAPH_DIR = f"{DATA_DIR}/.db_cache/alignn-graphs"
+
+# pretrained JARVIS models compared against Wren, keyed by prediction column prefix
+alignn_models = {
+    Key.bandgap: "jv_mbj_bandgap_alignn",
+    "bandgap_vdw": "jv_optb88vdw_bandgap_alignn",
+    "e_above_hull": "jv_ehull_alignn",
+}
+
+
+@functools.cache
+def load_alignn_model(model_name: str) -> torch.nn.Module:
+    """Pretrained ALIGNN model in eval mode, downloaded on first use."""
+    return get_figshare_model(model_name).eval()
+
+
+def build_alignn_graphs(
+    struct: Structure,
+    cutoff: float = 8,
+    max_neighbors: int = 12,
+    cache_dir: str = ALIGNN_GRAPH_DIR,
+) -> str:
+    """Build and cache ALIGNN atom + line graphs for a structure.
+
+    Args:
+        struct (Structure): Input structure.
+        cutoff (float, optional): Neighbor cutoff radius in Å. Defaults to 8.
+        max_neighbors (int, optional): Max neighbors per atom. Defaults to 12.
+        cache_dir (str, optional): Graph cache directory. Defaults to
+            ALIGNN_GRAPH_DIR.
+
+    Returns:
+        str: Path of the cached DGL binary holding [atom_graph, line_graph].
+    """
+    graph_path = (
+        f"{cache_dir}/{struct_hash(struct)}-cutoff={cutoff}-nbrs={max_neighbors}.bin"
+    )
+    if not os.path.isfile(graph_path):
+        atoms = JarvisAtomsAdaptor.get_atoms(struct)
+        atom_graph, line_graph = Graph.atom_dgl_multigraph(
+            atoms, cutoff=cutoff, max_neighbors=max_neighbors
+        )
+        # write to temp file first so concurrent runs never read half-written graphs
+        tmp_path = f"{graph_path}.{os.getpid()}.tmp"
+        dgl.save_graphs(tmp_path, [atom_graph, line_graph])
+        os.replace(tmp_path, graph_path)
+    return graph_path
+
+
+def _init_graph_worker() -> None:
+    # graph building is pure Python/NumPy, keep each worker to one torch thread
+    torch.set_num_threads(1)
+
+
+def predict_alignn(
+    structures: pd.Series,
+    model_names: dict[str, str] = alignn_models,
+    *,
+    batch_size: int = 256,
+    n_workers: int | None = None,
+    n_threads: int | None = None,
+    cutoff: float = 8,
+    max_neighbors: int = 12,
+    cache_dir: str = ALIGNN_GRAPH_DIR,
+) -> pd.DataFrame:
+    """Predict properties of many structures with pretrained ALIGNN models.
+
+    Args:
+        structures (pd.Series): Structures to score. Index is kept for the output.
+        model_names (dict[str, str], optional): Maps output column prefix to JARVIS
+            figshare model name. Defaults to alignn_models.
+        batch_size (int, optional): Graphs per forward pass. Defaults to 256.
+        n_workers (int, optional): Graph building processes. Defaults to
+            os.cpu_count().
+        n_threads (int, optional): Torch intra-op threads for inference. Defaults to
+            os.cpu_count().
+        cutoff (float, optional): Neighbor cutoff radius in Å. Defaults to 8.
+        max_neighbors (int, optional): Max neighbors per atom. Defaults to 12.
+        cache_dir (str, optional): Graph cache directory. Defaults to
+            ALIGNN_GRAPH_DIR.
+
+    Returns:
+        pd.DataFrame: One column {prefix}_alignn per model, same index as structures.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    build_graphs = functools.partial(
+        build_alignn_graphs,
+        cutoff=cutoff,
+        max_neighbors=max_neighbors,
+        cache_dir=cache_dir,
+    )
+    with ProcessPoolExecutor(
+        max_workers=n_workers, initializer=_init_graph_worker
+    ) as executor:
+        graph_paths = list(
+            tqdm(
+                executor.map(build_graphs, structures, chunksize=32),
+                total=len(structures),
+                desc="Building ALIGNN graphs",
+            )
+        )
+
+    torch.set_num_threads(n_threads or os.cpu_count() or 1)
+    models = {key: load_alignn_model(name) for key, name in model_names.items()}
+    preds = {key: np.full(len(structures), np.nan) for key in models}
+
+    batch_starts = range(0, len(graph_paths), batch_size)
+    for start in tqdm(batch_starts, desc=f"ALIGNN {', '.join(models)}"):
+        batch_paths = graph_paths[start : start + batch_size]
+        atom_graphs, line_graphs = zip(
+            *(dgl.load_graphs(path)[0] for path in batch_paths), strict=True
+        )
+        batch = [dgl.batch(atom_graphs), dgl.batch(line_graphs)]
+        with torch.inference_mode():
+            for key, model in models.items():
+                out = model(batch).reshape(-1).numpy()
+                preds[key][start : start + len(batch_paths)] = out
+
+    return pd.DataFrame(
+        {f"{key}_alignn": vals for key, vals in preds.items()}, index=structures.index
+    )
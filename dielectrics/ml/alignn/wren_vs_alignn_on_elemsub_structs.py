@@ -1,16 +1,15 @@
 # %%
 import pandas as pd
 import pymatviz as pmv
-from alignn.pretrained import get_figshare_model
-from jarvis.core.graphs import Graph
 from matbench_discovery.data import df_wbm as df_summary
 from pymatgen.core import Structure
 from pymatgen.io.jarvis import JarvisAtomsAdaptor
 from sklearn.metrics import r2_score
-from tqdm import tqdm
 
 from dielectrics import DATA_DIR, PAPER_FIGS, Key, today
 from dielectrics.db import db
+from dielectrics.ml.alignn.predict import alignn_models, predict_alignn
+from dielectrics.ml.wren.ensemble import load_wren_ensemble
 from dielectrics.plots import px
 
 
@@ -29,12 +28,10 @@ df_wbm_step1["jarvis_atoms"] = df_wbm_step1.computed_structure_entry.map(
 
 
 # %%
-df_wren_bandgaps = pd.read_csv(
-    f"{DATA_DIR}/wren/bandgap/wren-bandgap-mp+wbm-ensemble.csv"
-).set_index(Key.mat_id)
-
-df_wren_bandgaps[Key.bandgap_wren] = df_wren_bandgaps.filter(like="pred_n").mean(axis=1)
-df_wren_bandgaps["bandgap_std"] = df_wren_bandgaps.filter(like="pred_n").std(axis=1)
+df_wren_bandgaps = load_wren_ensemble(
+    f"{DATA_DIR}/wren/bandgap/wren-bandgap-mp+wbm-ensemble.csv", Key.bandgap_wren
+)
+df_wren_bandgaps["bandgap_std"] = df_wren_bandgaps[f"{Key.bandgap_wren}_epistemic_std"]
 
 df_wbm_step1[Key.bandgap_wren] = df_wren_bandgaps[Key.bandgap_wren]
 
@@ -86,47 +83,16 @@ assert df_db[Key.mat_id].str.contains("->").all(), (
 )
 
 
-# %% setup which alignn model to use and what df column serves as input
-alignn_models = {
-    Key.bandgap: "jv_mbj_bandgap_alignn",
-    "bandgap_vdw": "jv_optb88vdw_bandgap_alignn",
-    "e_above_hull": "jv_ehull_alignn",
-}
-alignn_models = {k: get_figshare_model(v) for k, v in alignn_models.items()}
-property_name = "bandgap_vdw"
-device = "cpu"
-
-
-# %% save Alignn predictions in new column named pred_col on df_db
-if "jarvis_atoms" not in df_db:
-    df_db["jarvis_atoms"] = df_db[Key.structure].map(JarvisAtomsAdaptor().get_atoms)
-    df_db[["alignn_atom_graph", "alignn_line_graph"]] = [
-        Graph.atom_dgl_multigraph(x, cutoff=8) for x in tqdm(df_db.jarvis_atoms)
-    ]
-    print(f"Done converting {len(df_db):,} structures to Alignn atom+line graphs")
-
-desc = f"Getting Alignn predictions for: {', '.join(alignn_models.keys())}"
-for row in tqdm(df_db.itertuples(), total=len(df_db), desc=desc):
-    idx, atom_graph = row.Index, row.alignn_atom_graph
-    line_graph = row.alignn_line_graph
-
-    for property_name, model in alignn_models.items():
-        pred_col = (
-            f"{property_name}_alignn_{'' if 'final' in Key.structure else 'un'}relaxed"
-        )
-        if pred_col in df_db and not pd.isna(df_db[pred_col][idx]):
-            continue
-
-        pred = model([atom_graph.to(device), line_graph.to(device)]).tolist()
-        if isinstance(pred, list):
-            pred = pred[0]
-        df_db.loc[idx, pred_col] = pred
+# %% save Alignn predictions for all models (see predict.alignn_models) in columns
+# named {property}_alignn_{un}relaxed on df_db, graphs are cached across runs
+relax_suffix = f"{'' if 'final' in Key.structure else 'un'}relaxed"
+df_alignn = predict_alignn(df_db[Key.structure], alignn_models)
+df_db[df_alignn.columns + f"_{relax_suffix}"] = df_alignn.to_numpy()
+print(f"Done getting Alignn predictions for {len(df_db):,} structures")
 
 
 # %%
-df_db.reset_index(drop=True).round(4).drop(
-    columns=["jarvis_atoms", "alignn_atom_graph", "alignn_line_graph"]
-).to_json(
+df_db.reset_index(drop=True).round(4).to_json(
     f"{DATA_DIR}/{today}-alignn-bandgaps-on-elemsub-structures.json.bz2",
     default_handler=lambda x: x.as_dict(),
 )
@@ -2,18 +2,19 @@
 import pandas as pd
 
 from dielectrics import DATA_DIR, Key
+from dielectrics.datasets import read_dataset
 from dielectrics.plots import plt  # side-effect import sets plotly template and plt.rc
 
 
 # %%
 expt = "enrich-big"
 
-df_diel_train = pd.read_json(f"{DATA_DIR}/mp-exploration/mp-diel-{expt}-train.json.bz2")
+df_diel_train = read_dataset(f"mp-exploration/mp-diel-{expt}-train")
 df_diel_train.index.name = Key.mat_id
 df_diel_train = df_diel_train.rename(columns={"band_gap": Key.bandgap})
 
 
-df_diel_test = pd.read_json(f"{DATA_DIR}/mp-exploration/mp-diel-{expt}-test.json.bz2")
+df_diel_test = read_dataset(f"mp-exploration/mp-diel-{expt}-test")
 
 df_diel_test = df_diel_test.rename(columns={"band_gap": Key.bandgap})
 
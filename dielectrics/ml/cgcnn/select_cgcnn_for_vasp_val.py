@@ -2,13 +2,14 @@
 import pandas as pd
 
 from dielectrics import DATA_DIR, Key
+from dielectrics.datasets import read_dataset
 from dielectrics.plots import plt  # side-effect import sets plotly template and plt.rc
 
 
 # %%
 expt = "enrich-big"
 
-df_diel_train = pd.read_json(f"{DATA_DIR}/mp-exploration/mp-diel-{expt}-train.json.bz2")
+df_diel_train = read_dataset(f"mp-exploration/mp-diel-{expt}-train")
 
 df_diel_screen = pd.read_csv(
     f"{DATA_DIR}/mp-exploration/mp-diel-screen.csv.bz2"
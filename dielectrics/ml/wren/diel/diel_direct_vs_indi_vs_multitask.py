@@ -1,17 +1,18 @@
 # %%
-import matplotlib.pyplot as plt
 import pandas as pd
 from sklearn.metrics import r2_score
 
 from dielectrics import DATA_DIR, Key
+from dielectrics.datasets import read_dataset
+from dielectrics.plots import plt  # side-effect import sets plotly template and plt.rc
 
 
 # %%
 expt = "enrich-big"
 
-df_diel_train = pd.read_json(f"{DATA_DIR}/mp-exploration/mp-diel-{expt}-train.json.bz2")
+df_diel_train = read_dataset(f"mp-exploration/mp-diel-{expt}-train")
 
-df_diel_test = pd.read_json(f"{DATA_DIR}/mp-exploration/mp-diel-{expt}-test.json.bz2")
+df_diel_test = read_dataset(f"mp-exploration/mp-diel-{expt}-test")
 
 
 # %%
@@ -5,6 +5,7 @@ import pymatviz as pmv
 
 from dielectrics import DATA_DIR, PAPER_FIGS, Key
 from dielectrics.db.fetch_data import df_diel_from_task_coll
+from dielectrics.ml.wren.ensemble import load_wren_ensemble
 from dielectrics.plots import plt  # side-effect import sets plotly template and plt.rc
 
 
@@ -136,26 +137,24 @@ plt.savefig(img_path)
 
 
 # %% EVALUATING WREN ENSEMBLE STARTS HERE
-df_elec = pd.read_csv(
-    f"{DATA_DIR}/wren/screen/wren-screen-mp+wbm-diel-elec-ensemble-robust"
+ens_csv_path = (
+    f"{DATA_DIR}/wren/screen/wren-screen-mp+wbm-diel-{{}}-ensemble-robust"
     "-trained-on-all-mp.csv"
-).set_index(Key.mat_id)
-df_ionic = pd.read_csv(
-    f"{DATA_DIR}/wren/screen/wren-screen-mp+wbm-diel-ionic-ensemble-robust"
-    "-trained-on-all-mp.csv"
-).set_index(Key.mat_id)
+)
+df_elec = load_wren_ensemble(ens_csv_path.format("elec"), Key.diel_elec_wren)
+df_ionic = load_wren_ensemble(
+    ens_csv_path.format("ionic"),
+    Key.diel_ionic_wren,
+    extra_cols=[Key.formula, Key.wyckoff, Key.bandgap_pbe],
+)
 
 
 # %%
 df_wren = df_ionic[[Key.formula, Key.wyckoff, Key.bandgap_pbe]].copy()
 
 for key, df in zip(("elec", "ionic"), (df_elec, df_ionic), strict=True):
-    df_wren[f"diel_{key}_wren"] = df.filter(like="_pred_n").mean(axis=1)
-
-    df_wren[f"diel_{key}_wren_std"] = (
-        (df.filter(like="_ale_n") ** 2).mean(axis=1)
-        + df.filter(like="_pred_n").var(axis=1)
-    ) ** 0.5
+    col = f"diel_{key}_wren"
+    df_wren[[col, f"{col}_std"]] = df[[col, f"{col}_std"]]
 
 
 df_wren["diel_total_wren_std"] = (
@@ -0,0 +1,123 @@
+"""Aggregate Wren ensemble prediction CSVs into mean and uncertainty columns.
+
+Wren ensemble CSVs hold one {target}_pred_n{i} column per model (plus {target}_ale_n{i}
+for robust models predicting aleatoric uncertainty) and are hundreds of MB. Instead of
+every script reading them whole and re-aggregating with df.filter(like="pred_n"),
+load_wren_ensemble reads only the needed columns once, reduces them in a single NumPy
+pass and caches the small result as zstd-compressed Parquet keyed by the CSV's content
+hash.
+"""
+
+import hashlib
+import os
+from collections.abc import Sequence
+
+import numpy as np
+import pandas as pd
+from numpy.typing import NDArray
+
+from dielectrics import DATA_DIR, Key
+
+
+WREN_ENS_CACHE_DIR = f"{DATA_DIR}/.db_cache/wren-ensembles"
+
+
+def get_ensemble_cols(csv_path: str) -> tuple[list[str], list[str]]:
+    """Split a Wren ensemble CSV's header into per-model prediction (pred_n) and
+    aleatoric uncertainty (ale_n) columns without reading any rows.
+    """
+    header = pd.read_csv(csv_path, nrows=0).columns
+    pred_cols = [col for col in header if "pred_n" in col]
+    ale_cols = [col for col in header if "ale_n" in col]
+    if not pred_cols:
+        raise ValueError(f"no *pred_n* columns in {csv_path}")
+    return pred_cols, ale_cols
+
+
+def aggregate_ensemble(
+    preds: NDArray[np.float64], ales: NDArray[np.float64] | None = None
+) -> dict[str, NDArray[np.float64]]:
+    """Ensemble mean, epistemic and aleatoric uncertainty from stacked model outputs.
+
+    Args:
+        preds (np.ndarray): Shape (n_samples, n_models) predictions.
+        ales (np.ndarray, optional): Shape (n_samples, n_models) aleatoric stds
+            predicted by robust models. Defaults to None (no aleatoric term).
+
+    Returns:
+        dict[str, np.ndarray]: mean, epistemic_std (std across models, ddof=1 like
+            pandas), aleatoric_std (model aleatoric stds averaged in quadrature) and
+            std = sqrt(epistemic_var + aleatoric_var).
+    """
+    n_models = np.sum(~np.isnan(preds), axis=1)
+    mean = np.nanmean(preds, axis=1)
+    # sum of squared deviations / (n - 1), NaN for single-model rows like pandas var()
+    sq_dev = np.nansum((preds - mean[:, None]) ** 2, axis=1)
+    epi_var = sq_dev / np.where(n_models > 1, n_models - 1, np.nan)
+
+    ale_var = np.zeros(len(preds))
+    if ales is not None and ales.shape[1] > 0:
+        ale_var = np.nan_to_num(np.nanmean(ales**2, axis=1))
+
+    return {
+        "mean": mean,
+        "epistemic_std": epi_var**0.5,
+        "aleatoric_std": ale_var**0.5,
+        "std": (epi_var + ale_var) ** 0.5,
+    }
+
+
+def load_wren_ensemble(
+    csv_path: str,
+    target: str,
+    *,
+    extra_cols: Sequence[str] = (),
+    cache: bool = True,
+    cache_dir: str = WREN_ENS_CACHE_DIR,
+) -> pd.DataFrame:
+    """Load ensemble mean and uncertainties from a Wren ensemble prediction CSV.
+
+    Args:
+        csv_path (str): Path to Wren ensemble CSV with a material_id column.
+        target (str): Name for the output columns, e.g. Key.diel_elec_wren.
+        extra_cols (Sequence[str], optional): Other CSV columns to keep, e.g.
+            formula or wyckoff. Defaults to ().
+        cache (bool, optional): If True (default), reuse the reduced result cached
+            for an identical CSV.
+        cache_dir (str, optional): Cache directory. Defaults to WREN_ENS_CACHE_DIR.
+
+    Returns:
+        pd.DataFrame: Indexed by material ID with extra_cols plus {target},
+            {target}_std, {target}_epistemic_std and {target}_aleatoric_std.
+    """
+    with open(csv_path, mode="rb") as file:
+        csv_hash = hashlib.file_digest(file, "sha256").hexdigest()[:16]
+    cols_key = hashlib.sha256(f"{target=}, {extra_cols=}".encode()).hexdigest()[:8]
+    cache_path = f"{cache_dir}/{csv_hash}-{cols_key}.parquet"
+
+    if cache and os.path.isfile(cache_path):
+        return pd.read_parquet(cache_path).set_index(Key.mat_id)
+
+    pred_cols, ale_cols = get_ensemble_cols(csv_path)
+    use_cols = [Key.mat_id, *extra_cols, *pred_cols, *ale_cols]
+    # keep_default_na=False so the formula of sodium nitride 'NaN' stays a string
+    df_csv = pd.read_csv(
+        csv_path, usecols=use_cols, keep_default_na=False, na_values=[""]
+    )
+
+    agg = aggregate_ensemble(
+        df_csv[pred_cols].to_numpy(dtype=float),
+        df_csv[ale_cols].to_numpy(dtype=float) if ale_cols else None,
+    )
+    df_ens = df_csv[[Key.mat_id, *extra_cols]].copy()
+    df_ens[target] = agg["mean"]
+    for key in ("std", "epistemic_std", "aleatoric_std"):
+        df_ens[f"{target}_{key}"] = agg[key]
+
+    if cache:
+        os.makedirs(cache_dir, exist_ok=True)
+        # write to temp file first so an interrupted run never leaves a corrupt cache
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        df_ens.to_parquet(tmp_path, compression="zstd", index=False)
+        os.replace(tmp_path, cache_path)
+    return df_ens.set_index(Key.mat_id)
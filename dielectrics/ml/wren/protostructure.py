@@ -0,0 +1,128 @@
+"""Protostructure (Aflow-style Wyckoff) labels used as Wren inputs.
+
+Labelling needs a symmetry analysis per structure and is the slowest part of preparing
+Wren training and screening sets. get_protostructure_labels spreads it over a process
+pool and stores labels on disk keyed by structure hash and symprec so each structure
+is only analyzed once. Element-substituted structures share the symmetry of their
+parent, so get_elemsub_protostructure_labels derives their labels from the parent label
+without any symmetry analysis.
+"""
+
+import functools
+import gzip
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+from matbench_discovery.structure.prototype import get_protostructure_label
+from pymatgen.core import Structure
+from tqdm import tqdm
+
+from dielectrics import DATA_DIR, struct_hash
+from dielectrics.element_substitution import replace_elems_in_aflow_wyckoff
+
+
+PROTO_LABEL_DIR = f"{DATA_DIR}/.db_cache/protostructure-labels"
+
+
+def label_store_path(symprec: float, store_dir: str = PROTO_LABEL_DIR) -> str:
+    """Path of the label store for one symprec."""
+    return f"{store_dir}/{symprec=}.json.gz"
+
+
+def load_label_store(
+    symprec: float, store_dir: str = PROTO_LABEL_DIR
+) -> dict[str, str | None]:
+    """Map of structure hash to protostructure label (None if labelling failed)."""
+    if not os.path.isfile(path := label_store_path(symprec, store_dir)):
+        return {}
+    with gzip.open(path, mode="rt", encoding="utf-8") as file:
+        return json.load(file)
+
+
+def label_struct(struct: Structure, symprec: float = 0.1) -> str | None:
+    """Protostructure label of a single structure."""
+    return get_protostructure_label(struct, init_symprec=symprec)
+
+
+def get_protostructure_labels(
+    structures: pd.Series,
+    *,
+    symprec: float = 0.1,
+    n_workers: int | None = None,
+    chunksize: int = 64,
+    cache: bool = True,
+    store_dir: str = PROTO_LABEL_DIR,
+) -> pd.Series:
+    """Compute protostructure labels for many structures in a process pool.
+
+    Args:
+        structures (pd.Series): Structures to label. Index is kept for the output.
+        symprec (float, optional): Symmetry precision for spglib. Defaults to 0.1.
+        n_workers (int, optional): Number of worker processes. Defaults to
+            os.cpu_count(). 1 labels in the current process.
+        chunksize (int, optional): Structures sent to a worker at a time. Defaults
+            to 64.
+        cache (bool, optional): If True (default), read labels of previously seen
+            structures from the store in store_dir and add new ones to it.
+        store_dir (str, optional): Label store directory. Defaults to
+            PROTO_LABEL_DIR.
+
+    Returns:
+        pd.Series: Protostructure labels with the same index as structures.
+    """
+    hashes = [struct_hash(struct) for struct in structures]
+    label_store = load_label_store(symprec, store_dir) if cache else {}
+    # label each unique unseen structure once
+    todo = dict(zip(hashes, structures, strict=True))
+    todo = {hsh: struct for hsh, struct in todo.items() if hsh not in label_store}
+
+    label = functools.partial(label_struct, symprec=symprec)
+    if n_workers == 1 or len(todo) < 2:
+        new_labels = list(map(label, tqdm(todo.values(), desc="Protostructures")))
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            new_labels = list(
+                tqdm(
+                    executor.map(label, todo.values(), chunksize=chunksize),
+                    total=len(todo),
+                    desc="Protostructures",
+                )
+            )
+    label_store |= dict(zip(todo, new_labels, strict=True))
+
+    if cache and todo:
+        os.makedirs(store_dir, exist_ok=True)
+        store_path = label_store_path(symprec, store_dir)
+        # write to temp file first so concurrent runs never read a half-written store
+        tmp_path = f"{store_path}.{os.getpid()}.tmp"
+        with gzip.open(tmp_path, mode="wt", encoding="utf-8") as file:
+            json.dump(label_store, file)
+        os.replace(tmp_path, store_path)
+
+    return pd.Series(
+        [label_store[hsh] for hsh in hashes], index=structures.index, dtype=object
+    )
+
+
+def get_elemsub_protostructure_labels(
+    parent_labels: pd.Series, elem_swaps: pd.Series
+) -> pd.Series:
+    """Protostructure labels of element-substituted structures from their parents'.
+
+    Args:
+        parent_labels (pd.Series): Protostructure labels of the original structures.
+        elem_swaps (pd.Series): (old_elem, new_elem) tuples or old -> new element
+            dicts, aligned with parent_labels.
+
+    Returns:
+        pd.Series: Labels with elements swapped, same index as parent_labels.
+    """
+    labels = [
+        replace_elems_in_aflow_wyckoff(
+            label, swap if isinstance(swap, dict) else dict([swap])
+        )
+        for label, swap in zip(parent_labels, elem_swaps, strict=True)
+    ]
+    return pd.Series(labels, index=parent_labels.index, dtype=object)
@@ -1,146 +1,79 @@
 # %%
-import matplotlib.pyplot as plt
-import pandas as pd
+import functools
+
 import pymatviz as pmv
 from matplotlib.transforms import blended_transform_factory
-from pymatgen.core import Composition
 
 from dielectrics import DATA_DIR, Key
+from dielectrics.datasets import read_dataset
 from dielectrics.element_substitution import df_struct_apply_elem_substitution
+from dielectrics.formula_index import is_known
+from dielectrics.ml.wren.stream_select import stream_top_k_wren_preds
+from dielectrics.plots import plt  # side-effect import sets plotly template and plt.rc
 
 
 # %%
-df_ene = pd.read_csv(
-    f"{DATA_DIR}/wren/screen/wren-e_form-ens-rhys-screen-mp-top1k-fom-elemsub.csv"
-).set_index(Key.mat_id)
-
-df_elec = pd.read_csv(
-    f"{DATA_DIR}/wren/screen/wren-diel-elec-ens-trained-on-all-mp-screen-mp-top1k-fom-elemsub.csv"
-).set_index(Key.mat_id)
-
-df_ionic = pd.read_csv(
-    f"{DATA_DIR}/wren/screen/wren-diel-ionic-ens-trained-on-all-mp-screen-mp-top1k-fom-elemsub.csv"
-).set_index(Key.mat_id)
-
-df_bandgap = pd.read_csv(
-    f"{DATA_DIR}/wren/screen/wren-bandgap-mp+wbm-ensemble-screen-mp-top1k-fom-elemsub.csv"
-).set_index(Key.mat_id)
-
-
-for df in [df_ene, df_elec, df_ionic, df_bandgap]:
-    # Replace NaN values in formula/composition columns stemming from incorrectly
-    # parsed chemical formula for sodium nitride with string 'NaN'.
-    df[Key.formula].fillna("NaN", inplace=True)  # noqa: PD002
-
-
-# %%
-dfs = (df_elec, df_ionic, df_bandgap)
-cols = (Key.diel_elec_wren, Key.diel_ionic_wren, Key.bandgap_wren)
-
-id_cols = [Key.formula, Key.wyckoff, Key.e_form_wren, "e_form_wren_std"]
-ene_cols = [Key.e_above_hull_wren, "e_above_hull_wren_std_adj"]
-df_wren = df_ene[id_cols + ene_cols].copy()
-
-for col, df in zip(cols, dfs, strict=True):
-    df_wren[col] = df.filter(like="pred_n").mean(axis=1)
-    df_wren[f"{col}_std"] = (
-        df.filter(like="pred_n").var(axis=1)
-        # average aleatoric uncertainties in quadrature
-        + (df.filter(like="ale_n") ** 2).mean(axis=1).fillna(0)
-    ) ** 0.5
-
-
-# %%
-df_wren[Key.diel_total_wren] = (
-    df_wren[Key.diel_elec_wren] + df_wren[Key.diel_ionic_wren]
-)
-
-df_wren[Key.fom_wren] = (df_wren[Key.diel_total_wren] * df_wren[Key.bandgap_wren]).clip(
-    0
+screen_dir = f"{DATA_DIR}/wren/screen"
+e_form_csv = f"{screen_dir}/wren-e_form-ens-rhys-screen-mp-top1k-fom-elemsub.csv"
+ens_csv_names = {
+    Key.diel_elec_wren: "wren-diel-elec-ens-trained-on-all-mp",
+    Key.diel_ionic_wren: "wren-diel-ionic-ens-trained-on-all-mp",
+    Key.bandgap_wren: "wren-bandgap-mp+wbm-ensemble",
+}
+ens_csvs = {
+    col: f"{screen_dir}/{csv_name}-screen-mp-top1k-fom-elemsub.csv"
+    for col, csv_name in ens_csv_names.items()
+}
+# canonicalizes formulas before looking them up in the MP formula index
+is_mp_formula = functools.partial(is_known, sources=("mp",))
+
+
+# %% single streaming pass over the screen CSVs: ensemble means and stds (epistemic +
+# aleatoric in quadrature) are aggregated per chunk and only a bounded heap of the
+# top-k candidates by uncertainty adjusted figure of merit FoM_std_adj = FoM - 0.5 *
+# FoM_std plus a uniform random sample of the whole screen (for the plots below) are
+# kept in memory. FoM uncertainty sums relative uncertainties in band gap and diel
+# total in quadrature, then multiplies by abs(FoM). Candidates are filtered to
+# - compositions without existing MP dielectric properties (stands to reason MP
+#   already took the lowest lying polymorph so no point checking any other material
+#   with same composition)
+# - 2 to 4 elements (unaries won't be novel, higher than quaternary hard to make)
+# - Wren band gap >= 0.5 eV
+keep_top = 4_000
+top_fom, df_wren = stream_top_k_wren_preds(
+    e_form_csv,
+    ens_csvs,
+    k=keep_top,
+    is_excluded=is_mp_formula,
+    sample_size=100_000,
 )
 
-df_wren["fom_wren_rank"] = df_wren[Key.fom_wren].rank(ascending=False).astype(int)
-
-
-# df_wren.round(4).to_csv(
-#     f"{DATA_DIR}/wren/screen/wren-ens-screen-mp-top1k-fom-elemsub.csv"
-# )
-
-# new col intentionally not saved to CSV
-df_wren["fom_wren_rank_size"] = len(df_wren)
-
 
-# %% calculate and analyze fom_wren_std
-df_wren["n_elems"] = df_wren[Key.formula].map(Composition).map(len)
+# %% analyze fom_wren_std on the random sample of the screen
 df_wren.n_elems.value_counts()
 
-
-df_wren.diel_total_wren_std = (
-    df_wren.diel_elec_wren_std**2 + df_wren.diel_ionic_wren_std**2
-) ** 0.5
-
-# to get FoM uncertainty, sum relative uncertainties in band gap and diel total in
-# quadrature, then multiply by abs(FoM)
-df_wren["fom_wren_std"] = (
-    (df_wren[Key.diel_total_wren] * df_wren.bandgap_wren_std) ** 2
-    + (df_wren[Key.bandgap_wren] * df_wren.diel_total_wren_std) ** 2
-) ** 0.5
-
 fom_std_spearmen = df_wren[["fom_wren_std", Key.fom_wren]].corr(method="spearman")
 print(f"FoM Wren with std correlation: {fom_std_spearmen}")
 
-df_wren.query("fom_wren > 100 and diel_total_wren < 2000").sample(5000).plot.scatter(
-    x=Key.diel_total_wren, y=Key.fom_wren, yerr="fom_wren_std"
-)
-
-df_wren.query("fom_wren > 100 and diel_total_wren < 2000").sample(5000).plot.scatter(
-    x=Key.bandgap_wren, y=Key.fom_wren, yerr="fom_wren_std"
-)
+df_high_fom = df_wren.query("fom_wren > 100 and diel_total_wren < 2000")
+df_high_fom = df_high_fom.sample(min(5000, len(df_high_fom)))
+df_high_fom.plot.scatter(x=Key.diel_total_wren, y=Key.fom_wren, yerr="fom_wren_std")
+df_high_fom.plot.scatter(x=Key.bandgap_wren, y=Key.fom_wren, yerr="fom_wren_std")
 
-ax1 = (df_wren[Key.fom_wren] - 0.5 * df_wren.fom_wren_std).hist(bins=100, log=True)
+ax1 = df_wren[Key.fom_wren_std_adj].hist(bins=100, log=True)
 ax1.set(title="fom_wren - fom_wren_std")
 plt.show()
 ax2 = df_wren[Key.fom_wren].hist(bins=100, log=True)
 ax2.set(title=Key.fom_wren)
 
-# pick as uncertainty adjusted figure of merit FoM_std_adj = FoM - c * FoM_std
-df_wren[Key.fom_wren_std_adj] = df_wren[Key.fom_wren] - 0.5 * df_wren.fom_wren_std
-
-df_wren["fom_wren_std_adj_rank"] = (
-    df_wren[Key.fom_wren_std_adj].rank(ascending=False).astype(int)
-)
-
-
-# %%
-df_all_mp_formulas = pd.read_csv(
-    f"{DATA_DIR}/mp-exploration/all-mp-formulas.csv"
-).set_index(Key.mat_id)
-
-
-# %% makes little difference whether comparing formula strings or Composition objects
-df_clean = df_wren.copy()
-
-is_mp_formula = df_clean[Key.formula].isin(df_all_mp_formulas[Key.formula])
-
-print(
-    "removing compositions with existing MP dielectric properties: "
-    # stands to reason MP already took the lowest lying polymorph so no point checking
-    # any other material with same composition
-    f"{len(df_clean):,} -> {sum(~is_mp_formula):,}"
-)
-df_clean = df_clean[~is_mp_formula]
-
-n_elem_2to4 = (df_clean.n_elems > 1) & (df_clean.n_elems < 5)
-print(f"removing n_elems = 1 or > 4: {len(df_clean):,} -> {sum(n_elem_2to4):,}")
-# drop unary and higher-than quaternary compounds, former won't be novel, latter hard
-# to make
-df_clean = df_clean[n_elem_2to4]
 
-small_bandgap = df_clean[Key.bandgap_wren] < 0.5
-print(f"removing small bandgap: {len(df_clean):,} -> {sum(~small_bandgap):,}")
-# drop unary and higher-than quaternary compounds, former won't be novel, latter hard
-# to make
-df_clean = df_clean[~small_bandgap]
+# %% same filters as applied while streaming, on the random sample
+df_clean = df_wren[
+    ~is_mp_formula(df_wren[Key.formula])
+    & df_wren.n_elems.between(2, 4)
+    & (df_wren[Key.bandgap_wren] >= 0.5)
+]
+print(f"{len(df_clean):,} of {len(df_wren):,} sampled substitutions pass filters")
 
 
 # %%
@@ -150,9 +83,10 @@ axs2 = df_clean[
 ].hist(bins=100, figsize=[18, 8], log=True)
 
 
-# mark top 1k threshold as that's about how many candidates we can run DFT on
+# mark top 1k threshold of the selected candidates as that's about how many
+# candidates we can run DFT on
 for ax in (*axs1.flat, *axs2.flat):
-    xloc = df_clean[ax.get_title()].nlargest(1000).min()
+    xloc = top_fom[ax.get_title()].nlargest(1000).min()
     ax.axvline(xloc, color="darkorange", linestyle="dashed", linewidth=2)
 
     trans = blended_transform_factory(
@@ -168,7 +102,7 @@ fig.show()
 
 cbar_title = "Elemental distribution of top 1k Wren-predicted FoMs"
 fig = pmv.ptable_heatmap(
-    df_clean.nlargest(1000, Key.fom_wren_std_adj)[Key.formula],
+    top_fom.nlargest(1000, Key.fom_wren_std_adj)[Key.formula],
     colorbar=dict(title=cbar_title),
 )
 fig.show()
@@ -176,13 +110,13 @@ fig.show()
 
 
 # %%
-df_mp_diel = pd.read_json(f"{DATA_DIR}/mp-exploration/mp-diel-train.json.bz2")
+df_mp_diel = read_dataset(
+    "mp-exploration/mp-diel-train",
+    columns=[Key.structure, Key.diel_elec_mp, Key.diel_ionic_mp, Key.diel_total_mp],
+)
 
 
 # %%
-keep_top = 4_000
-top_fom: pd.DataFrame = df_clean.nlargest(keep_top, Key.fom_wren_std_adj)
-
 top_fom = top_fom.reset_index()
 top_fom.index = top_fom[Key.mat_id].str.split(":").str[0]
 top_fom[Key.structure] = df_mp_diel[Key.structure]
@@ -6,6 +6,7 @@ from matbench_discovery.data import df_wbm as df_summary
 from mp_api.client import MPRester
 
 from dielectrics import DATA_DIR, Key
+from dielectrics.datasets import read_dataset
 from dielectrics.plots import plt  # side-effect import sets plotly template and plt.rc
 
 
@@ -59,7 +60,7 @@ df_top_1k.describe().round(2)
 
 
 # %%
-df_mp_diel = pd.read_json(f"{DATA_DIR}/mp-exploration/mp-diel-train.json.bz2")
+df_mp_diel = read_dataset("mp-exploration/mp-diel-train")
 
 # discard negative and unrealistically large dielectric constants
 df_mp_diel = df_mp_diel.query("0 < diel_total_mp < 2000").round(3)
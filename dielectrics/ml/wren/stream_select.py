@@ -0,0 +1,201 @@
+"""Streaming top-k selection of Wren-screened element substitutions for DFT validation.
+
+Reads the formation energy, electronic/ionic dielectric and band gap ensemble CSVs of
+a screen in lockstep chunks, computes the std-adjusted figure of merit per chunk and
+keeps only a bounded min-heap of the k best candidates plus an optional uniform random
+sample of all screened rows for exploratory plots. Memory stays constant in the number
+of screened substitutions.
+"""
+
+import heapq
+import itertools
+from collections.abc import Callable, Iterator
+from contextlib import ExitStack
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+from dielectrics import Key
+from dielectrics.ml.wren.ensemble import aggregate_ensemble, get_ensemble_cols
+
+
+# columns taken as-is from the formation energy screen CSV
+e_form_cols = (
+    Key.formula,
+    Key.wyckoff,
+    Key.e_form_wren,
+    "e_form_wren_std",
+    Key.e_above_hull_wren,
+    "e_above_hull_wren_std_adj",
+)
+ens_targets = (Key.diel_elec_wren, Key.diel_ionic_wren, Key.bandgap_wren)
+
+
+def add_fom_cols(df_chunk: pd.DataFrame, std_factor: float = 0.5) -> pd.DataFrame:
+    """Add diel_total_wren(_std), fom_wren(_std) and fom_wren_std_adj = fom_wren -
+    std_factor * fom_wren_std to a chunk with elec/ionic/band gap mean and std columns.
+    """
+    diel_total = df_chunk[Key.diel_elec_wren] + df_chunk[Key.diel_ionic_wren]
+    diel_total_std = (
+        df_chunk["diel_elec_wren_std"] ** 2 + df_chunk["diel_ionic_wren_std"] ** 2
+    ) ** 0.5
+    bandgap, bandgap_std = df_chunk[Key.bandgap_wren], df_chunk["bandgap_wren_std"]
+
+    df_chunk[Key.diel_total_wren] = diel_total
+    df_chunk["diel_total_wren_std"] = diel_total_std
+    df_chunk[Key.fom_wren] = (diel_total * bandgap).clip(0)
+    # sum relative uncertainties in band gap and diel total in quadrature
+    df_chunk["fom_wren_std"] = (
+        (diel_total * bandgap_std) ** 2 + (bandgap * diel_total_std) ** 2
+    ) ** 0.5
+    df_chunk[Key.fom_wren_std_adj] = (
+        df_chunk[Key.fom_wren] - std_factor * df_chunk["fom_wren_std"]
+    )
+    return df_chunk
+
+
+def iter_screen_chunks(
+    e_form_csv: str, ens_csvs: dict[str, str], chunksize: int = 200_000
+) -> Iterator[pd.DataFrame]:
+    """Yield chunks of the joined screen with ensemble means and stds for each target
+    in ens_csvs. All CSVs must list the same material IDs in the same order (as
+    written by Wren for one screening input set).
+
+    Raises:
+        ValueError: If material IDs of a chunk differ between files.
+    """
+    # keep_default_na=False: don't parse the formula of sodium nitride 'NaN' as missing
+    csv_kwargs = dict(chunksize=chunksize, keep_default_na=False, na_values=[""])
+    with ExitStack() as stack:
+        e_form_reader = stack.enter_context(
+            pd.read_csv(e_form_csv, usecols=[Key.mat_id, *e_form_cols], **csv_kwargs)
+        )
+        ens_readers, ens_cols = {}, {}
+        for target, csv_path in ens_csvs.items():
+            pred_cols, ale_cols = ens_cols[target] = get_ensemble_cols(csv_path)
+            use_cols = [Key.mat_id, *pred_cols, *ale_cols]
+            ens_readers[target] = stack.enter_context(
+                pd.read_csv(csv_path, usecols=use_cols, **csv_kwargs)
+            )
+
+        for df_e_form, *ens_chunks in zip(
+            e_form_reader, *ens_readers.values(), strict=True
+        ):
+            df_chunk = df_e_form.set_index(Key.mat_id)
+            for (target, (pred_cols, ale_cols)), df_ens in zip(
+                ens_cols.items(), ens_chunks, strict=True
+            ):
+                if not np.array_equal(df_ens[Key.mat_id], df_chunk.index):
+                    raise ValueError(f"material IDs in {target} CSV not aligned")
+                agg = aggregate_ensemble(
+                    df_ens[pred_cols].to_numpy(dtype=float),
+                    df_ens[ale_cols].to_numpy(dtype=float) if ale_cols else None,
+                )
+                df_chunk[target] = agg["mean"]
+                df_chunk[f"{target}_std"] = agg["std"]
+            yield df_chunk
+
+
+def stream_top_k_wren_preds(
+    e_form_csv: str,
+    ens_csvs: dict[str, str],
+    *,
+    k: int = 4_000,
+    is_excluded: Callable[[pd.Series], pd.Series] | None = None,
+    min_n_elems: int = 2,
+    max_n_elems: int = 4,
+    min_bandgap: float = 0.5,
+    chunksize: int = 200_000,
+    sample_size: int = 0,
+    seed: int = 0,
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Select the top-k screened substitutions by std-adjusted Wren figure of merit
+    while streaming through the prediction CSVs, all in a single pass.
+
+    Args:
+        e_form_csv (str): Formation energy/hull distance screen CSV with columns
+            e_form_cols.
+        ens_csvs (dict[str, str]): Maps each of ens_targets to its ensemble CSV.
+        k (int, optional): Number of candidates to keep. Defaults to 4,000.
+        is_excluded (Callable[[pd.Series], pd.Series], optional): Called with the
+            formula column of each chunk, returns a boolean mask of rows to skip.
+            E.g. functools.partial(is_known, sources=("mp",)) from
+            dielectrics.formula_index to skip compositions that already have MP
+            dielectric data, matched on canonical reduced formulas so differently
+            formatted formulas of the same composition are excluded too. Defaults to
+            None (exclude nothing).
+        min_n_elems (int, optional): Min number of elements. Defaults to 2 (no
+            unaries, those won't be novel).
+        max_n_elems (int, optional): Max number of elements. Defaults to 4 (higher
+            than quaternary is hard to synthesize).
+        min_bandgap (float, optional): Min Wren band gap in eV. Defaults to 0.5.
+        chunksize (int, optional): Rows read per CSV chunk. Defaults to 200,000.
+        sample_size (int, optional): Number of rows to draw uniformly at random
+            (before filtering) from the whole screen. Defaults to 0 (no sample).
+        seed (int, optional): Random seed for the sample. Defaults to 0.
+
+    Returns:
+        tuple[pd.DataFrame, pd.DataFrame]: Top-k candidates sorted by descending
+            fom_wren_std_adj and the random sample, both indexed by material ID
+            with n_elems, FoM and uncertainty columns.
+    """
+    if missing := set(ens_targets) - set(ens_csvs):
+        raise ValueError(f"ens_csvs missing {missing}")
+
+    # min-heap of (fom_wren_std_adj, tiebreak, mat_id, row) holding the k best so far
+    heap: list[tuple[float, int, str, dict[str, Any]]] = []
+    tiebreak = itertools.count()
+    # bottom-k by uniform random key is a uniform sample without replacement
+    rng = np.random.default_rng(seed)
+    df_sample = pd.DataFrame(columns=[Key.mat_id]).set_index(Key.mat_id)
+    n_seen = n_novel = n_elems_ok = n_kept = 0
+
+    for df_chunk in iter_screen_chunks(e_form_csv, ens_csvs, chunksize=chunksize):
+        n_seen += len(df_chunk)
+        # reduced formulas list each element once, so capitals count elements
+        df_chunk["n_elems"] = df_chunk[Key.formula].str.count("[A-Z]")
+        add_fom_cols(df_chunk)
+        if sample_size > 0:
+            df_keyed = df_chunk.assign(_sample_key=rng.random(len(df_chunk)))
+            if not df_sample.empty:
+                df_keyed = pd.concat([df_sample, df_keyed])
+            df_sample = df_keyed.nsmallest(sample_size, "_sample_key")
+
+        is_novel = np.ones(len(df_chunk), dtype=bool)
+        if is_excluded is not None:
+            is_novel = ~np.asarray(is_excluded(df_chunk[Key.formula]), dtype=bool)
+        has_n_elems = is_novel & df_chunk.n_elems.between(min_n_elems, max_n_elems)
+        passes_filters = has_n_elems & (df_chunk[Key.bandgap_wren] >= min_bandgap)
+        n_novel += is_novel.sum()
+        n_elems_ok += has_n_elems.sum()
+        df_cands = df_chunk[passes_filters].dropna(subset=[Key.fom_wren_std_adj])
+        n_kept += len(df_cands)
+
+        # only rows beating the current k-th best can enter the heap
+        if len(heap) == k:
+            df_cands = df_cands[df_cands[Key.fom_wren_std_adj] > heap[0][0]]
+        df_cands = df_cands.nlargest(k, Key.fom_wren_std_adj)
+
+        for mat_id, row in zip(
+            df_cands.index, df_cands.to_dict(orient="records"), strict=True
+        ):
+            item = (row[Key.fom_wren_std_adj], next(tiebreak), mat_id, row)
+            if len(heap) < k:
+                heapq.heappush(heap, item)
+            elif item[0] > heap[0][0]:
+                heapq.heapreplace(heap, item)
+
+    print(
+        f"streamed {n_seen:,} substitutions -> {n_novel:,} not excluded -> "
+        f"{n_elems_ok:,} with {min_n_elems} to {max_n_elems} elements -> {n_kept:,} "
+        f"with band gap >= {min_bandgap} eV, kept top {len(heap):,} by "
+        f"{Key.fom_wren_std_adj}"
+    )
+    df_top = pd.DataFrame(
+        [row for *_, row in heap], index=pd.Index([item[2] for item in heap])
+    )
+    df_top.index.name = Key.mat_id
+    df_top = df_top.sort_values(Key.fom_wren_std_adj, ascending=False)
+    df_sample = df_sample.drop(columns="_sample_key", errors="ignore").sort_index()
+    return df_top, df_sample
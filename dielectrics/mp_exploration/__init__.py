@@ -1,13 +1,32 @@
 """Fetch and explore Materials Project dielectric data."""
 
+import json
+import os
 from collections.abc import Sequence
 from typing import Any
 
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
 from emmet.core.summary import HasProps
-from mp_api.client import MPRester
+from pymatgen.core import Structure
+from tqdm import tqdm
 
 from dielectrics import Key
+from dielectrics.datasets import (
+    pack_structures,
+    packed_struct_fields,
+    packed_struct_keys,
+    read_dataset,
+    struct_cols_key,
+    unpack_structures,
+)
+from dielectrics.mp_exploration.fetch import (
+    iter_mp_search_chunks,
+    mp_search,
+    mp_search_chunked,
+)
 
 
 # MP summary fields pulled for every material. Scalar dielectric averages live under
@@ -34,6 +53,7 @@ def fetch_mp_dielectric_structures(
     material_ids: str | Sequence[str] | None = None,
     *,
     has_dielectric: bool = False,
+    replay: bool = False,
     **search_kwargs: Any,
 ) -> pd.DataFrame:
     """Fetch materials from Materials Project with structure and properties relevant to
@@ -45,6 +65,8 @@ def fetch_mp_dielectric_structures(
             thereof. Defaults to None to query by other filters instead.
         has_dielectric (bool): If True, restrict to materials with computed dielectric
             properties (adds has_props=[HasProps.dielectric]). Defaults to False.
+        replay (bool): If True, serve cached API responses only (see
+            dielectrics.mp_exploration.fetch). Defaults to False.
         **search_kwargs (Any): Extra keyword filters forwarded to
             MPRester().materials.summary.search, e.g. band_gap=(0.5, None),
             energy_above_hull=(None, 0.1), num_elements=(5, 10), num_sites=(100, None).
@@ -57,36 +79,54 @@ def fetch_mp_dielectric_structures(
     if has_dielectric:
         search_kwargs["has_props"] = [HasProps.dielectric]
 
-    with MPRester() as mpr:
-        docs = mpr.materials.summary.search(
-            material_ids=list(material_ids) if material_ids is not None else None,
+    if material_ids is None:
+        docs = mp_search(
+            "materials.summary", fields=summary_fields, replay=replay, **search_kwargs
+        )
+    else:
+        docs = mp_search_chunked(
+            "materials.summary",
+            material_ids,
             fields=summary_fields,
+            replay=replay,
             **search_kwargs,
         )
 
-    df_mp_diel = pd.DataFrame(
-        [
-            {
-                Key.mat_id: str(doc.material_id),
-                Key.formula: doc.formula_pretty,
-                Key.bandgap_mp: doc.band_gap,
-                "e_form_mp": doc.formation_energy_per_atom,
-                Key.e_above_hull_mp: doc.energy_above_hull,
-                Key.n_sites: doc.nsites,
-                "n_elements": doc.nelements,
-                "spacegroup_mp": doc.symmetry.number,
-                Key.crystal_sys: str(doc.symmetry.crystal_system),
-                Key.structure: doc.structure,
-                Key.diel_total_mp: doc.e_total,
-                Key.diel_elec_mp: doc.e_electronic,
-                "n_mp": doc.n,
-                "icsd_ids": (doc.database_IDs or {}).get("icsd", []),
-                "task_ids": doc.task_ids,
-            }
-            for doc in docs
-        ]
-    )
+    df_mp_diel = pd.DataFrame([summary_doc_to_row(doc) for doc in docs])
+    return add_derived_cols(df_mp_diel)
 
+
+def summary_doc_to_row(doc: dict[str, Any]) -> dict[str, Any]:
+    """Flatten a raw MP summary doc (as returned with use_document_model=False) into a
+    row of dielectric screening columns.
+    """
+    symmetry = doc.get("symmetry") or {}
+    crystal_sys = symmetry.get("crystal_system")
+    struct = doc.get("structure")
+    return {
+        Key.mat_id: str(doc["material_id"]),
+        Key.formula: doc.get("formula_pretty"),
+        Key.bandgap_mp: doc.get("band_gap"),
+        "e_form_mp": doc.get("formation_energy_per_atom"),
+        Key.e_above_hull_mp: doc.get("energy_above_hull"),
+        Key.n_sites: doc.get("nsites"),
+        "n_elements": doc.get("nelements"),
+        "spacegroup_mp": symmetry.get("number"),
+        # CrystalSystem enum with document models, plain string in raw docs
+        Key.crystal_sys: None if crystal_sys is None else str(crystal_sys),
+        Key.structure: Structure.from_dict(struct)
+        if isinstance(struct, dict)
+        else struct,
+        Key.diel_total_mp: doc.get("e_total"),
+        Key.diel_elec_mp: doc.get("e_electronic"),
+        "n_mp": doc.get("n"),
+        "icsd_ids": (doc.get("database_IDs") or {}).get("icsd", []),
+        "task_ids": doc.get("task_ids"),
+    }
+
+
+def add_derived_cols(df_mp_diel: pd.DataFrame) -> pd.DataFrame:
+    """Add columns computed from fetched MP dielectric data."""
     if Key.diel_total_mp in df_mp_diel:
         df_mp_diel[Key.diel_elec_wren] = (
             df_mp_diel[Key.diel_total_mp] - df_mp_diel[Key.diel_elec_mp]
@@ -96,3 +136,193 @@ def fetch_mp_dielectric_structures(
         )
 
     return df_mp_diel
+
+
+# Parquet schema of paged MP dielectric data. Structures are packed like in
+# dielectrics.datasets so the output can also be loaded with read_dataset
+paged_schema = pa.schema(
+    [
+        (str(Key.mat_id), pa.string()),
+        (str(Key.formula), pa.string()),
+        (str(Key.bandgap_mp), pa.float64()),
+        ("e_form_mp", pa.float64()),
+        (str(Key.e_above_hull_mp), pa.float64()),
+        (str(Key.n_sites), pa.int32()),
+        ("n_elements", pa.int32()),
+        ("spacegroup_mp", pa.int32()),
+        (str(Key.crystal_sys), pa.string()),
+        (str(Key.diel_total_mp), pa.float64()),
+        (str(Key.diel_elec_mp), pa.float64()),
+        ("n_mp", pa.float64()),
+        ("icsd_ids", pa.list_(pa.string())),
+        ("task_ids", pa.list_(pa.string())),
+        *packed_struct_fields(Key.structure),
+    ],
+    metadata={struct_cols_key: json.dumps([Key.structure])},
+)
+
+
+def summary_docs_to_table(docs: Sequence[dict[str, Any]]) -> pa.Table:
+    """Convert one page of MP summary docs straight into typed Arrow columns."""
+    columns: dict[str, list[Any]] = {name: [] for name in paged_schema.names}
+    structures = []
+    for doc in docs:
+        row = summary_doc_to_row(doc)
+        structures.append(row.pop(Key.structure))
+        # MPID objects and ICSD ID strings alike are stored as plain strings
+        row["icsd_ids"] = list(map(str, row["icsd_ids"]))
+        row["task_ids"] = list(map(str, row["task_ids"] or []))
+        for key, val in row.items():
+            columns[str(key)].append(val)
+    for key, vals in zip(packed_struct_keys, pack_structures(structures), strict=True):
+        columns[f"{Key.structure}.{key}"] = vals
+    return pa.Table.from_pydict(columns, schema=paged_schema)
+
+
+def fetch_mp_dielectric_structures_paged(
+    out_path: str,
+    material_ids: str | Sequence[str] | None = None,
+    *,
+    has_dielectric: bool = False,
+    page_size: int = 1_000,
+    n_workers: int = 4,
+    replay: bool = False,
+    **search_kwargs: Any,
+) -> str:
+    """Like fetch_mp_dielectric_structures but fetches material_ids in concurrent pages
+    via dielectrics.mp_exploration.fetch.iter_mp_search_chunks and appends each page
+    as a Parquet row group to out_path as soon as it arrives. Only a bounded number of
+    pages is held in memory at a time, so large screening sets (~150k materials) fit
+    in RAM. Pages are checkpointed to the MP API cache, so interrupted fetches resume
+    and replay=True rebuilds out_path offline.
+
+    Args:
+        out_path (str): Parquet file to write.
+        material_ids (str | Sequence[str] | None): MP material IDs. Defaults to None
+            to first query the IDs of all materials matching search_kwargs.
+        has_dielectric (bool): If True, restrict to materials with computed dielectric
+            properties. Defaults to False.
+        page_size (int): Materials per API request and row group. Defaults to 1,000.
+        n_workers (int): Max concurrent API requests. Defaults to 4.
+        replay (bool): If True, serve cached API responses only. Defaults to False.
+        **search_kwargs (Any): Extra keyword filters forwarded to
+            MPRester().materials.summary.search. Also applied to explicitly passed
+            material_ids, i.e. IDs not matching them are dropped.
+
+    Returns:
+        str: out_path. Load with load_mp_dielectric_structures.
+    """
+    if isinstance(material_ids, str):
+        material_ids = [material_ids]
+    if has_dielectric:
+        search_kwargs["has_props"] = [HasProps.dielectric]
+
+    if material_ids is None:
+        # filter with a cheap ID-only query, then page the full docs by ID. The
+        # resolved IDs already satisfy the filters, so pages are fetched without them
+        id_docs = mp_search(
+            "materials.summary", fields=["material_id"], replay=replay, **search_kwargs
+        )
+        material_ids = [str(doc["material_id"]) for doc in id_docs]
+        search_kwargs = {}
+
+    pages = iter_mp_search_chunks(
+        "materials.summary",
+        material_ids,
+        fields=summary_fields,
+        chunk_size=page_size,
+        n_workers=n_workers,
+        replay=replay,
+        **search_kwargs,
+    )
+    os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+    # write to temp file first so an interrupted run never leaves a truncated file
+    tmp_path = f"{out_path}.{os.getpid()}.tmp"
+    try:
+        with pq.ParquetWriter(tmp_path, paged_schema, compression="zstd") as writer:
+            for docs in pages:
+                writer.write_table(summary_docs_to_table(docs))
+        os.replace(tmp_path, out_path)
+    finally:
+        if os.path.isfile(tmp_path):
+            os.remove(tmp_path)
+
+    return out_path
+
+
+def label_mp_dielectric_structures(
+    in_path: str,
+    out_path: str,
+    *,
+    exclude_ids: Sequence[str] = (),
+    batch_size: int = 5_000,
+) -> str:
+    """Drop excluded materials from a Parquet file written by
+    fetch_mp_dielectric_structures_paged and add Wren's protostructure label column,
+    one batch of rows at a time. Only the packed structures of the current batch are
+    unpacked into Structures, all other columns are copied as Arrow data.
+
+    Args:
+        in_path (str): Parquet file from fetch_mp_dielectric_structures_paged.
+        out_path (str): Parquet file to write, can be loaded with
+            load_mp_dielectric_structures or read_dataset.
+        exclude_ids (Sequence[str]): Material IDs to drop, e.g. the training set.
+            Defaults to ().
+        batch_size (int): Rows per batch. Defaults to 5,000.
+
+    Returns:
+        str: out_path.
+    """
+    # needs the optional aflow_wyckoff_labels extra, only import when labelling
+    from dielectrics.ml.wren.protostructure import get_protostructure_labels  # noqa: PLC0415
+
+    parquet_file = pq.ParquetFile(in_path)
+    wyckoff_field = pa.field(str(Key.wyckoff), pa.string())
+    schema = parquet_file.schema_arrow.append(wyckoff_field)
+    exclude = pa.array(sorted(set(map(str, exclude_ids))), type=pa.string())
+    packed_cols = [f"{Key.structure}.{key}" for key in packed_struct_keys]
+
+    os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+    tmp_path = f"{out_path}.{os.getpid()}.tmp"
+    try:
+        with pq.ParquetWriter(tmp_path, schema, compression="zstd") as writer:
+            for batch in tqdm(
+                parquet_file.iter_batches(batch_size=batch_size),
+                total=-(-parquet_file.metadata.num_rows // batch_size),
+                desc="Labelling MP structures",
+            ):
+                table = pa.Table.from_batches([batch])
+                is_excluded = pc.is_in(table[str(Key.mat_id)], value_set=exclude)
+                table = table.filter(pc.invert(is_excluded))
+                if table.num_rows == 0:
+                    continue
+                structures = unpack_structures(
+                    table.select(packed_cols).to_pandas(), Key.structure
+                )
+                labels = get_protostructure_labels(pd.Series(structures))
+                table = table.append_column(
+                    wyckoff_field, pa.array(labels.tolist(), type=pa.string())
+                )
+                writer.write_table(table)
+        os.replace(tmp_path, out_path)
+    finally:
+        if os.path.isfile(tmp_path):
+            os.remove(tmp_path)
+
+    return out_path
+
+
+def load_mp_dielectric_structures(
+    parquet_path: str, columns: Sequence[str] | None = None
+) -> pd.DataFrame:
+    """Load MP dielectric data written by fetch_mp_dielectric_structures_paged.
+
+    Args:
+        parquet_path (str): Parquet file path.
+        columns (Sequence[str] | None): Columns to load. Include 'structure' to unpack
+            pymatgen Structures. Defaults to None (all columns incl. structures).
+
+    Returns:
+        pd.DataFrame: Same columns as fetch_mp_dielectric_structures.
+    """
+    return add_derived_cols(read_dataset(parquet_path, columns=columns))
@@ -1,16 +1,16 @@
 # %%
-import pandas as pd
 import plotly.express as px
 import pymatviz as pmv
 from matplotlib.offsetbox import AnchoredText
 from sklearn.metrics import r2_score
 
-from dielectrics import DATA_DIR, PAPER_FIGS, Key
+from dielectrics import PAPER_FIGS, Key
+from dielectrics.datasets import read_dataset
 from dielectrics.plots import plt  # side-effect import sets plotly template and plt.rc
 
 
 # %%
-df_diel_mp = pd.read_json(f"{DATA_DIR}/mp-exploration/mp-diel-train.json.bz2")
+df_diel_mp = read_dataset("mp-exploration/mp-diel-train")
 
 df_diel_mp = df_diel_mp.query("0 < diel_total_mp < 2000")
 
@@ -0,0 +1,231 @@
+"""Compact on-disk storage of MP densities of states as float32 memory-mapped blocks.
+
+Serializing Dos objects with to_json(default_handler=as_dict) writes every energy and
+density as JSON text. write_dos_store instead appends each material's energies and
+spin-resolved densities to flat float32 files plus an index of material IDs, Fermi
+levels and offsets, the same layout as dielectrics.phonons.store. get_dos_arrays
+returns read-only views for one material and get_dos_features extracts band edges and
+effective band-edge DOS for all materials at once with segment reductions over the
+concatenated arrays.
+"""
+
+import functools
+import os
+from collections.abc import Mapping
+from contextlib import ExitStack
+
+import numpy as np
+import pandas as pd
+from numpy.typing import NDArray
+from pymatgen.electronic_structure.core import Spin
+from pymatgen.electronic_structure.dos import Dos
+from tqdm import tqdm
+
+from dielectrics import DATA_DIR, Key
+
+
+DOS_STORE_DIR = f"{DATA_DIR}/.db_cache/mp-dos-store"
+dos_keys = ("energies", "densities_up", "densities_down")
+
+
+def write_dos_store(
+    doses: Mapping[str, Dos], store_dir: str = DOS_STORE_DIR
+) -> pd.DataFrame:
+    """Write energies and densities of many DOS objects to float32 flat files.
+
+    Each array type is written to {store_dir}/{key}.f32 by appending one material after
+    another. index.csv records the number of energy points, Fermi level and start
+    offset (in float32 elements) of every material. densities_down only holds
+    spin-polarized materials, others get offset -1.
+
+    Args:
+        doses (Mapping[str, Dos]): Map of material ID to pymatgen Dos.
+        store_dir (str): Output directory. Defaults to DOS_STORE_DIR.
+
+    Returns:
+        pd.DataFrame: The offset index, one row per material ID.
+    """
+    os.makedirs(store_dir, exist_ok=True)
+    # write to temp files first so an interrupted run never leaves an index pointing
+    # into truncated or newer array files
+    out_paths = [
+        *(f"{store_dir}/{key}.f32" for key in dos_keys),
+        f"{store_dir}/index.csv",
+    ]
+    tmp_paths = {path: f"{path}.{os.getpid()}.tmp" for path in out_paths}
+
+    index_rows = []
+    offsets = dict.fromkeys(dos_keys, 0)
+    try:
+        with ExitStack() as stack:
+            files = {
+                key: stack.enter_context(
+                    open(tmp_paths[f"{store_dir}/{key}.f32"], mode="wb")
+                )
+                for key in dos_keys
+            }
+            for mat_id, dos in tqdm(doses.items(), desc="Writing DOS arrays"):
+                if dos is None or len(dos.energies) == 0:
+                    continue
+                arrays = {
+                    "energies": dos.energies,
+                    "densities_up": dos.densities[Spin.up],
+                    "densities_down": dos.densities.get(Spin.down),
+                }
+                row = {Key.mat_id: mat_id, "n_points": len(dos.energies)}
+                row["efermi"] = dos.efermi
+                for key, arr in arrays.items():
+                    if arr is None:
+                        row[f"{key}_offset"] = -1
+                        continue
+                    np.asarray(arr, dtype=np.float32).tofile(files[key])
+                    row[f"{key}_offset"] = offsets[key]
+                    offsets[key] += len(arr)
+                index_rows.append(row)
+
+        df_index = pd.DataFrame(index_rows)
+        df_index.to_csv(tmp_paths[f"{store_dir}/index.csv"], index=False)
+        # index.csv goes last so readers never see offsets into old array files
+        for path in out_paths:
+            os.replace(tmp_paths[path], path)
+    finally:
+        for tmp_path in tmp_paths.values():
+            if os.path.isfile(tmp_path):
+                os.remove(tmp_path)
+    _load_index.cache_clear()
+    _open_memmap.cache_clear()
+
+    sizes = {key: f"{offset * 4 / 1e6:,.1f} MB" for key, offset in offsets.items()}
+    print(f"Wrote DOS arrays for {len(df_index):,} materials to {store_dir}: {sizes}")
+    return df_index.set_index(Key.mat_id, drop=False)
+
+
+@functools.cache
+def _load_index(store_dir: str) -> pd.DataFrame:
+    index_path = f"{store_dir}/index.csv"
+    if not os.path.isfile(index_path):
+        raise FileNotFoundError(
+            f"{index_path} not found, run write_dos_store() to create it"
+        )
+    return pd.read_csv(index_path).set_index(Key.mat_id, drop=False)
+
+
+@functools.cache
+def _open_memmap(store_dir: str, key: str) -> np.memmap:
+    return np.memmap(f"{store_dir}/{key}.f32", dtype=np.float32, mode="r")
+
+
+def load_dos_index(store_dir: str = DOS_STORE_DIR) -> pd.DataFrame:
+    """Load the material ID/n_points/efermi/offset index written by write_dos_store."""
+    return _load_index(store_dir)
+
+
+def get_dos_arrays(
+    mat_id: str, store_dir: str = DOS_STORE_DIR
+) -> dict[str, NDArray[np.float32]]:
+    """Get one material's DOS arrays as read-only views into the memory-mapped store.
+
+    Args:
+        mat_id (str): Material ID.
+        store_dir (str): Directory written by write_dos_store. Defaults to
+            DOS_STORE_DIR.
+
+    Returns:
+        dict[str, np.ndarray]: energies, densities_up and (if spin-polarized)
+            densities_down, each of shape (n_points,).
+    """
+    row = _load_index(store_dir).loc[mat_id]
+    n_points = int(row.n_points)
+    arrays = {}
+    for key in dos_keys:
+        if (offset := int(row[f"{key}_offset"])) >= 0:
+            arrays[key] = _open_memmap(store_dir, key)[offset : offset + n_points]
+    return arrays
+
+
+def load_dos(mat_id: str, store_dir: str = DOS_STORE_DIR) -> Dos:
+    """Rebuild a pymatgen Dos for one material from the store."""
+    arrays = get_dos_arrays(mat_id, store_dir)
+    densities = {Spin.up: np.asarray(arrays["densities_up"], dtype=float)}
+    if "densities_down" in arrays:
+        densities[Spin.down] = np.asarray(arrays["densities_down"], dtype=float)
+    efermi = float(_load_index(store_dir).loc[mat_id, "efermi"])
+    return Dos(efermi, np.asarray(arrays["energies"], dtype=float), densities)
+
+
+def _concat_ranges(starts: NDArray[np.int64], lengths: NDArray[np.int64]) -> NDArray:
+    """Concatenation of range(start, start + length) for all segments."""
+    seg_starts = np.cumsum(lengths) - lengths
+    return np.repeat(starts - seg_starts, lengths) + np.arange(lengths.sum())
+
+
+def get_dos_features(
+    store_dir: str = DOS_STORE_DIR, tol: float = 1e-3, window: float = 0.5
+) -> pd.DataFrame:
+    """Band edges and effective band-edge DOS of all materials in the store.
+
+    Materials were written back to back, so energies and densities of the whole set
+    are single flat arrays and every feature is a segment reduction over them.
+
+    Args:
+        store_dir (str): Directory written by write_dos_store. Defaults to
+            DOS_STORE_DIR.
+        tol (float): Total DOS (states/eV) above which an energy counts as occupied
+            by a band. Defaults to 1e-3 like pymatgen's Dos.get_cbm_vbm.
+        window (float): Width (eV) below the VBM and above the CBM over which the
+            DOS is integrated for the effective band-edge DOS. Defaults to 0.5.
+
+    Returns:
+        pd.DataFrame: vbm_dos, cbm_dos, bandgap_dos (eV), dos_vb_eff and dos_cb_eff
+            (states) indexed by material ID.
+    """
+    df_index = _load_index(store_dir)
+    n_points = df_index.n_points.to_numpy()
+    if (np.diff(df_index.energies_offset) != n_points[:-1]).any():
+        raise ValueError(f"{store_dir} energies are not stored contiguously")
+    seg_starts = np.cumsum(n_points) - n_points
+    seg_ids = np.repeat(np.arange(len(df_index)), n_points)
+
+    energies = np.asarray(_open_memmap(store_dir, "energies"), dtype=np.float64)
+    total_dos = np.asarray(_open_memmap(store_dir, "densities_up"), dtype=np.float64)
+    # densities_down holds the spin-polarized materials back to back in index order
+    is_polarized = df_index.densities_down_offset.to_numpy() >= 0
+    # (empty file that can't be memory-mapped if none are)
+    if is_polarized.any():
+        down_idx = _concat_ranges(seg_starts[is_polarized], n_points[is_polarized])
+        down_dos = _open_memmap(store_dir, "densities_down")[: len(down_idx)]
+        total_dos[down_idx] += down_dos
+
+    efermi = df_index.efermi.to_numpy()[seg_ids]
+    has_states = total_dos > tol
+    vbm = np.maximum.reduceat(
+        np.where(has_states & (energies <= efermi), energies, -np.inf), seg_starts
+    )
+    cbm = np.minimum.reduceat(
+        np.where(has_states & (energies >= efermi), energies, np.inf), seg_starts
+    )
+
+    # energy spacing per point, last point of each segment reuses the previous spacing
+    d_energy = np.diff(energies, append=energies[-1])
+    seg_ends = seg_starts + n_points - 1
+    d_energy[seg_ends] = d_energy[np.maximum(seg_ends - 1, seg_starts)]
+    states = total_dos * d_energy
+
+    in_vb = (energies <= vbm[seg_ids]) & (energies > vbm[seg_ids] - window)
+    in_cb = (energies >= cbm[seg_ids]) & (energies < cbm[seg_ids] + window)
+    n_mats = len(df_index)
+    dos_vb_eff = np.bincount(seg_ids, weights=states * in_vb, minlength=n_mats)
+    dos_cb_eff = np.bincount(seg_ids, weights=states * in_cb, minlength=n_mats)
+
+    vbm[np.isinf(vbm)] = np.nan
+    cbm[np.isinf(cbm)] = np.nan
+    return pd.DataFrame(
+        {
+            "vbm_dos": vbm,
+            "cbm_dos": cbm,
+            "bandgap_dos": np.clip(cbm - vbm, 0, None),
+            "dos_vb_eff": dos_vb_eff,
+            "dos_cb_eff": dos_cb_eff,
+        },
+        index=df_index.index,
+    )
@@ -0,0 +1,260 @@
+"""Concurrent, resumable Materials Project fetching with an on-disk response cache.
+
+IDs are de-duplicated, sorted and split into chunks. Each chunk becomes one API call
+and chunks run concurrently in a bounded thread pool. iter_mp_search_chunks yields each
+chunk as it arrives for callers that process results page by page. Filter-only
+searches (e.g. to resolve the IDs to fetch in the first place) go through mp_search, a
+single cached call. Every response is checkpointed under MP_CACHE_DIR before the next
+one is needed, so interrupted runs pick up where they left off. With replay=True, only
+cached responses are served and the network is never touched, e.g. to rerun analysis
+offline. Pass endpoint to point MPRester at a local stand-in server.
+"""
+
+import functools
+import gzip
+import hashlib
+import itertools
+import json
+import os
+from collections.abc import Callable, Iterator, Sequence
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any
+
+from monty.json import MontyDecoder, MontyEncoder
+from mp_api.client import MPRester
+from tqdm import tqdm
+
+from dielectrics import DATA_DIR
+
+
+MP_CACHE_DIR = f"{DATA_DIR}/.db_cache/mp-api"
+
+
+def _cache_path(cache_dir: str, resource: str, key: str) -> str:
+    key_hash = hashlib.sha256(key.encode()).hexdigest()[:16]
+    return f"{cache_dir}/{resource}/{key_hash}.json.gz"
+
+
+def _save_response(path: str, response: Any) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # write to temp file first so an interrupted run never leaves half-written JSON
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with gzip.open(tmp_path, mode="wt", encoding="utf-8") as file:
+        json.dump(response, file, cls=MontyEncoder)
+    os.replace(tmp_path, path)
+
+
+def _load_response(path: str) -> Any:
+    with gzip.open(path, mode="rt", encoding="utf-8") as file:
+        # restores pymatgen objects (Structure, Kpoints, Dos, ...) and datetimes
+        return json.load(file, cls=MontyDecoder)
+
+
+def _cached_call(
+    path: str, fetch: Callable[[], Any], *, replay: bool, desc: str
+) -> Any:
+    if not os.path.isfile(path):
+        if replay:
+            raise FileNotFoundError(f"replay=True but no cached response for {desc}")
+        _save_response(path, fetch())
+    # load fresh responses from disk too so cached and live runs return the same types
+    return _load_response(path)
+
+
+def _mp_rester(endpoint: str | None, **kwargs: Any) -> MPRester:
+    # each thread gets its own client since MPRester sessions aren't thread-safe
+    return MPRester(**({"endpoint": endpoint} if endpoint else {}), **kwargs)
+
+
+def _iter_concurrently(
+    jobs: dict[str, Callable[[], Any]], n_workers: int, desc: str
+) -> Iterator[tuple[str, Any]]:
+    # yield (key, result) as jobs finish, keeping at most 2 * n_workers jobs submitted
+    # so results can't pile up in memory faster than the caller consumes them
+    job_iter = iter(jobs.items())
+    with (
+        ThreadPoolExecutor(max_workers=n_workers) as executor,
+        tqdm(total=len(jobs), desc=desc) as progress,
+    ):
+        pending = {
+            executor.submit(job): key
+            for key, job in itertools.islice(job_iter, 2 * n_workers)
+        }
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                key = pending.pop(future)
+                if (next_job := next(job_iter, None)) is not None:
+                    pending[executor.submit(next_job[1])] = next_job[0]
+                progress.update()
+                yield key, future.result()
+
+
+def _run_concurrently(
+    jobs: dict[str, Callable[[], Any]], n_workers: int, desc: str
+) -> dict[str, Any]:
+    return dict(_iter_concurrently(jobs, n_workers, desc))
+
+
+def mp_search(
+    resource: str,
+    *,
+    fields: Sequence[str] | None = None,
+    replay: bool = False,
+    endpoint: str | None = None,
+    cache_dir: str = MP_CACHE_DIR,
+    **search_kwargs: Any,
+) -> list[dict[str, Any]]:
+    """Run a single cached MP API search by filters instead of IDs, e.g. to find the
+    material IDs to pass to mp_search_chunked.
+
+    Args:
+        resource (str): Dotted MPRester attribute path of the search route, e.g.
+            'materials.summary'.
+        fields (Sequence[str], optional): Fields to return. Defaults to None (all).
+        replay (bool, optional): If True, serve the cached response only and raise
+            FileNotFoundError if this search was never run. Defaults to False.
+        endpoint (str, optional): API URL, e.g. of a local stand-in server.
+            Defaults to None (the public MP API).
+        cache_dir (str, optional): Response cache directory. Defaults to
+            MP_CACHE_DIR. Delete the cached response to pick up new MP data.
+        **search_kwargs (Any): Filters passed to the search call.
+
+    Returns:
+        list[dict[str, Any]]: Matching documents.
+    """
+    fields = sorted(fields) if fields is not None else None
+
+    def search() -> list[dict[str, Any]]:
+        with _mp_rester(endpoint, use_document_model=False) as mpr:
+            route = functools.reduce(getattr, resource.split("."), mpr)
+            return route.search(fields=fields, **search_kwargs)
+
+    key = f"{fields=}, {sorted(search_kwargs.items())=}"
+    path = _cache_path(cache_dir, resource, key)
+    return _cached_call(path, search, replay=replay, desc=f"{resource} {key}")
+
+
+def iter_mp_search_chunks(
+    resource: str,
+    ids: Sequence[str],
+    *,
+    id_kwarg: str = "material_ids",
+    fields: Sequence[str] | None = None,
+    chunk_size: int = 500,
+    n_workers: int = 4,
+    replay: bool = False,
+    endpoint: str | None = None,
+    cache_dir: str = MP_CACHE_DIR,
+    **search_kwargs: Any,
+) -> Iterator[list[dict[str, Any]]]:
+    """Run an MP API search over many IDs in concurrent, cached chunks, yielding the
+    documents of each chunk as soon as it arrives. Only a bounded number of chunks is
+    in flight or waiting to be consumed at any time, so arbitrarily many IDs can be
+    processed chunk by chunk in constant memory.
+
+    Args:
+        resource (str): Dotted MPRester attribute path of the search route, e.g.
+            'materials.summary' or 'materials.tasks'.
+        ids (Sequence[str]): Material or task IDs to fetch.
+        id_kwarg (str, optional): Search keyword taking the IDs. Defaults to
+            'material_ids'. Use 'task_ids' for materials.tasks.
+        fields (Sequence[str], optional): Fields to return. Defaults to None (all).
+        chunk_size (int, optional): IDs per API call. Defaults to 500.
+        n_workers (int, optional): Max concurrent API calls. Defaults to 4.
+        replay (bool, optional): If True, serve cached responses only and raise
+            FileNotFoundError for chunks never fetched. Defaults to False.
+        endpoint (str, optional): API URL, e.g. of a local stand-in server.
+            Defaults to None (the public MP API).
+        cache_dir (str, optional): Response cache directory. Defaults to
+            MP_CACHE_DIR.
+        **search_kwargs (Any): Extra filters passed to each search call.
+
+    Yields:
+        list[dict[str, Any]]: Documents of one chunk (order of chunks not preserved).
+    """
+    ids = sorted(set(map(str, ids)))
+    fields = sorted(fields) if fields is not None else None
+
+    def search(chunk_ids: list[str]) -> list[dict[str, Any]]:
+        with _mp_rester(endpoint, use_document_model=False) as mpr:
+            route = functools.reduce(getattr, resource.split("."), mpr)
+            return route.search(**{id_kwarg: chunk_ids}, fields=fields, **search_kwargs)
+
+    jobs = {}
+    for start in range(0, len(ids), chunk_size):
+        chunk_ids = ids[start : start + chunk_size]
+        key = f"{chunk_ids=}, {fields=}, {sorted(search_kwargs.items())=}"
+        path = _cache_path(cache_dir, resource, key)
+        fetch = functools.partial(search, chunk_ids)
+        jobs[path] = functools.partial(
+            _cached_call, path, fetch, replay=replay, desc=f"{resource} {start=}"
+        )
+
+    for _, docs in _iter_concurrently(jobs, n_workers, desc=f"MP {resource}"):
+        yield docs
+
+
+def mp_search_chunked(
+    resource: str, ids: Sequence[str], **kwargs: Any
+) -> list[dict[str, Any]]:
+    """Documents of all chunks of iter_mp_search_chunks() in one list.
+
+    Args:
+        resource (str): Dotted MPRester attribute path of the search route, e.g.
+            'materials.summary' or 'materials.tasks'.
+        ids (Sequence[str]): Material or task IDs to fetch.
+        **kwargs (Any): Passed to iter_mp_search_chunks, e.g. fields, chunk_size,
+            n_workers, replay or extra search filters.
+
+    Returns:
+        list[dict[str, Any]]: Documents of all chunks (order of chunks not preserved).
+    """
+    return [
+        doc for docs in iter_mp_search_chunks(resource, ids, **kwargs) for doc in docs
+    ]
+
+
+def mp_fetch_per_id(
+    method: str,
+    ids: Sequence[str],
+    *,
+    n_workers: int = 4,
+    replay: bool = False,
+    endpoint: str | None = None,
+    cache_dir: str = MP_CACHE_DIR,
+) -> dict[str, Any]:
+    """Call a single-ID MPRester method (e.g. get_dos_by_material_id) for many IDs
+    concurrently, caching each response.
+
+    Args:
+        method (str): Dotted MPRester attribute path of the method.
+        ids (Sequence[str]): IDs to pass to the method one at a time.
+        n_workers (int, optional): Max concurrent API calls. Defaults to 4.
+        replay (bool, optional): If True, serve cached responses only. Defaults to
+            False.
+        endpoint (str, optional): API URL, e.g. of a local stand-in server.
+            Defaults to None (the public MP API).
+        cache_dir (str, optional): Response cache directory. Defaults to
+            MP_CACHE_DIR.
+
+    Returns:
+        dict[str, Any]: Map of ID to response, in the order of ids.
+    """
+
+    def fetch(mat_id: str) -> Any:
+        with _mp_rester(endpoint) as mpr:
+            return functools.reduce(getattr, method.split("."), mpr)(mat_id)
+
+    jobs = {
+        mat_id: functools.partial(
+            _cached_call,
+            _cache_path(cache_dir, method, mat_id),
+            functools.partial(fetch, mat_id),
+            replay=replay,
+            desc=f"{method}({mat_id})",
+        )
+        for mat_id in dict.fromkeys(map(str, ids))
+    }
+    responses = _run_concurrently(jobs, n_workers, desc=f"MP {method}")
+    return {mat_id: responses[mat_id] for mat_id in jobs}
@@ -1,11 +1,15 @@
 # %%
 import pandas as pd
-from matbench_discovery.structure.prototype import get_protostructure_label
-from pymatgen.core import Composition
-from tqdm.notebook import tqdm
 
 from dielectrics import DATA_DIR, Key
-from dielectrics.mp_exploration import fetch_mp_dielectric_structures
+from dielectrics.datasets import dataset_path, read_dataset, write_dataset
+from dielectrics.formula_index import canonical_chemsys
+from dielectrics.ml.wren.protostructure import get_protostructure_labels
+from dielectrics.mp_exploration import (
+    fetch_mp_dielectric_structures,
+    fetch_mp_dielectric_structures_paged,
+    label_mp_dielectric_structures,
+)
 
 
 """
@@ -18,16 +22,15 @@ df_diel_train = fetch_mp_dielectric_structures(has_dielectric=True)
 
 
 # %%
-df_diel_screen = fetch_mp_dielectric_structures(
+# screening set is large, fetch it in concurrent pages written straight to Parquet to
+# bound memory
+screen_raw_parquet = fetch_mp_dielectric_structures_paged(
+    f"{DATA_DIR}/mp-exploration/mp-diel-screen-raw.parquet",
     energy_above_hull=(None, 0.1),  # exclude non-stable materials
     band_gap=(0.5, None),  # at least semiconductor band gap (exclude conductors)
     num_elements=(5, 10),  # exclude elemental/overly complex stuff
     num_sites=(100, None),  # 2x of https://nature.com/articles/sdata2016134#Sec4
 )
-# exclude materials already in the training set (those with computed dielectric data)
-df_diel_screen = df_diel_screen[
-    ~df_diel_screen[Key.mat_id].isin(df_diel_train[Key.mat_id])
-]
 
 
 # %%
@@ -40,29 +43,24 @@ print(
 
 
 # %% add Wren's input column as Aflow-like Wyckoff encoding
-df_diel_train[Key.wyckoff] = [
-    get_protostructure_label(s) for s in tqdm(df_diel_train[Key.structure])
-]
-df_diel_screen[Key.wyckoff] = [
-    get_protostructure_label(s) for s in tqdm(df_diel_screen[Key.structure])
-]
-
-
-# %% save data to disk
-df_diel_train.to_json(
-    f"{DATA_DIR}/mp-exploration/mp-diel-train.json.bz2",
-    default_handler=lambda x: x.as_dict(),
+# labelled in a process pool, labels of previously seen structures come from disk cache
+df_diel_train[Key.wyckoff] = get_protostructure_labels(df_diel_train[Key.structure])
+# screening set is labelled batch by batch from Parquet without loading it whole,
+# excluding materials already in the training set (those with computed dielectric data)
+label_mp_dielectric_structures(
+    screen_raw_parquet,
+    dataset_path("mp-exploration/mp-diel-screen"),
+    exclude_ids=df_diel_train[Key.mat_id],
 )
 
-df_diel_screen.to_json(
-    f"{DATA_DIR}/mp-exploration/mp-diel-screen.json.bz2",
-    default_handler=lambda x: x.as_dict(),
-)
+
+# %% save data to disk as zstd Parquet with packed structures
+write_dataset(df_diel_train, "mp-exploration/mp-diel-train")
 
 
 # %% load data from disk
 # TODO what is train-2?
-df_diel_train_2 = pd.read_json(f"{DATA_DIR}/mp-exploration/mp-diel-train-2.json.bz2")
+df_diel_train_2 = read_dataset("mp-exploration/mp-diel-train-2")
 
 df_diel_screen = pd.read_csv(f"{DATA_DIR}/mp-exploration/mp-diel-screen.csv.bz2")
 
@@ -85,15 +83,9 @@ df_diel_enrich_train = df_diel_train[
     ~df_diel_train.index.isin(df_diel_enrich_small_test.index)
 ]
 
-df_diel_enrich_train.to_json(
-    f"{DATA_DIR}/mp-exploration/mp-diel-enrich-small-train.json.bz2",
-    default_handler=lambda x: x.as_dict(),
-)
+write_dataset(df_diel_enrich_train, "mp-exploration/mp-diel-enrich-small-train")
 
-df_diel_enrich_small_test.to_json(
-    f"{DATA_DIR}/mp-exploration/mp-diel-enrich-small-test.json.bz2",
-    default_handler=lambda x: x.as_dict(),
-)
+write_dataset(df_diel_enrich_small_test, "mp-exploration/mp-diel-enrich-small-test")
 
 
 # %% Enrichment Experiment 2 (big)
@@ -101,30 +93,22 @@ df_diel_enrich_small_test.to_json(
 # see screen_data criteria above for what enters the screening set
 df_diel_enrich_big_test = pd.concat([df_diel_screen, df_diel_top_100])
 
-df_diel_remain.to_json(
-    f"{DATA_DIR}/mp-exploration/mp-diel-enrich-big-train.json.bz2",
-    default_handler=lambda x: x.as_dict(),
-)
+write_dataset(df_diel_remain, "mp-exploration/mp-diel-enrich-big-train")
 
-df_diel_enrich_big_test.to_json(
-    f"{DATA_DIR}/mp-exploration/mp-diel-enrich-big-test.json.bz2",
-    default_handler=lambda x: x.as_dict(),
-)
+write_dataset(df_diel_enrich_big_test, "mp-exploration/mp-diel-enrich-big-test")
 
 
 # %% Create MP training dataset excluding all materials with chemical systems present in
 # the Petousis experimental database.
 df_exp = pd.read_csv(f"{DATA_DIR}/others/petousis/exp-petousis.csv")
 
-df_exp["composition"] = df_exp[Key.formula].map(Composition)
-df_exp["chem_sys"] = df_exp.composition.map(lambda comp: comp.chemical_system)
+# canonical_chemsys is cached so each unique formula is parsed only once
+df_exp["chem_sys"] = df_exp[Key.formula].map(canonical_chemsys)
 chem_sys_exp = df_exp.chem_sys.unique()
 
-df_diel_train["chem_sys"] = df_diel_train[Key.formula].map(
-    lambda comp: Composition(comp).chemical_system
-)
+df_diel_train["chem_sys"] = df_diel_train[Key.formula].map(canonical_chemsys)
 
-df_diel_train.query("chem_sys not in @chem_sys_exp").to_json(
-    f"{DATA_DIR}/mp-exploration/mp-diel-train-excl-petousis.json.bz2",
-    default_handler=lambda x: x.as_dict(),
+write_dataset(
+    df_diel_train.query("chem_sys not in @chem_sys_exp"),
+    "mp-exploration/mp-diel-train-excl-petousis",
 )
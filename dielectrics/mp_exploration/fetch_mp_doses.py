@@ -1,15 +1,18 @@
 # %%
 import pandas as pd
 from emmet.core.summary import HasProps
-from mp_api.client import MPRester
 from pymatgen.core import Element
 from pymatgen.electronic_structure.plotter import DosPlotter
-from tqdm import tqdm
 
 from dielectrics import DATA_DIR, Key
+from dielectrics.mp_exploration.dos_store import get_dos_features, write_dos_store
+from dielectrics.mp_exploration.fetch import mp_fetch_per_id, mp_search
 
 
-# %%
+# %% all MP API responses are cached under .db_cache/mp-api, set replay=True to rerun
+# this script offline from the cache
+replay = False
+
 rare_earths = [
     str(Element.from_Z(x))
     for x in range(1, 110)
@@ -18,17 +21,18 @@ rare_earths = [
 
 
 # %%
-with MPRester() as mpr:
-    docs = mpr.materials.summary.search(
-        num_sites=(None, 20),
-        num_elements=(None, 5),
-        energy_above_hull=(None, 0.1),
-        has_props=[HasProps.dielectric, HasProps.bandstructure],
-        theoretical=False,  # has an ICSD entry (experimentally observed)
-        exclude_elements=rare_earths,
-        fields=["material_id"],
-    )
-mp_data = [str(doc.material_id) for doc in docs]
+docs = mp_search(
+    "materials.summary",
+    num_sites=(None, 20),
+    num_elements=(None, 5),
+    energy_above_hull=(None, 0.1),
+    has_props=[HasProps.dielectric, HasProps.bandstructure],
+    theoretical=False,  # has an ICSD entry (experimentally observed)
+    exclude_elements=rare_earths,
+    fields=["material_id"],
+    replay=replay,
+)
+mp_data = [str(doc["material_id"]) for doc in docs]
 
 print(f"materials matching filters: {len(mp_data):,}")
 
@@ -44,12 +48,8 @@ df_dos = pd.read_csv(f"{DATA_DIR}/mp-exploration/mp-doses.csv").set_index(
 
 
 # %%
-doses = {}
-
-with MPRester() as mpr:
-    for mp_id in tqdm(df_dos.index):
-        dos = mpr.get_dos_by_material_id(mp_id)
-        doses[mp_id] = dos
+# concurrent and resumable, each DOS is cached under .db_cache/mp-api as it arrives
+doses = mp_fetch_per_id("get_dos_by_material_id", df_dos.index, replay=replay)
 
 
 # %% plot one example DOS (get_dos_by_material_id now returns a bare Dos without an
@@ -60,8 +60,10 @@ dos_plotter.add_dos(example_id, doses[example_id])
 dos_plotter.get_plot()
 
 
-# %%
-df_dos["dos"] = pd.Series(doses)
-df_dos.to_json(
-    f"{DATA_DIR}/mp-exploration/mp_doses.json.gz", default_handler=lambda x: x.as_dict()
-)
+# %% store energies and densities as float32 memory-mapped arrays instead of JSON text
+write_dos_store(doses)
+
+
+# %% band edges and effective band-edge DOS for all materials in one vectorized pass
+df_dos_feats = get_dos_features()
+df_dos[list(df_dos_feats)] = df_dos_feats
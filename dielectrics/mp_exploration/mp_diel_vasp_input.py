@@ -5,44 +5,64 @@ calcs.
 # %%
 import pandas as pd
 from emmet.core.summary import HasProps
-from mp_api.client import MPRester
 from pymatgen.core import Composition
 from pymatgen.io.vasp import Kpoints
-from tqdm import tqdm
 
 from dielectrics import DATA_DIR, PAPER_FIGS, Key
+from dielectrics.datasets import read_dataset
+from dielectrics.mp_exploration.fetch import mp_search, mp_search_chunked
 from dielectrics.plots import plt  # side-effect import sets plotly template and plt.rc
 
 
+# %% all MP API responses are cached under .db_cache/mp-api, set replay=True to rerun
+# this script offline from the cache
+replay = False
+
+
 # %% fetch the DFPT Dielectric task INCAR/KPOINTS for each material with dielectric data
 # (the legacy materials-doc "input" field is gone; VASP inputs now live on task docs)
-with MPRester() as mpr:
-    diel_docs = mpr.materials.summary.search(
-        has_props=[HasProps.dielectric],
-        fields=["material_id", "formula_pretty", "task_ids"],
-    )
+diel_docs = mp_search(
+    "materials.summary",
+    has_props=[HasProps.dielectric],
+    fields=["material_id", "formula_pretty", "task_ids"],
+    replay=replay,
+)
 
-    records = []
-    for doc in tqdm(diel_docs, desc="Fetching MP dielectric VASP inputs"):
-        tasks = mpr.materials.tasks.search(
-            task_ids=doc.task_ids, fields=["task_type", "completed_at", "orig_inputs"]
-        )
-        diel_task = next(
-            (task for task in tasks if task.task_type == "DFPT Dielectric"), None
-        )
-        if diel_task is None:
-            continue
-        incar = diel_task.orig_inputs.incar or {}
-        date = diel_task.completed_at.date() if diel_task.completed_at else None
-        records.append(
-            {
-                Key.mat_id: str(doc.material_id),
-                Key.formula: doc.formula_pretty,
-                Key.date: date,
-                "kpoints": diel_task.orig_inputs.kpoints,
-                **{f"incar.{key}": val for key, val in incar.items()},
-            }
-        )
+# one chunked, concurrent and resumable tasks.search over all task IDs instead of one
+# request per material
+task_docs = mp_search_chunked(
+    "materials.tasks",
+    [str(task_id) for doc in diel_docs for task_id in doc["task_ids"]],
+    id_kwarg="task_ids",
+    fields=["task_id", "task_type", "completed_at", "orig_inputs"],
+    replay=replay,
+)
+diel_tasks = {
+    str(task["task_id"]): task
+    for task in task_docs
+    if task["task_type"] == "DFPT Dielectric"
+}
+
+records = []
+for doc in diel_docs:
+    diel_task = next(
+        (diel_tasks[tid] for tid in map(str, doc["task_ids"]) if tid in diel_tasks),
+        None,
+    )
+    if diel_task is None:
+        continue
+    orig_inputs = diel_task["orig_inputs"]
+    incar = orig_inputs.get("incar") or {}
+    completed_at = diel_task.get("completed_at")
+    records.append(
+        {
+            Key.mat_id: str(doc["material_id"]),
+            Key.formula: doc["formula_pretty"],
+            Key.date: pd.Timestamp(completed_at).date() if completed_at else None,
+            "kpoints": orig_inputs.get("kpoints"),
+            **{f"incar.{key}": val for key, val in incar.items()},
+        }
+    )
 
 
 # %%
@@ -86,7 +106,7 @@ df_input[Key.date] = pd.to_datetime(df_input[Key.date])
 
 
 # %%
-df_structs = pd.read_json(f"{DATA_DIR}/mp-exploration/mp-diel-train.json.bz2")
+df_structs = read_dataset("mp-exploration/mp-diel-train", columns=[Key.structure])
 
 df_input[Key.structure] = df_structs[Key.structure]
 
@@ -19,6 +19,7 @@ from pymatgen.util.string import latexify
 from pymatviz import crystal_sys_order
 
 from dielectrics import DATA_DIR, PAPER_FIGS, Key
+from dielectrics.datasets import read_dataset
 from dielectrics.plots import plt  # side-effect import sets plotly template and plt.rc
 
 
@@ -26,7 +27,7 @@ os.makedirs(f"{PAPER_FIGS}/eda/", exist_ok=True)
 
 
 # %%
-df_diel_mp = pd.read_json(f"{DATA_DIR}/mp-exploration/mp-diel-train.json.bz2")
+df_diel_mp = read_dataset("mp-exploration/mp-diel-train")
 
 df_diel_mp = df_diel_mp.query("0 < diel_total_mp < 2000")
 df_diel_mp["spacegroup.number"] = (
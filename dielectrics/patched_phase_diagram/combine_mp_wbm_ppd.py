@@ -17,7 +17,6 @@ import pickle
 import warnings
 
 import pandas as pd
-import plotly.express as px
 from matbench_discovery.data import DataFiles
 from pymatgen.analysis.phase_diagram import PatchedPhaseDiagram, PDEntry
 from pymatgen.core import Composition
@@ -28,6 +27,7 @@ from tqdm import tqdm
 
 from dielectrics import Key, today
 from dielectrics.patched_phase_diagram import MODULE_DIR
+from dielectrics.plots import px  # side-effect import sets plotly template and plt.rc
 
 
 __author__ = "Janosh Riebesell"
@@ -14,6 +14,7 @@ from tqdm import tqdm
 
 from dielectrics import DATA_DIR, PKG_DIR, Key
 from dielectrics.db import db
+from dielectrics.ml.wren.ensemble import load_wren_ensemble
 from dielectrics.plots import plt  # side-effect import sets plotly template and plt.rc
 
 
@@ -33,8 +34,9 @@ wren_fom_csv_path = (
     f"{DATA_DIR}/wren/screen/wren-e_form-ens-rhys-screen-mp-top1k-fom-elemsub.csv"
     # f"{DATA_DIR}/wren/screen/wren-elemsub-mp+wbm.csv"
 )
-df_wren = pd.read_csv(wren_fom_csv_path, na_filter=False).set_index(
-    Key.mat_id, drop=False
+# e_form_wren ensemble mean and e_form_wren_std (epistemic + aleatoric in quadrature)
+df_wren = load_wren_ensemble(
+    wren_fom_csv_path, Key.e_form_wren, extra_cols=[Key.formula]
 )
 
 compositions = df_wren[Key.formula].map(Composition)
@@ -43,13 +45,6 @@ df_wren["e_ref"] = [ppd_mp_wbm.try_get_e_ref(c) for c in tqdm(compositions)]
 
 
 # %%
-df_wren[Key.e_form_wren] = df_wren.filter(like="pred_n").mean(axis=1)
-df_wren["e_form_wren_std"] = (
-    df_wren.filter(like="pred_n").var(axis=1)
-    # average aleatoric uncertainties in quadrature
-    + (df_wren.filter(like="ale_n") ** 2).mean(axis=1)
-) ** 0.5
-
 # the hull energy is relative to the reference energies for single element systems
 # e.g. for Fe2O3 the e_hull is relative to e_ref = 2 * e_Fe + 3 * e_O?
 # so we subtract e_ref from e_hull so that the hull energy is comparable to e_form
@@ -0,0 +1,209 @@
+"""Vectorized phonon stability analysis of the DFPT normal modes in the task dataset.
+
+All normal-mode eigenvalues are packed into one ragged array (flat values plus offsets)
+so frequencies and per-material reductions run as single NumPy calls instead of one
+Python-level map per material.
+"""
+
+import hashlib
+import os
+from collections.abc import Sequence
+from typing import Any
+
+import numpy as np
+import pandas as pd
+from numpy.typing import NDArray
+from scipy.constants import angstrom, atomic_mass, e, milli, pi, tera, value
+
+from dielectrics import DATA_DIR, Key
+from dielectrics.db.fetch_data import doc_matches, load_task_docs
+
+
+# following Qu et al. https://www.nature.com/articles/s41597-020-0418-6 allow
+# imaginary frequencies up to 1 meV = 0.2417 THz before considering a material unstable
+meV_to_THz = value("electron volt-hertz relationship") / tera * milli  # noqa: N816
+imaginary_tol = -1 * meV_to_THz
+# VASP's dynamical matrix eigenvalues are in eV/Å^2/amu, so their square roots are
+# angular frequencies in units of sqrt(eV/Å^2/amu). This converts them to THz (~15.633)
+vasp_to_THz = np.sqrt(e / (angstrom**2 * atomic_mass)) / (2 * pi) / tera  # noqa: N816
+
+
+def ph_freqs_from_dyn_mat_evs(
+    dyn_mat_evs: Sequence[float] | NDArray[np.float64],
+) -> NDArray[np.float64]:
+    """Dynamical matrix eigenvalue (eV/Å^2/amu, as in vasprun.xml) to phonon frequency
+    (THz) conversion. Imaginary frequencies are returned as negative numbers. Works on
+    a single material's eigenvalues as well as on the flat values of a packed ragged
+    array.
+
+    Copied from https://github.com/hackingmaterials/amset/blob/92b67a30/amset/tools/phonon_frequency.py#L48
+    Thanks to Alex Ganose!
+    """
+    dyn_mat_evs = np.asarray(dyn_mat_evs, dtype=float)
+    return -vasp_to_THz * np.sqrt(np.abs(dyn_mat_evs)) * np.sign(dyn_mat_evs)
+
+
+def pack_ragged(
+    arrays: Sequence[Sequence[float] | None],
+) -> tuple[NDArray[np.float64], NDArray[np.int64]]:
+    """Pack variable-length sequences into one flat array plus offsets such that
+    values[offsets[idx] : offsets[idx + 1]] holds the idx-th sequence.
+
+    Args:
+        arrays (Sequence[Sequence[float] | None]): Sequences to pack. None is treated
+            as an empty sequence.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: Flat values and n_arrays + 1 offsets.
+    """
+    lengths = np.array([len(arr) if arr is not None else 0 for arr in arrays])
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    values = np.fromiter(
+        (val for arr in arrays if arr is not None for val in arr),
+        dtype=float,
+        count=offsets[-1],
+    )
+    return values, offsets
+
+
+def segment_reduce(
+    ufunc: np.ufunc,
+    values: NDArray[np.float64],
+    offsets: NDArray[np.int64],
+    fill_value: float = np.nan,
+) -> NDArray[np.float64]:
+    """Apply ufunc.reduceat to each segment of a packed ragged array.
+
+    np.ufunc.reduceat returns values[idx] rather than an empty reduction for
+    zero-length segments, so only non-empty segments are reduced and empty ones are
+    set to fill_value.
+
+    Args:
+        ufunc (np.ufunc): Binary ufunc to reduce with, e.g. np.minimum or np.add.
+        values (np.ndarray): Flat values of the ragged array.
+        offsets (np.ndarray): Segment offsets as returned by pack_ragged.
+        fill_value (float): Result for empty segments. Defaults to NaN.
+
+    Returns:
+        np.ndarray: One reduced value per segment.
+    """
+    lengths = np.diff(offsets)
+    non_empty = lengths > 0
+    out = np.full(len(lengths), fill_value, dtype=float)
+    if non_empty.any():
+        # start indices of non-empty segments are strictly increasing and each one
+        # reduces up to the next, so empty segments in between contribute nothing
+        out[non_empty] = ufunc.reduceat(values, offsets[:-1][non_empty])
+    return out
+
+
+def load_normal_mode_eigenvals(
+    query: dict[str, Any] | None = None,
+) -> tuple[list[str], NDArray[np.float64], NDArray[np.int64]]:
+    """Collect the dynamical matrix eigenvalues of all static dielectric tasks matching
+    query into a packed ragged array.
+
+    Args:
+        query (dict[str, Any], optional): Mongo-style filter applied to the published
+            task documents (see doc_matches). Defaults to all materials.
+
+    Returns:
+        tuple[list[str], np.ndarray, np.ndarray]: Material IDs, flat eigenvalues and
+            offsets. Duplicate material IDs keep the first task like
+            df_diel_from_task_coll(drop_dup_ids=True).
+    """
+    query_dict = {
+        str(Key.mat_id): {"$regex": "^(mp|mvc|wbm)-"},
+        **(query or {}),
+        "task_label": "static dielectric",
+    }
+    mat_ids: list[str] = []
+    eigen_vals: list[list[float] | None] = []
+    seen_ids: set[str] = set()
+    for doc in load_task_docs():
+        mat_id = doc.get(str(Key.mat_id))
+        if not doc_matches(doc, query_dict) or mat_id in seen_ids:
+            continue
+        calcs = doc.get("calcs_reversed") or [{}]
+        mat_ids.append(mat_id)
+        seen_ids.add(mat_id)
+        eigen_vals.append(calcs[-1].get("output", {}).get("normalmode_eigenvals"))
+
+    return mat_ids, *pack_ragged(eigen_vals)
+
+
+def df_phonon_stability(
+    query: dict[str, Any] | None = None,
+    *,
+    imag_tol: float = imaginary_tol,
+    cache: bool = True,
+) -> pd.DataFrame:
+    """Per-material dynamic stability table computed from the DFPT normal modes.
+
+    Args:
+        query (dict[str, Any], optional): Mongo-style filter for which task documents
+            to include. Defaults to all materials.
+        imag_tol (float): Frequencies (THz) below this count as imaginary. Defaults
+            to imaginary_tol = -1 meV.
+        cache (bool, optional): If True (default), reuse the table cached under
+            data/.db_cache/ next to the task data when present.
+
+    Returns:
+        pd.DataFrame: Indexed by material ID with columns n_modes, min/max phonon
+            frequency (THz), n_imag_modes, imag_mode_frac and is_dyn_stable.
+    """
+    os.makedirs(cache_dir := f"{DATA_DIR}/.db_cache", exist_ok=True)
+    cache_key = hashlib.sha256(f"{query=}, {imag_tol=}".encode()).hexdigest()[:16]
+    # v2: frequencies in THz, v1 tables held unconverted sqrt(eV/Å^2/amu) values
+    csv_path = f"{cache_dir}/phonon-stability-v2-{cache_key}.csv.gz"
+
+    if cache and os.path.isfile(csv_path):
+        print(f"Using cached phonon stability table from {csv_path}")
+        return pd.read_csv(csv_path).set_index(Key.mat_id, drop=False)
+
+    mat_ids, eigen_vals, offsets = load_normal_mode_eigenvals(query)
+    ph_freqs = ph_freqs_from_dyn_mat_evs(eigen_vals)
+    n_modes = np.diff(offsets)
+
+    # segment ID of every flat value for bincount-based per-material counting
+    segment_ids = np.repeat(np.arange(len(n_modes)), n_modes)
+    n_imag = np.bincount(
+        segment_ids, weights=ph_freqs < imag_tol, minlength=len(n_modes)
+    ).astype(int)
+
+    min_freqs = segment_reduce(np.minimum, ph_freqs, offsets)
+    df_stab = pd.DataFrame(
+        {
+            Key.mat_id: mat_ids,
+            "n_modes": n_modes,
+            Key.min_ph_freq: min_freqs,
+            Key.max_ph_freq: segment_reduce(np.maximum, ph_freqs, offsets),
+            "n_imag_modes": n_imag,
+            "imag_mode_frac": n_imag / np.where(n_modes > 0, n_modes, np.nan),
+            # NaN min freq (no modes) compares False so is counted as not stable
+            "is_dyn_stable": min_freqs > imag_tol,
+        }
+    )
+
+    n_stable, n_mats = df_stab.is_dyn_stable.sum(), len(df_stab)
+    print(
+        f"{n_stable:,} / {n_mats:,} = {n_stable / max(n_mats, 1):.1%} materials "
+        f"dynamically stable, {1 - n_stable / max(n_mats, 1):.1%} unstable"
+    )
+
+    df_stab.to_csv(csv_path, index=False)
+    return df_stab.set_index(Key.mat_id, drop=False)
+
+
+def get_ph_freqs(
+    mat_id: str,
+    mat_ids: Sequence[str],
+    eigen_vals: NDArray[np.float64],
+    offsets: NDArray[np.int64],
+) -> NDArray[np.float64]:
+    """Phonon frequencies (THz) of one material from a packed eigenvalue array as
+    returned by load_normal_mode_eigenvals.
+    """
+    idx = list(mat_ids).index(mat_id)
+    return ph_freqs_from_dyn_mat_evs(eigen_vals[offsets[idx] : offsets[idx + 1]])
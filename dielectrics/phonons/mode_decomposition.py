@@ -0,0 +1,158 @@
+"""Mode-resolved decomposition of the ionic dielectric constant from DFPT outputs.
+
+Each zone-center optical mode m with frequency ω_m contributes
+ε_ionic,ij(m) = S_mi S_mj / (ε_0 Ω ω_m^2) where S_mi = Σ_κj' Z*_κ,ij' e_mκj' / sqrt(M_κ)
+is the mode polarity (Gonze & Lee 1997, https://doi.org/10.1103/PhysRevB.55.10355).
+Materials are bucketed by site count so the polarities of a whole bucket come out of
+a single einsum over stacked arrays read from the float32 store in phonons.store.
+"""
+
+import numpy as np
+import pandas as pd
+from numpy.typing import NDArray
+from scipy.constants import angstrom, atomic_mass, e, epsilon_0, pi, tera
+from tqdm import tqdm
+
+from dielectrics import Key
+from dielectrics.phonons import imaginary_tol, ph_freqs_from_dyn_mat_evs
+from dielectrics.phonons.store import (
+    DYN_MAT_STORE_DIR,
+    load_dyn_mat_index,
+    stack_dyn_mat_arrays,
+)
+
+
+# converts mode oscillator strength (e^2/amu) / (volume (Å^3) * freq (THz)^2) to a
+# dimensionless dielectric constant. Frequencies must be in THz (not the raw
+# sqrt(eV/Å^2/amu) of VASP eigenvalues), as returned by ph_freqs_from_dyn_mat_evs
+osc_strength_to_diel = e**2 / (
+    atomic_mass * epsilon_0 * angstrom**3 * (2 * pi * tera) ** 2
+)
+
+mode_decomp_keys = (
+    "normalmode_eigenvals",
+    "normalmode_eigenvecs",
+    "born",
+    "site_masses",
+)
+
+
+def ionic_mode_contribs(
+    ph_freqs: NDArray[np.float64],
+    eigen_vecs: NDArray[np.floating],
+    born_charges: NDArray[np.floating],
+    site_masses: NDArray[np.floating],
+    volumes: NDArray[np.float64],
+    *,
+    imag_tol: float = imaginary_tol,
+) -> NDArray[np.float64]:
+    """Scalar (trace / 3) ionic dielectric contribution of every phonon mode for a batch
+    of materials with equal site count n_sites.
+
+    Args:
+        ph_freqs (np.ndarray): Phonon frequencies in THz, shape (batch, 3 n_sites).
+        eigen_vecs (np.ndarray): Eigenvectors of the mass-weighted dynamical matrix,
+            shape (batch, 3 n_sites, n_sites, 3).
+        born_charges (np.ndarray): Born effective charges, shape (batch, n_sites, 3, 3).
+        site_masses (np.ndarray): Atomic masses in amu, shape (batch, n_sites).
+        volumes (np.ndarray): Cell volumes in Å^3, shape (batch,).
+        imag_tol (float): Modes below abs(imag_tol) THz (imaginary or near-zero) don't
+            contribute. Defaults to imaginary_tol = -1 meV.
+
+    Returns:
+        np.ndarray: Contributions to ε_ionic, shape (batch, 3 n_sites). Summing over
+            modes recovers the scalar ε_ionic (up to numerical noise).
+    """
+    # real-space displacement pattern of each mode
+    displacements = eigen_vecs / np.sqrt(site_masses)[:, None, :, None]
+    mode_polarity = np.einsum("bkij,bmkj->bmi", born_charges, displacements)
+    # trace of the outer product S_m ⊗ S_m
+    osc_strength = np.einsum("bmi,bmi->bm", mode_polarity, mode_polarity)
+
+    is_optical = ph_freqs > abs(imag_tol)
+    # always drop the 3 acoustic modes (smallest |ω|) even if they're above tol
+    acoustic_idx = np.argsort(np.abs(ph_freqs), axis=1)[:, :3]
+    np.put_along_axis(is_optical, acoustic_idx, values=False, axis=1)
+
+    safe_freqs = np.where(is_optical, ph_freqs, 1)
+    contribs = osc_strength_to_diel * osc_strength / (3 * volumes[:, None])
+    return np.where(is_optical, contribs / safe_freqs**2, 0)
+
+
+def df_ionic_mode_decomp(
+    mat_ids: list[str] | None = None,
+    *,
+    top_k: int = 3,
+    batch_size: int = 256,
+    store_dir: str = DYN_MAT_STORE_DIR,
+) -> pd.DataFrame:
+    """Table of the top-k polar modes driving each material's ionic dielectric constant.
+
+    Requires the store written by phonons.store.write_dyn_mat_store().
+
+    Args:
+        mat_ids (list[str], optional): Materials to decompose. Defaults to all in the
+            store that have eigenvalues, eigenvectors, Born charges and masses.
+        top_k (int): Number of largest-contribution modes to report. Defaults to 3.
+        batch_size (int): Max materials stacked per einsum call. Defaults to 256.
+        store_dir (str): Directory of the float32 DFPT store.
+
+    Returns:
+        pd.DataFrame: Indexed by material ID with columns n_sites, diel_ionic_modes
+            (sum over modes), n_polar_modes (modes contributing > 1% of the sum) and
+            mode_{i}_freq (THz), mode_{i}_diel_ionic, mode_{i}_frac for i in 1..top_k.
+    """
+    df_index = load_dyn_mat_index(store_dir)
+    if mat_ids is not None:
+        df_index = df_index.loc[mat_ids]
+    offset_cols = [f"{key}_offset" for key in mode_decomp_keys]
+    has_all = (df_index[offset_cols] >= 0).all(axis=1)
+    if n_missing := (~has_all).sum():
+        print(f"skipping {n_missing:,} materials missing one of {mode_decomp_keys}")
+    df_index = df_index[has_all]
+
+    dfs: list[pd.DataFrame] = []
+    batches = [
+        list(ids[start : start + batch_size])
+        for _, ids in df_index.groupby(Key.n_sites)[Key.mat_id]
+        for start in range(0, len(ids), batch_size)
+    ]
+    for batch_ids in tqdm(batches, desc="Mode-resolved ε_ionic"):
+        arrays = {
+            key: stack_dyn_mat_arrays(batch_ids, key, store_dir).astype(float)
+            for key in mode_decomp_keys
+        }
+        ph_freqs = ph_freqs_from_dyn_mat_evs(arrays["normalmode_eigenvals"])
+        contribs = ionic_mode_contribs(
+            ph_freqs,
+            arrays["normalmode_eigenvecs"],
+            arrays["born"],
+            arrays["site_masses"],
+            df_index.loc[batch_ids, "volume"].to_numpy(dtype=float),
+        )
+        totals = contribs.sum(axis=1)
+        safe_totals = np.where(totals > 0, totals, np.nan)[:, None]
+
+        # fewer than top_k modes only for tiny cells, those get fewer mode columns
+        top_idx = np.argsort(-contribs, axis=1)[:, :top_k]
+        top_contribs = np.take_along_axis(contribs, top_idx, axis=1)
+        top_freqs = np.take_along_axis(ph_freqs, top_idx, axis=1)
+
+        df_batch = pd.DataFrame(
+            {
+                Key.mat_id: batch_ids,
+                Key.n_sites: ph_freqs.shape[1] // 3,
+                "diel_ionic_modes": totals,
+                "n_polar_modes": (contribs / safe_totals > 0.01).sum(axis=1),
+            }
+        )
+        for rank in range(top_idx.shape[1]):
+            df_batch[f"mode_{rank + 1}_freq"] = top_freqs[:, rank]
+            df_batch[f"mode_{rank + 1}_diel_ionic"] = top_contribs[:, rank]
+            df_batch[f"mode_{rank + 1}_frac"] = (
+                top_contribs[:, rank] / safe_totals[:, 0]
+            )
+        dfs.append(df_batch)
+
+    df_modes = pd.concat(dfs, ignore_index=True).round(4)
+    return df_modes.set_index(Key.mat_id, drop=False)
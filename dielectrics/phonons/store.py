@@ -0,0 +1,192 @@
+"""Compact on-disk storage of per-material DFPT arrays (dynamical matrix eigenvectors,
+force constants, Born effective charges, ...) as float32 memory-mapped blocks.
+
+Loading these arrays through df_diel_from_task_coll means holding ~2.5k nested Python
+lists of size (3 n_sites)^2 in RAM. Instead, write_dyn_mat_store extracts them once
+into one flat float32 file per array type plus an index of material IDs and offsets,
+and get_dyn_mat_array returns a read-only view into the memory map for one material.
+"""
+
+import functools
+import os
+from collections.abc import Callable, Sequence
+from contextlib import ExitStack
+from typing import Any
+
+import numpy as np
+import pandas as pd
+from numpy.typing import NDArray
+from pymatgen.core import Structure
+from tqdm import tqdm
+
+from dielectrics import DATA_DIR, Key
+from dielectrics.db.fetch_data import doc_matches, load_task_docs
+
+
+DYN_MAT_STORE_DIR = f"{DATA_DIR}/.db_cache/dyn-mat-store"
+
+# per-material array shapes as a function of the number of sites, keyed by the field
+# name in calcs_reversed[-1].output (see pymatgen Vasprun._parse_dynmat) or its parsed
+# OUTCAR dict (born). site_masses (amu) are derived from the final structure.
+dyn_mat_shapes: dict[str, Callable[[int], tuple[int, ...]]] = {
+    "normalmode_eigenvals": lambda n_sites: (3 * n_sites,),
+    "normalmode_eigenvecs": lambda n_sites: (3 * n_sites, n_sites, 3),
+    "force_constants": lambda n_sites: (n_sites, n_sites, 3, 3),
+    "born": lambda n_sites: (n_sites, 3, 3),
+    "site_masses": lambda n_sites: (n_sites,),
+}
+
+
+def write_dyn_mat_store(
+    query: dict[str, Any] | None = None,
+    *,
+    keys: Sequence[str] = tuple(dyn_mat_shapes),
+    store_dir: str = DYN_MAT_STORE_DIR,
+) -> pd.DataFrame:
+    """Extract DFPT arrays from the published task documents into float32 flat files.
+
+    Each key is written to {store_dir}/{key}.f32 by appending one material's
+    flattened array after another. index.csv records the number of sites, the cell
+    volume (Å^3) and the start offset (in float32 elements) of every material in every
+    file. Materials missing a key get offset -1.
+
+    Args:
+        query (dict[str, Any], optional): Mongo-style filter for which static dielectric
+            task documents to include. Defaults to all materials.
+        keys (Sequence[str]): Which calcs_reversed[-1].output fields to store. Must be
+            keys of dyn_mat_shapes. Defaults to all of them.
+        store_dir (str): Output directory. Defaults to DYN_MAT_STORE_DIR.
+
+    Returns:
+        pd.DataFrame: The offset index, one row per material ID.
+    """
+    if unknown_keys := set(keys) - set(dyn_mat_shapes):
+        raise ValueError(f"{unknown_keys=}, must be in {list(dyn_mat_shapes)}")
+
+    query_dict = {
+        str(Key.mat_id): {"$regex": "^(mp|mvc|wbm)-"},
+        **(query or {}),
+        "task_label": "static dielectric",
+    }
+    os.makedirs(store_dir, exist_ok=True)
+    # write to temp files first so an interrupted run never leaves an index pointing
+    # into truncated or newer array files
+    out_paths = [*(f"{store_dir}/{key}.f32" for key in keys), f"{store_dir}/index.csv"]
+    tmp_paths = {path: f"{path}.{os.getpid()}.tmp" for path in out_paths}
+
+    index_rows: list[dict[str, Any]] = []
+    offsets = dict.fromkeys(keys, 0)
+    seen_ids: set[str] = set()
+    try:
+        with ExitStack() as stack:
+            files = {
+                key: stack.enter_context(
+                    open(tmp_paths[f"{store_dir}/{key}.f32"], mode="wb")
+                )
+                for key in keys
+            }
+            for doc in tqdm(load_task_docs(), desc="Writing DFPT arrays"):
+                mat_id = doc.get(str(Key.mat_id))
+                if not doc_matches(doc, query_dict) or mat_id in seen_ids:
+                    continue
+                seen_ids.add(mat_id)
+                output = (doc.get("calcs_reversed") or [{}])[-1].get("output", {})
+
+                row: dict[str, Any] = {Key.mat_id: mat_id}
+                if struct_dict := doc.get("output", {}).get("structure"):
+                    struct = Structure.from_dict(struct_dict)
+                    n_sites, row["volume"] = len(struct), struct.volume
+                    output = output | {
+                        "site_masses": [site.species.weight for site in struct]
+                    }
+                else:  # 3 normal modes per site if the task doc has no final structure
+                    n_sites = len(output.get("normalmode_eigenvals") or []) // 3
+                row[Key.n_sites] = n_sites
+                for key in keys:
+                    outcar = output.get("outcar") or {}
+                    val = output.get(key) or outcar.get(key) or []
+                    arr = np.asarray(val, dtype=np.float32)
+                    if arr.size == 0 or arr.shape != dyn_mat_shapes[key](n_sites):
+                        row[f"{key}_offset"] = -1
+                        continue
+                    arr.tofile(files[key])
+                    row[f"{key}_offset"] = offsets[key]
+                    offsets[key] += arr.size
+                index_rows.append(row)
+
+        df_index = pd.DataFrame(index_rows)
+        df_index.to_csv(tmp_paths[f"{store_dir}/index.csv"], index=False)
+        # index.csv goes last so readers never see offsets into old array files
+        for path in out_paths:
+            os.replace(tmp_paths[path], path)
+    finally:
+        for tmp_path in tmp_paths.values():
+            if os.path.isfile(tmp_path):
+                os.remove(tmp_path)
+    _load_index.cache_clear()
+    _open_memmap.cache_clear()
+
+    sizes = {key: f"{offset * 4 / 1e6:,.1f} MB" for key, offset in offsets.items()}
+    print(f"Wrote DFPT arrays for {len(df_index):,} materials to {store_dir}: {sizes}")
+    return df_index.set_index(Key.mat_id, drop=False)
+
+
+@functools.cache
+def _load_index(store_dir: str) -> pd.DataFrame:
+    index_path = f"{store_dir}/index.csv"
+    if not os.path.isfile(index_path):
+        raise FileNotFoundError(
+            f"{index_path} not found, run write_dyn_mat_store() to create it"
+        )
+    return pd.read_csv(index_path).set_index(Key.mat_id, drop=False)
+
+
+@functools.cache
+def _open_memmap(store_dir: str, key: str) -> np.memmap:
+    return np.memmap(f"{store_dir}/{key}.f32", dtype=np.float32, mode="r")
+
+
+def load_dyn_mat_index(store_dir: str = DYN_MAT_STORE_DIR) -> pd.DataFrame:
+    """Load the material ID/n_sites/offset index written by write_dyn_mat_store."""
+    return _load_index(store_dir)
+
+
+def get_dyn_mat_array(
+    mat_id: str, key: str, store_dir: str = DYN_MAT_STORE_DIR
+) -> NDArray[np.float32] | None:
+    """Get one material's DFPT array as a read-only view into the memory-mapped store.
+    Nothing is read from disk until the returned array is accessed.
+
+    Args:
+        mat_id (str): Material ID.
+        key (str): Array name, one of dyn_mat_shapes, e.g. "normalmode_eigenvecs".
+        store_dir (str): Directory written by write_dyn_mat_store. Defaults to
+            DYN_MAT_STORE_DIR.
+
+    Returns:
+        np.ndarray | None: Array of shape dyn_mat_shapes[key](n_sites) or None if the
+            material has no such array.
+    """
+    row = _load_index(store_dir).loc[mat_id]
+    if (offset := int(row[f"{key}_offset"])) < 0:
+        return None
+    shape = dyn_mat_shapes[key](int(row[Key.n_sites]))
+    return _open_memmap(store_dir, key)[offset : offset + np.prod(shape)].reshape(shape)
+
+
+def stack_dyn_mat_arrays(
+    mat_ids: Sequence[str], key: str, store_dir: str = DYN_MAT_STORE_DIR
+) -> NDArray[np.float32]:
+    """Stack one DFPT array for several materials with equal site counts into a single
+    (len(mat_ids), *dyn_mat_shapes[key](n_sites)) float32 array for batched math.
+
+    Raises:
+        ValueError: If the materials differ in n_sites or any of them lacks key.
+    """
+    df_index = _load_index(store_dir).loc[list(mat_ids)]
+    if len(set(df_index[Key.n_sites])) > 1:
+        raise ValueError(f"{key} arrays of {mat_ids=} differ in n_sites")
+    if (df_index[f"{key}_offset"] < 0).any():
+        raise ValueError(f"some of {mat_ids=} have no {key} array")
+
+    return np.stack([get_dyn_mat_array(mat_id, key, store_dir) for mat_id in mat_ids])
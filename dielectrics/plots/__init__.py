@@ -1,29 +1,89 @@
-"""Shared plotly/matplotlib plotting defaults for the project."""
+"""Shared plotly/matplotlib plotting defaults for the project.
+
+Importing this module applies them (plotly template, axis labels of Key columns,
+matplotlib rc params). Kept out of the top-level package so headless jobs never import
+the plotting stack. Scripts that plot get plt/px from here, e.g.
+from dielectrics.plots import plt.
+"""
+
+import functools
 
 import matplotlib.pyplot as plt
 import plotly.express as px
+import pymatviz as pmv
+
+from dielectrics import Key
+
+
+ev_per_atom = pmv.utils.html_tag("(eV/atom)", tag="span", style="small")
+eV = pmv.utils.html_tag("(eV)", tag="span", style="small")  # noqa: N816
+
+
+@functools.cache
+def apply_plot_defaults() -> None:
+    """Set plotly template, axis labels and matplotlib rc params (once per process)."""
+    pmv.set_plotly_template("pymatviz_white")
+
+    px.defaults.labels |= {
+        Key.bandgap_hse: f"E<sub>gap HSE</sub> {eV}",
+        Key.bandgap_mp: f"E<sub>gap MP</sub> {eV}",
+        Key.bandgap_pbe: f"E<sub>gap PBE</sub> {eV}",
+        Key.bandgap_us: f"E<sub>gap us</sub> {eV}",
+        Key.bandgap_wren: f"E<sub>gap Wren</sub> {eV}",
+        Key.crystal_sys: "Crystal system",
+        Key.date: "Date",
+        Key.diel_elec_pbe: "ε<sub>elec</sub>",
+        Key.diel_elec_mp: "ε<sub>elec MP</sub>",
+        Key.diel_elec_wren: "ε<sub>elec Wren</sub>",
+        Key.diel_ionic_pbe: "ε<sub>ionic</sub>",
+        Key.diel_ionic_mp: "ε<sub>ionic MP</sub>",
+        Key.diel_ionic_wren: "ε<sub>ionic Wren</sub>",
+        Key.diel_total: "ε<sub>total</sub>",
+        Key.diel_total_mp: "ε<sub>total MP</sub>",
+        Key.diel_total_pbe: "ε<sub>total PBE</sub>",
+        Key.diel_total_us: "ε<sub>total us</sub>",
+        Key.diel_total_wren: "ε<sub>total Wren</sub>",
+        Key.e_above_hull_mp: f"E<sub>hull dist MP</sub> {ev_per_atom}",
+        Key.e_above_hull_pbe: f"E<sub>hull dist PBE</sub> {ev_per_atom}",
+        Key.e_above_hull_wren: f"E<sub>hull dist Wren</sub> {ev_per_atom}",
+        Key.e_per_atom: f"energy {ev_per_atom}",  # usually PBE energy
+        Key.fom: "Φ",
+        # figure of merit from PBE band gap and eps_total
+        Key.fom_pbe: "Φ<sub>PBE</sub>",
+        Key.fom_wren: "Φ<sub>Wren</sub>",
+        Key.fom_wren_std_adj: "Φ<sub>Wren - std</sub>",
+        Key.formula: "Formula",
+        # of electric field in exp. impedance/reflectance plots
+        Key.freq: "Frequency (Hz)",
+        Key.mat_id: "Material ID",
+        Key.spg: "Space group",
+        Key.structure: "Structure",
+        Key.symmetry: "Symmetry",
+        Key.selection_status: "Selection status",
+    }
+
+    px.defaults.labels |= dict(
+        n_atoms="Atom Count",
+        n_elems="Element Count",
+        crystal_sys="Crystal system",
+        n="Refractive index n",
+        spg_num="Space group number",
+        n_sites="Number of unit cell sites",
+        energy_per_atom="Energy (eV/atom)",
+        e_above_hull_pbe="PBE hull distance (eV)",
+        diel_total="Total dielectric constant",
+        diel_elec="Electronic dielectric constant",
+        diel_ionic="Ionic dielectric constant",
+        bandgap_us="E<sub>gap Us</sub> (eV)",
+        bandgap_mp="E<sub>gap MP</sub> (eV)",
+        bandgap_pbe="E<sub>gap PBE</sub> (eV)",
+        bandgap_wren="E<sub>Wren</sub> (eV)",
+    )
+
+    plt.rc("font", size=16)
+    plt.rc("savefig", bbox="tight", dpi=200)
+    plt.rc("figure", dpi=200, titlesize=18)
+    plt.rcParams["figure.constrained_layout.use"] = True
 
 
-px.defaults.labels |= dict(
-    n_atoms="Atom Count",
-    n_elems="Element Count",
-    crystal_sys="Crystal system",
-    n="Refractive index n",
-    spg_num="Space group number",
-    n_sites="Number of unit cell sites",
-    energy_per_atom="Energy (eV/atom)",
-    e_above_hull_pbe="PBE hull distance (eV)",
-    diel_total="Total dielectric constant",
-    diel_elec="Electronic dielectric constant",
-    diel_ionic="Ionic dielectric constant",
-    bandgap_us="E<sub>gap Us</sub> (eV)",
-    bandgap_mp="E<sub>gap MP</sub> (eV)",
-    bandgap_pbe="E<sub>gap PBE</sub> (eV)",
-    bandgap_wren="E<sub>Wren</sub> (eV)",
-)
-
-
-plt.rc("font", size=16)
-plt.rc("savefig", bbox="tight", dpi=200)
-plt.rc("figure", dpi=200, titlesize=18)
-plt.rcParams["figure.constrained_layout.use"] = True
+apply_plot_defaults()
@@ -2,7 +2,6 @@
 import os
 
 import pandas as pd
-import plotly.express as px
 import pymatviz as pmv
 from pymatgen.core import Structure
 from pymatgen.transformations.advanced_transformations import (
@@ -12,6 +11,7 @@ from pymatgen.transformations.advanced_transformations import (
 from pymatgen.util.string import htmlify
 
 from dielectrics import DATA_DIR, PAPER_FIGS, Key
+from dielectrics.plots import px  # side-effect import sets plotly template and plt.rc
 
 
 os.makedirs(PAPER_FIGS, exist_ok=True)
@@ -5,14 +5,15 @@ import os
 from typing import Any
 
 import pandas as pd
-import plotly.express as px
 import plotly.graph_objects as go
 import pymatviz as pmv
 from pymatgen.core import Composition
 from pymatviz import crystal_sys_order
 
 from dielectrics import DATA_DIR, PAPER_FIGS, Key
+from dielectrics.datasets import read_dataset
 from dielectrics.db.fetch_data import df_diel_from_task_coll
+from dielectrics.plots import px  # side-effect import sets plotly template and plt.rc
 
 
 os.makedirs(f"{PAPER_FIGS}/ptable/", exist_ok=True)
@@ -36,7 +37,7 @@ df_us = df_us.query(f"{Key.diel_elec_pbe} < 100")
 assert len(df_us) == 2542, f"Expected 2522 materials, got {len(df_us)}"
 
 # load MP data
-df_mp = pd.read_json(f"{DATA_DIR}/mp-exploration/mp-diel-train.json.bz2")
+df_mp = read_dataset("mp-exploration/mp-diel-train")
 
 
 # %% get DFPT counts by structure origin (MP, WBM, element substitution)
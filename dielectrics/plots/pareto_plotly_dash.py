@@ -5,31 +5,38 @@ scatter points to view their structure and edit their selection status.
 # %%
 from __future__ import annotations
 
+import atexit
+import functools
+import itertools
 import os
+import queue
+import threading
+from collections import OrderedDict
 from typing import TYPE_CHECKING, Any
 
 import crystal_toolkit.components as ctc
 import dash
 import numpy as np
 import pandas as pd
-import plotly.express as px
-import plotly.figure_factory as ff
 import plotly.graph_objects as go
 import pymatviz as pmv
 from bson import ObjectId
 from bson.objectid import InvalidId
 from crystal_toolkit.settings import SETTINGS as CTK_SETTINGS
-from dash import Dash, dcc, html
-from dash.dependencies import Input, Output
+from dash import Dash, Patch, dcc, html
+from dash.dependencies import Input, Output, State
 from plotly.validator_cache import ValidatorCache
+from pymongo.errors import PyMongoError
 
 from dielectrics import DATA_DIR, Key, SelectionStatus, today
+from dielectrics.datasets import dataset_exists, read_dataset
 from dielectrics.db import db
-from dielectrics.db.fetch_data import df_diel_from_task_coll
+from dielectrics.db.fetch_data import df_diel_from_task_coll, load_task_docs
+from dielectrics.plots import px  # side-effect import sets plotly template and plt.rc
 
 
 if TYPE_CHECKING:
-    from collections.abc import Hashable
+    from collections.abc import Hashable, Sequence
 
     from pymatgen.core import Structure
 
@@ -62,46 +69,53 @@ hover_data_keys = dict(
     task_id=Key.task_id,
     wyckoff=Key.wyckoff,
 )
+# traces with more points are rendered with WebGL (scattergl) instead of SVG
+webgl_min_points = 2_000
 
 
 # %% see db/readme.md for details on how candidates in each df were selected
-df_all = df_diel_from_task_coll({}, cache=True).round(3)
+@functools.cache
+def load_datasets() -> dict[str, pd.DataFrame]:
+    """Load all datasets shown in the Pareto plot once into a shared in-process store.
+    Optional datasets missing on disk are left out.
 
-
-# %%
-if os.path.isfile(f"{DATA_DIR}/mp-exploration/mp-diel-train.json.bz2"):
-    INCLUDE_MP = True
-    df_diel_mp = pd.read_json(f"{DATA_DIR}/mp-exploration/mp-diel-train.json.bz2")
-    # discard negative and unrealistically large dielectric constants
-    df_diel_mp = df_diel_mp.query("0 < diel_total_mp < 2000").round(3)
-else:
-    INCLUDE_MP = False
-
-
-# %%
-# qz3 for author last name initials (https://rdcu.be/cCMga)
-# unprocessed JSON from https://doi.org/10.6084/m9.figshare.10482707.v2
-if os.path.isfile(f"{DATA_DIR}/others/qz3/qz3-diel.csv.bz2"):
-    INCLUDE_QZ3 = True
-    df_qz3 = pd.read_csv(f"{DATA_DIR}/others/qz3/qz3-diel.csv.bz2").round(3)
-else:
-    INCLUDE_QZ3 = False
-
-
-# %%
-if os.path.isfile(f"{DATA_DIR}/others/yim/dielectrics.json.bz2"):
-    INCLUDE_YIM = True
-    df_yim = pd.read_json(f"{DATA_DIR}/others/yim/dielectrics.json.bz2")
-    df_yim = df_yim.query(f"0 < {Key.diel_total_pbe} < 1000").rename(
-        columns={"possible_mp_id": Key.mat_id}
-    )
-    df_yim = df_yim.dropna(subset=[Key.mat_id, Key.formula])
-    for accu in ["pbe", "hse"]:
-        df_yim = df_yim.eval(f"fom_{accu} = bandgap_{accu} * {Key.diel_total_pbe};")
-
-    df_yim = df_yim.nlargest(500, Key.fom_pbe)
-else:
-    INCLUDE_YIM = False
+    Returns:
+        dict[str, pd.DataFrame]: Maps dataset name (ours, mp, qz3, yim) to DataFrame.
+    """
+    datasets = {"ours": df_diel_from_task_coll({}, cache=True).round(3)}
+
+    if dataset_exists(mp_name := "mp-exploration/mp-diel-train"):
+        # structures are fetched per clicked point, no need to decode them here
+        df_diel_mp = read_dataset(mp_name, exclude=[Key.structure])
+        # discard negative and unrealistically large dielectric constants
+        datasets["mp"] = df_diel_mp.query("0 < diel_total_mp < 2000").round(3)
+
+    # qz3 for author last name initials (https://rdcu.be/cCMga)
+    # unprocessed JSON from https://doi.org/10.6084/m9.figshare.10482707.v2
+    if os.path.isfile(qz3_path := f"{DATA_DIR}/others/qz3/qz3-diel.csv.bz2"):
+        datasets["qz3"] = pd.read_csv(qz3_path).round(3)
+
+    if os.path.isfile(yim_path := f"{DATA_DIR}/others/yim/dielectrics.json.bz2"):
+        df_yim = pd.read_json(yim_path)
+        df_yim = df_yim.query(f"0 < {Key.diel_total_pbe} < 1000").rename(
+            columns={"possible_mp_id": Key.mat_id}
+        )
+        df_yim = df_yim.dropna(subset=[Key.mat_id, Key.formula])
+        for accu in ["pbe", "hse"]:
+            df_yim = df_yim.eval(f"fom_{accu} = bandgap_{accu} * {Key.diel_total_pbe};")
+        datasets["yim"] = df_yim.nlargest(500, Key.fom_pbe)
+
+    return datasets
+
+
+datasets = load_datasets()
+df_all = datasets["ours"]
+if INCLUDE_MP := "mp" in datasets:
+    df_diel_mp = datasets["mp"]
+if INCLUDE_QZ3 := "qz3" in datasets:
+    df_qz3 = datasets["qz3"]
+if INCLUDE_YIM := "yim" in datasets:
+    df_yim = datasets["yim"]
 
 
 # %%
@@ -133,13 +147,18 @@ def get_mp_link(data: str, text: str | None = None) -> str:
     return f"<a {href=} {style=}>{text or 'x'}</a>"
 
 
-def create_text_col(df: pd.DataFrame, annotate_min_fom: float = 300) -> list[str]:
+def create_text_col(
+    df: pd.DataFrame, annotate_min_fom: float = 300, *, labels_only: bool = False
+) -> list[str]:
     """Insert a 'text' column into df with the materials's formula which when clicked
     links to its Materials Project details page if an MP ID is available.
 
     Args:
         df (pd.DataFrame): DataFrame with a 'formula' column.
         annotate_min_fom (float): minimum figure of merit to annotate a data point.
+        labels_only (bool): If True, points below annotate_min_fom get empty text
+            instead of an invisible link. Used for WebGL traces where thousands of
+            text elements are the main rendering cost.
     """
     if Key.mat_id not in df:
         df[Key.mat_id] = ""
@@ -156,7 +175,7 @@ def create_text_col(df: pd.DataFrame, annotate_min_fom: float = 300) -> list[str
         df[Key.mat_id].str.startswith(("mp-", "mvc-")), df[Key.formula]
     )
     return [
-        get_mp_link(mat_id, text)
+        get_mp_link(mat_id, text) if text or not labels_only else ""
         for mat_id, text in zip(srs_mat_id, text_col, strict=True)
     ]
 
@@ -173,14 +192,23 @@ def scatter(
     validator. Also adds hover data with nicer labels and text annotations linking to
     MP detail pages where MP IDs are available.
     Can be used on its own but mostly called by scatter_with_quiver().
+    Switches to WebGL rendering above webgl_min_points points.
     """
-    df_in["text"] = create_text_col(df_in, kwargs.pop("annotate_min_fom", None))
+    use_webgl = len(df_in) > webgl_min_points
+    df_in["text"] = create_text_col(
+        df_in, kwargs.pop("annotate_min_fom", 300), labels_only=use_webgl
+    )
 
     # drop cols with > 90% missing data
     df_in = df_in.dropna(thresh=int(0.1 * len(df_in)), axis=1)
-    df_in = df_in.fillna("n/a")  # fill remaining NaNs to avoid %{customdata[idx]}
 
     hover_keys: list[str] = sorted({*hover_data_keys.values()} & set(df_in))
+    # only ship columns the trace uses to the browser
+    used_cols = {x_col, y_col, "text", "_id", Key.mat_id, *hover_keys}
+    df_in = df_in[[col for col in df_in if col in used_cols]].copy()
+    # fill remaining NaNs to avoid %{customdata[idx]}, keep x/y numeric
+    fill_cols = [col for col in hover_keys if col not in (x_col, y_col)]
+    df_in[fill_cols] = df_in[fill_cols].astype(object).fillna("n/a")
     # hover_keys = sorted(hover_keys, key=list(pretty_col_names.values()).index)
     hover_data: dict[str, bool] = dict.fromkeys(hover_keys, True)
     # don't show text value in hover tooltip
@@ -197,7 +225,13 @@ def scatter(
 
     visible = kwargs.pop("visible", "legendonly")  # default trace to hidden
     scatter_plot = px.scatter(
-        df_in, x=x_col, y=y_col, hover_data=hover_data, text="text", **kwargs
+        df_in,
+        x=x_col,
+        y=y_col,
+        hover_data=hover_data,
+        text="text",
+        render_mode="webgl" if use_webgl else "svg",
+        **kwargs,
     )
 
     global symbol_iter  # noqa: PLW0602
@@ -212,6 +246,50 @@ def scatter(
     return scatter_plot
 
 
+def quiver_trace(
+    x: Sequence[float],
+    y: Sequence[float],
+    u: Sequence[float],
+    v: Sequence[float],
+    *,
+    arrow_scale: float = 0.02,
+    angle: float = 3.14 * 0.01,
+    **kwargs: Any,
+) -> go.Scatter | go.Scattergl:
+    """All arrows from (x, y) to (x + u, y + v) as a single line trace. Shafts and
+    arrow heads of all arrows are computed in one vectorized pass and separated by NaN
+    gaps, replacing ff.create_quiver's per-arrow Python loops.
+
+    Args:
+        x (Sequence[float]): Arrow start x-coordinates.
+        y (Sequence[float]): Arrow start y-coordinates.
+        u (Sequence[float]): Arrow x-components.
+        v (Sequence[float]): Arrow y-components.
+        arrow_scale (float): Arrow head length as fraction of arrow length.
+        angle (float): Half-angle between arrow head barbs and shaft in radians.
+        **kwargs: Passed to go.Scatter(gl).
+
+    Returns:
+        go.Scatter | go.Scattergl: Scattergl if the trace has more than
+            webgl_min_points vertices.
+    """
+    x0, y0, u, v = (np.asarray(arr, dtype=float) for arr in (x, y, u, v))
+    x1, y1 = x0 + u, y0 + v
+    barb_len = arrow_scale * np.hypot(u, v)
+    shaft_angle = np.arctan2(v, u)
+    barb_angles = (shaft_angle + angle, shaft_angle - angle)
+    barb_xs = [x1 - barb_len * np.cos(ang) for ang in barb_angles]
+    barb_ys = [y1 - barb_len * np.sin(ang) for ang in barb_angles]
+    gap = np.full_like(x0, np.nan)
+
+    # per arrow: shaft start, tip, gap, barb 1 end, tip, barb 2 end, gap
+    xs = np.column_stack([x0, x1, gap, barb_xs[0], x1, barb_xs[1], gap]).ravel()
+    ys = np.column_stack([y0, y1, gap, barb_ys[0], y1, barb_ys[1], gap]).ravel()
+
+    trace_cls = go.Scattergl if len(xs) > webgl_min_points else go.Scatter
+    return trace_cls(x=xs, y=ys, mode="lines", **kwargs)
+
+
 def scatter_with_quiver(
     dfs: list[pd.DataFrame] | pd.DataFrame,
     *,
@@ -245,15 +323,8 @@ def scatter_with_quiver(
     fig_scatter_1 = scatter(df1, x_col=x1, y_col=y1, **scatter_1)
     fig_scatter_2 = scatter(df2, x_col=x2, y_col=y2, **scatter_2)
 
-    quiver = ff.create_quiver(
-        x=df1[x1],
-        y=df1[y1],
-        u=delta_x,
-        v=delta_y,
-        arrow_scale=0.02,
-        scale=1,
-        angle=3.14 * 0.01,  # smaller = steeper arrow head angle
-        hoverinfo="skip",
+    quiver = go.Figure(
+        quiver_trace(df1[x1], df1[y1], delta_x, delta_y, hoverinfo="skip")
     )
 
     traces = quiver.data + fig_scatter_1.data + fig_scatter_2.data
@@ -298,6 +369,16 @@ if INCLUDE_MP:
         visible="legendonly",
     )
 
+    # all MP training points as clickable markers, only shipped to the browser when
+    # toggled and then downsampled to the viewport (see viewport_trace_data)
+    mp_points = scatter(
+        df_diel_mp.assign(_id=df_diel_mp[Key.mat_id]),
+        x_col=Key.diel_total_mp,
+        y_col=Key.bandgap_mp,
+        legend_name=f"{len(df_diel_mp):,} Materials Project training points",
+    )
+    fig.add_traces(data=mp_points.data)
+
     known_diels = [
         # formulas taken from fig. 4 in 2nd atomate dielectric paper https://rdcu.be/cBCqt
         *["AlTlF4", "Bi2SO2", "BiCl3", "BiF3", "HfO2", "SiO2", "SnCl2", "Tl2SnCl6"],
@@ -524,6 +605,206 @@ fig.write_html(f"{module_dir}/pareto-plotly.html", include_plotlyjs="cdn")
 # fig.show()
 
 
+# %% serve trace data on demand: the browser initially only receives visible traces,
+# hidden (legendonly) traces are filled in when toggled and large marker layers are
+# downsampled to the current viewport
+per_point_attrs = ("x", "y", "customdata", "text", "hovertext")
+max_points_per_trace = 5_000
+
+for trace_idx, trace in enumerate(fig.data):
+    trace.uid = str(trace_idx)
+# full traces stay server-side, keyed by their position in fig.data
+trace_store = {int(trace.uid): trace for trace in fig.data}
+
+
+def is_downsamplable(trace: go.BaseTraceType) -> bool:
+    """Only plain marker scatters can be subsampled point-wise. Line traces (quivers)
+    use None separators and contours aggregate all points client-side.
+    """
+    return (
+        trace.type in ("scatter", "scattergl")
+        and "lines" not in (trace.mode or "markers")
+        and trace.x is not None
+        and None not in trace.x
+    )
+
+
+def get_per_point_attrs(trace: go.BaseTraceType) -> list[str]:
+    """Names of the per-point data attributes set on a trace."""
+    return [
+        attr for attr in per_point_attrs if attr in trace and trace[attr] is not None
+    ]
+
+
+def viewport_trace_data(
+    trace_idx: int,
+    x_range: list[float] | None = None,
+    y_range: list[float] | None = None,
+    max_points: int = max_points_per_trace,
+) -> dict[str, list[Any]]:
+    """Per-point data of a stored trace, restricted to the viewport and randomly
+    subsampled (with fixed seed for stable point sets between zooms) to max_points.
+
+    Args:
+        trace_idx (int): Index of the trace in fig.data.
+        x_range (list[float], optional): Visible x-axis [min, max]. Defaults to all.
+        y_range (list[float], optional): Visible y-axis [min, max]. Defaults to all.
+        max_points (int): Max number of points to send to the browser.
+
+    Returns:
+        dict[str, list[Any]]: Maps per-point trace attributes (x, y, customdata, ...)
+            to their values.
+    """
+    trace = trace_store[trace_idx]
+    attrs = get_per_point_attrs(trace)
+    if not is_downsamplable(trace):
+        return {attr: list(trace[attr]) for attr in attrs}
+
+    xs = np.asarray(trace.x, dtype=float)
+    ys = np.asarray(trace.y, dtype=float)
+    in_view = np.isfinite(xs) & np.isfinite(ys)
+    if x_range:
+        in_view &= (xs >= min(x_range)) & (xs <= max(x_range))
+    if y_range:
+        in_view &= (ys >= min(y_range)) & (ys <= max(y_range))
+    keep = np.flatnonzero(in_view)
+    if len(keep) > max_points:
+        rng = np.random.default_rng(seed=0)
+        keep = np.sort(rng.choice(keep, size=max_points, replace=False))
+
+    return {
+        attr: np.asarray(trace[attr], dtype=object)[keep].tolist() for attr in attrs
+    }
+
+
+def lazy_figure(full_fig: go.Figure) -> go.Figure:
+    """Copy of full_fig with per-point data of hidden traces stripped and large visible
+    marker traces downsampled.
+    """
+    light_fig = go.Figure(full_fig)
+    x_range, y_range = full_fig.layout.xaxis.range, full_fig.layout.yaxis.range
+    for trace in light_fig.data:
+        if trace.visible == "legendonly":
+            trace.update({attr: [] for attr in get_per_point_attrs(trace)})
+        elif is_downsamplable(trace) and len(trace.x) > max_points_per_trace:
+            trace.update(viewport_trace_data(int(trace.uid), x_range, y_range))
+    # keep zoom and legend state when patching trace data from callbacks
+    light_fig.layout.uirevision = "pareto"
+    return light_fig
+
+
+# %% task doc cache behind the click callbacks: structures (plus formula and material
+# ID, which never change) are preloaded from the published task data, parsed into
+# Structures in an LRU cache and only fetched from Mongo for IDs missing from the
+# offline data. Notes and selection status are editable, so they are always read from
+# Mongo (once per doc and session, then kept in sync by our own writes). Note edits
+# are written to Mongo by a background thread so the UI never waits on the database,
+# the outcome of each write is recorded in write_results and polled by the UI.
+doc_fields = ("formula_pretty", Key.mat_id)
+note_fields = ("notes", Key.selection_status)
+max_cached_docs = 256
+doc_cache: OrderedDict[str, dict[str, Any]] = OrderedDict()
+notes_cache: dict[str, dict[str, str]] = {}
+doc_cache_lock = threading.Lock()
+write_queue: queue.Queue[tuple[int, str, dict[str, str]]] = queue.Queue()
+# write ID -> None if saved, else error message, missing while the write is pending
+write_results: dict[int, str | None] = {}
+write_ids = itertools.count()
+
+
+@functools.cache
+def load_offline_docs() -> dict[str, dict[str, Any]]:
+    """Slim copies of the published task docs keyed by str(_id) (as in customdata)."""
+    return {
+        str(doc["_id"]): {
+            **{key: doc.get(key, "") for key in doc_fields},
+            Key.structure: (doc.get("output") or {}).get("structure"),
+        }
+        for doc in load_task_docs()
+        if "_id" in doc
+    }
+
+
+def fetch_doc(_id: str) -> dict[str, Any]:
+    """Get formula, material ID and structure for a scatter point ID from the offline
+    task data, falling back to Mongo (task _ids) or the Materials Project API (mp-*
+    IDs of MP training points).
+    """
+    if _id.startswith("mp"):
+        from pymatgen.ext.matproj import MPRester  # noqa: PLC0415
+
+        return {
+            Key.mat_id: _id,
+            Key.structure: MPRester().get_structure_by_material_id(_id),
+        }
+    if (doc := load_offline_docs().get(_id)) is None:
+        projection = [*doc_fields, "output.structure"]
+        doc = db.tasks.find_one({"_id": ObjectId(_id)}, projection) or {}
+        doc[Key.structure] = (doc.pop("output", None) or {}).get("structure")
+    return dict(doc)
+
+
+def get_task_doc(_id: str) -> dict[str, Any]:
+    """LRU-cached fetch_doc() with the structure dict parsed into a Structure."""
+    with doc_cache_lock:
+        if _id in doc_cache:
+            doc_cache.move_to_end(_id)
+            return doc_cache[_id]
+
+    doc = fetch_doc(_id)
+    if isinstance(struct := doc.get(Key.structure), dict):
+        from pymatgen.core import Structure  # noqa: PLC0415
+
+        doc[Key.structure] = Structure.from_dict(struct)
+
+    with doc_cache_lock:
+        doc_cache[_id] = doc
+        while len(doc_cache) > max_cached_docs:
+            doc_cache.popitem(last=False)
+    return doc
+
+
+def get_notes(_id: str) -> dict[str, str]:
+    """Current notes and selection status of a task doc from Mongo. Cached per
+    session, the cache is updated on save and invalidated if the save failed.
+    Points without a task _id (e.g. MP training points) have no notes.
+    """
+    if not ObjectId.is_valid(_id):
+        return {}
+    with doc_cache_lock:
+        if _id in notes_cache:
+            return dict(notes_cache[_id])
+
+    doc = db.tasks.find_one({"_id": ObjectId(_id)}, list(note_fields)) or {}
+    notes = {key: doc.get(key) or "" for key in note_fields}
+    with doc_cache_lock:
+        # don't clobber an edit saved while the query was in flight
+        notes_cache.setdefault(_id, notes)
+        return dict(notes_cache[_id])
+
+
+def db_writer() -> None:
+    """Drain write_queue into the Mongo task collection (runs in a daemon thread)."""
+    while True:
+        write_id, _id, payload = write_queue.get()
+        try:
+            db.tasks.update_one({"_id": ObjectId(_id)}, {"$set": payload})
+            write_results[write_id] = None
+        except Exception as exc:  # noqa: BLE001
+            print(f"failed to save {payload=} for {_id=}: {exc!r}")
+            write_results[write_id] = f"failed to save: {exc}"
+            # cached notes no longer match Mongo, re-read them on next click
+            with doc_cache_lock:
+                notes_cache.pop(_id, None)
+        finally:
+            write_queue.task_done()
+
+
+threading.Thread(target=db_writer, daemon=True).start()
+# flush pending note edits before the interpreter exits
+atexit.register(write_queue.join)
+
+
 # %% Dash app to display structure and notes for selected material next to Pareto plot
 app = Dash(
     prevent_initial_callbacks=True,
@@ -534,7 +815,7 @@ app.title = "Dielectric Pareto Front"  # browser tab title
 
 graph = dcc.Graph(
     id="pareto-plot",
-    figure=fig,
+    figure=lazy_figure(fig),
     responsive=True,
     style=dict(
         # height="min(800px, 60vw)",
@@ -601,7 +882,21 @@ main_layout = html.Main(
     style=global_styles,
 )
 
-app.layout = html.Div([h1, main_layout])
+# visible trace indices and axis ranges, needed to re-serve downsampled traces on zoom
+view_state = dcc.Store(
+    id="view-state",
+    data=dict(
+        visible=[int(t.uid) for t in fig.data if t.visible != "legendonly"],
+        x_range=list(fig.layout.xaxis.range),
+        y_range=list(fig.layout.yaxis.range),
+    ),
+)
+
+# ID of the last queued note write, polled until db_writer reports its outcome
+pending_write = dcc.Store(id="pending-write")
+write_poll = dcc.Interval(id="write-poll", interval=500, disabled=True)
+
+app.layout = html.Div([h1, main_layout, view_state, pending_write, write_poll])
 ctc.register_crystal_toolkit(app=app, layout=app.layout)
 
 
@@ -612,21 +907,27 @@ ctc.register_crystal_toolkit(app=app, layout=app.layout)
     Input(graph, "clickData"),
 )
 def fetch_notes(click_data: dict[str, list[dict[str, Any]]]) -> tuple[str, str, str]:
-    """Fetch notes and selection status from Mongo database for selected material."""
+    """Fetch notes and selection status for selected material from Mongo and its
+    formula and material ID from the doc cache.
+    """
     try:
-        # get Mongo ObjectID from clickData
-        mongo_id = ObjectId(click_data["points"][0]["customdata"][0])
-    except (InvalidId, TypeError):
+        _id = str(click_data["points"][0]["customdata"][0])
+        doc = get_task_doc(_id)
+    except (InvalidId, TypeError, IndexError, KeyError):
         return "", "", ""
 
-    fields = ["notes", Key.selection_status, "formula_pretty", Key.mat_id]
-    doc: dict[str, str] = db.tasks.find_one({"_id": mongo_id}, fields) or {}
-    notes, status, formula, mat_id = (doc.get(key, "") for key in fields)
-    return notes, status, f"{formula} ({mat_id})".replace("->", "→")
+    formula, mat_id = (doc.get(key) or "" for key in doc_fields)
+    title = f"{formula} ({mat_id})".replace("->", "→")
+    try:
+        notes = get_notes(_id)
+    except PyMongoError as exc:
+        return "", "", f"{title} - failed to load notes: {exc}"
+    notes, status = (notes.get(key) or "" for key in note_fields)
+    return notes, status, title
 
 
 @app.callback(
-    Output(span, "children"),
+    Output(pending_write, "data"),
     Input(save_btn, "n_clicks"),
     Input(textarea, "value"),
     Input(graph, "clickData"),
@@ -638,50 +939,127 @@ def update_notes(
     notes: str,
     click_data: dict[str, list[dict[str, Any]]],
     status_value: str = "",
-) -> str | None:
-    """Update MongoDB task collection entry with notes and selection status entered via
-    dcc.Textarea and dcc.sDropdown resp.
+) -> dict[str, Any] | None:
+    """Queue an update of the MongoDB task collection entry with notes and selection
+    status entered via dcc.Textarea and dcc.Dropdown resp. Returns the write ID whose
+    outcome show_write_status() polls for.
     """
     context = dash.callback_context.triggered[0]["prop_id"].split(".")[0]
     # if callback was triggered by click on graph and not on save_btn click,
-    # ignore it
+    # clear the save status
     if context != save_btn.id:
         return None
 
-    data = click_data["points"][0]
-    mongo_id = ObjectId(data.get("customdata", ["missing _id"])[0])
+    _id = str(click_data["points"][0].get("customdata", ["missing _id"])[0])
 
     try:
-        payload = {"notes": notes}
-        if status_value:
-            payload[Key.selection_status] = status_value
-        db.tasks.update_one({"_id": mongo_id}, {"$set": payload})
-    except ValueError as err:
+        ObjectId(_id)  # validate before queueing the write
+    except InvalidId as err:
         print(f"{err=}")
-        return f"{err}"
+        return {"error": f"{err}"}
+
+    payload = {"notes": notes}
+    if status_value:
+        payload[Key.selection_status] = status_value
+    # update the cached notes right away, Mongo is updated by db_writer in the
+    # background which invalidates them again if the write fails
+    with doc_cache_lock:
+        notes_cache[_id] = notes_cache.get(_id, {}) | payload
+    write_id = next(write_ids)
+    write_queue.put((write_id, _id, payload))
+
+    return {"write_id": write_id}
+
 
-    return "saved"
+@app.callback(
+    Output(span, "children"),
+    Output(span, "style"),
+    Output(write_poll, "disabled"),
+    Input(write_poll, "n_intervals"),
+    Input(pending_write, "data"),
+)
+def show_write_status(
+    n_intervals: int,  # noqa: ARG001
+    write: dict[str, Any] | None,
+) -> tuple[str, dict[str, str], bool]:
+    """Show whether the last note edit was saved, polling while its write is queued."""
+    if not write:
+        return "", {"color": "green"}, True
+    if "write_id" not in write:
+        return write["error"], {"color": "red"}, True
+    if write["write_id"] not in write_results:
+        return "saving...", {"color": "gray"}, False
+    if error := write_results[write["write_id"]]:
+        return error, {"color": "red"}, True
+    return "saved", {"color": "green"}, True
+
+
+@app.callback(
+    Output(graph, "figure"),
+    Output(view_state, "data"),
+    Input(graph, "restyleData"),
+    Input(graph, "relayoutData"),
+    State(view_state, "data"),
+)
+def serve_traces(
+    restyle_data: list[Any] | None,
+    relayout_data: dict[str, Any] | None,
+    state: dict[str, Any],
+) -> tuple[Patch, dict[str, Any]]:
+    """Fill in trace data when a hidden trace is toggled via its legend item and
+    re-downsample large visible traces to the viewport after zooming/panning.
+    """
+    patched_fig, to_serve = Patch(), set()
+    visible = set(state["visible"])
+    trigger = dash.callback_context.triggered[0]["prop_id"].split(".")[-1]
+
+    if trigger == "restyleData" and restyle_data:
+        changes, trace_indices = restyle_data
+        for idx, is_visible in zip(
+            trace_indices, changes.get("visible", []), strict=False
+        ):
+            if is_visible is True:
+                to_serve.add(idx)
+                visible.add(idx)
+            else:
+                visible.discard(idx)
+
+    elif trigger == "relayoutData" and relayout_data:
+        for axis in ("x", "y"):
+            if relayout_data.get(f"{axis}axis.autorange"):
+                state[f"{axis}_range"] = None
+            elif f"{axis}axis.range[0]" in relayout_data:
+                state[f"{axis}_range"] = [
+                    relayout_data[f"{axis}axis.range[{idx}]"] for idx in (0, 1)
+                ]
+        to_serve = {
+            idx
+            for idx in visible
+            if is_downsamplable(trace := trace_store[idx])
+            and len(trace.x) > max_points_per_trace
+        }
+
+    for idx in to_serve:
+        trace_data = viewport_trace_data(idx, state["x_range"], state["y_range"])
+        for attr, vals in trace_data.items():
+            patched_fig["data"][idx][attr] = vals
+
+    return patched_fig, state | {"visible": sorted(visible)}
 
 
 @app.callback(Output(structure_component.id(), "data"), Input(graph, "clickData"))
 def update_structure(
     click_data: dict[str, list[dict[str, Any]]],
 ) -> Structure | None:
-    """Update StructureMoleculeComponent with pymatgen structure from MongoDB task
-    collection when user clicks on new scatter point.
+    """Update StructureMoleculeComponent with pymatgen structure from the doc cache
+    when user clicks on new scatter point.
     """
     data = click_data["points"][0]
-    _id = data.get("customdata", ["missing _id"])[0]
+    _id = str(data.get("customdata", ["missing _id"])[0])
 
     try:
-        if _id.startswith("mp"):
-            from pymatgen.ext.matproj import MPRester  # noqa: PLC0415
-
-            structure = MPRester().get_structure_by_material_id(_id)
-        else:
-            dct = db.tasks.find_one({"_id": ObjectId(_id)}, ["output.structure"]) or {}
-            structure = dct["output"][Key.structure]
-    except (InvalidId, ValueError) as err:
+        structure = get_task_doc(_id)[Key.structure]
+    except (InvalidId, ValueError, KeyError) as err:
         # if we can't fetch a structure in try block, print error and return None to
         # empty scene
         print(f"{err=}")
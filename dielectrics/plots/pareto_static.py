@@ -1,23 +1,27 @@
 # %%
-import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
-import plotly.express as px
 import pymatviz as pmv
 import seaborn as sns
 from matplotlib.patches import Patch
 from pymatgen.util.string import htmlify
 
 from dielectrics import DATA_DIR, PAPER_FIGS, Key, SelectionStatus, today
+from dielectrics.datasets import read_dataset
 from dielectrics.db.fetch_data import df_diel_from_task_coll
 
+# side-effect import sets plotly template and plt.rc
+from dielectrics.plots import plt, px
+
 
 __author__ = "Janosh Riebesell"
 __date__ = "2022-03-02"
 
 
 # %%
-df_mp = pd.read_json(f"{DATA_DIR}/mp-exploration/mp-diel-train.json.bz2")
+df_mp = read_dataset(
+    "mp-exploration/mp-diel-train", columns=[Key.diel_total_mp, Key.bandgap_mp]
+)
 
 # discard negative and unrealistically large dielectric constants
 df_mp = df_mp.query(f"0 < {Key.diel_total_mp} < 2000")
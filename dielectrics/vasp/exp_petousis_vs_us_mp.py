@@ -19,11 +19,11 @@ import plotly.express as px
 import pymatviz as pmv
 import scipy.stats
 from adjustText import adjust_text
-from matbench_discovery.structure.prototype import get_protostructure_label
 from mp_api.client import MPRester
 
 from dielectrics import DATA_DIR, PAPER_FIGS, Key
 from dielectrics.db.fetch_data import df_diel_from_task_coll
+from dielectrics.ml.wren.protostructure import get_protostructure_labels
 from dielectrics.plots import plt  # side-effect import sets plotly template and plt.rc
 
 
@@ -81,9 +81,7 @@ df_exp["n_elems"] = df_exp[struct_col].map(lambda x: len(x.composition))
 df_exp[Key.n_sites] = df_exp[struct_col].map(len)
 df_exp[Key.spg] = df_exp[struct_col].map(lambda x: x.get_space_group_info())
 
-df_exp[Key.wyckoff] = [
-    get_protostructure_label(struct) for struct in df_exp[struct_col]
-]
+df_exp[Key.wyckoff] = get_protostructure_labels(df_exp[struct_col])
 
 
 # %%
@@ -1,13 +1,13 @@
 # %%
 import os
 
-import matplotlib.pyplot as plt
 import pandas as pd
 import pymatviz as pmv
 import seaborn as sns
 
 from dielectrics import DATA_DIR, PAPER_FIGS, Key
 from dielectrics.db.fetch_data import df_diel_from_task_coll
+from dielectrics.plots import plt  # side-effect import sets plotly template and plt.rc
 
 
 __author__ = "Janosh Riebesell"
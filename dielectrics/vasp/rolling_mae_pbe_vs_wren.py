@@ -2,11 +2,11 @@
 import os
 
 import pandas as pd
-import plotly.express as px
 import pymatviz as pmv
 
 from dielectrics import PAPER_FIGS, Key
 from dielectrics.db.fetch_data import df_diel_from_task_coll
+from dielectrics.plots import px  # side-effect import sets plotly template and plt.rc
 
 
 __author__ = "Janosh Riebesell"
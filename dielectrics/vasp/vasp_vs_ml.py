@@ -1,12 +1,13 @@
 # %%
-import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 import pymatviz as pmv
 from sklearn.metrics import r2_score
 
 from dielectrics import DATA_DIR, PAPER_FIGS, Key
+from dielectrics.datasets import read_dataset
 from dielectrics.db.fetch_data import df_diel_from_task_coll
+from dielectrics.plots import plt  # side-effect import sets plotly template and plt.rc
 
 
 expt = "enrich-big"  # one of enrich-small|enrich-big or train/screen
@@ -17,13 +18,13 @@ expt = "enrich-big"  # one of enrich-small|enrich-big or train/screen
 
 
 # %%
-df_diel_train = pd.read_json(
-    f"{DATA_DIR}/mp-exploration/mp-diel-{expt}-train.json.bz2"
-).rename(columns={"band_gap": Key.bandgap_mp})
+df_diel_train = read_dataset(f"mp-exploration/mp-diel-{expt}-train").rename(
+    columns={"band_gap": Key.bandgap_mp}
+)
 
-df_diel_screen = pd.read_json(
-    f"{DATA_DIR}/mp-exploration/mp-diel-{expt}-test.json.bz2"
-).rename(columns={"band_gap": Key.bandgap_mp})
+df_diel_screen = read_dataset(f"mp-exploration/mp-diel-{expt}-test").rename(
+    columns={"band_gap": Key.bandgap_mp}
+)
 
 
 # %%
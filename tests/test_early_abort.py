@@ -0,0 +1,210 @@
+import gzip
+import os
+from pathlib import Path
+from typing import Any
+from unittest.mock import MagicMock
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from dielectrics.db.early_abort import (
+    assess_launch_dir,
+    check_std_err,
+    check_vasp_out,
+    defuse_doomed_wfs,
+    fom_upper_bound,
+    parse_vasp_out,
+    tracked_tail_lines,
+)
+
+
+# launch dirs with vasp.out/std_err.txt of relaxations as written by VASP 5.4.4
+fixture_dir = f"{os.path.dirname(__file__)}/fixtures/early_abort"
+
+
+def read_vasp_out(name: str) -> str:
+    path = f"{fixture_dir}/{name}/vasp.out"
+    if os.path.isfile(path):
+        with open(path) as file:
+            return file.read()
+    with gzip.open(f"{path}.gz", mode="rt") as file:
+        return file.read()
+
+
+def tail(text: str, nlines: int) -> str:
+    """What add_trackers stores in launch docs: the last nlines lines of a file."""
+    return "".join(text.splitlines(keepends=True)[-nlines:])
+
+
+def test_parse_vasp_out_converging() -> None:
+    parsed = parse_vasp_out(read_vasp_out("converging"))
+
+    assert parsed["ionic_steps"] == list(range(1, 9))
+    assert parsed["energies"][0] == pytest.approx(-39.987051)
+    assert parsed["energies"][-1] == pytest.approx(-40.009537)
+    assert (np.diff(parsed["energies"]) < 0).all()
+    # file ends on an ionic step, no SCF steps of a next one yet
+    assert parsed["n_scf_current"] == 0
+
+
+def test_parse_vasp_out_keeps_last_relaxation_only() -> None:
+    parsed = parse_vasp_out(read_vasp_out("double_relax"))
+
+    assert parsed["ionic_steps"] == [1, 2, 3]
+    assert parsed["energies"] == pytest.approx([-20.802113, -20.809874, -20.811207])
+
+
+def test_parse_vasp_out_counts_scf_steps_of_current_ionic_step() -> None:
+    parsed = parse_vasp_out(read_vasp_out("scf_unconverged"))
+
+    assert parsed["ionic_steps"] == [1, 2]
+    assert parsed["n_scf_current"] == 120
+
+
+def test_parse_vasp_out_empty() -> None:
+    parsed = parse_vasp_out("")
+
+    assert parsed["ionic_steps"] == []
+    assert len(parsed["energies"]) == 0
+    assert parsed["n_scf_current"] == 0
+
+
+@pytest.mark.parametrize("name", ["converging", "double_relax"])
+def test_check_vasp_out_healthy(name: str) -> None:
+    assert check_vasp_out(read_vasp_out(name)) == []
+
+
+def test_check_vasp_out_diverging() -> None:
+    reasons = check_vasp_out(read_vasp_out("diverging"))
+
+    assert reasons == [
+        "energy rose 1.59 eV above its minimum",
+        "energy rose in each of the last 5 ionic steps",
+    ]
+
+
+def test_check_vasp_out_diverging_tracker_tail() -> None:
+    # the tracked tail must hold n_rising + 1 ionic steps of a struggling relaxation,
+    # 100 lines only cover the last 4 here
+    vasp_out = read_vasp_out("diverging")
+    rising_reason = "energy rose in each of the last 5 ionic steps"
+
+    assert rising_reason not in check_vasp_out(tail(vasp_out, 100))
+    assert rising_reason in check_vasp_out(tail(vasp_out, tracked_tail_lines))
+
+
+def test_check_vasp_out_thresholds() -> None:
+    vasp_out = read_vasp_out("diverging")
+
+    assert check_vasp_out(vasp_out, energy_rise_tol=2, n_rising=7) == []
+    assert check_vasp_out(vasp_out, max_ionic_steps=8, energy_rise_tol=2)[0] == (
+        "10 ionic steps > 8"
+    )
+    assert check_vasp_out(read_vasp_out("scf_unconverged")) == [
+        "SCF not converged after 120 steps"
+    ]
+    assert check_vasp_out(read_vasp_out("scf_unconverged"), max_scf_steps=121) == []
+
+
+def test_check_std_err() -> None:
+    with open(f"{fixture_dir}/segfault/std_err.txt") as file:
+        std_err = file.read()
+
+    assert check_std_err(std_err) == [
+        "std_err: segfault",
+        "std_err: fortran runtime error",
+    ]
+    assert check_std_err("") == []
+
+
+@pytest.mark.parametrize(
+    ("name", "expected"),
+    [
+        ("converging", []),
+        ("double_relax", []),
+        # reads vasp.out.gz
+        (
+            "diverging",
+            [
+                "energy rose 1.59 eV above its minimum",
+                "energy rose in each of the last 5 ionic steps",
+            ],
+        ),
+        ("scf_unconverged", ["SCF not converged after 120 steps"]),
+        ("segfault", ["std_err: segfault", "std_err: fortran runtime error"]),
+    ],
+)
+def test_assess_launch_dir(name: str, expected: list[str]) -> None:
+    assert assess_launch_dir(f"{fixture_dir}/{name}") == expected
+
+
+def test_assess_launch_dir_missing_files(tmp_path: Path) -> None:
+    assert assess_launch_dir(str(tmp_path)) == []
+
+
+def test_fom_upper_bound() -> None:
+    bandgap = pd.Series([2.0, -0.1, 1.5, 3.0])
+    diel_total = pd.Series([20.0, 50.0, 10.0, 40.0])
+    diel_total_std = pd.Series([5.0, 5.0, np.nan, 0.0])
+
+    bound = fom_upper_bound(bandgap, diel_total, diel_total_std, n_std=2)
+
+    # negative band gaps count as 0, missing stds as 0
+    assert bound.tolist() == pytest.approx([60.0, 0.0, 15.0, 120.0])
+    assert fom_upper_bound(bandgap, diel_total, diel_total_std, n_std=0).tolist() == (
+        pytest.approx([40.0, 0.0, 15.0, 120.0])
+    )
+
+
+@pytest.fixture
+def launchpad() -> MagicMock:
+    """LaunchPad with two workflows backed by in-memory 'workflows' and 'fireworks'
+    collections. defuse_fw/defuse_wf/rerun_fw are mocks that record calls.
+    """
+    fw_states = {
+        # workflow 1: relaxation done, DFPT pending
+        1: "COMPLETED",
+        2: "READY",
+        # workflow 2: relaxation running, DFPT waiting on it, one fizzled attempt
+        3: "RUNNING",
+        4: "WAITING",
+        5: "FIZZLED",
+    }
+    wf_nodes = [[1, 2], [3, 4, 5]]
+
+    def find_wf(query: dict[str, Any], _projection: list[str]) -> dict[str, Any]:
+        return next({"nodes": nodes} for nodes in wf_nodes if query["nodes"] in nodes)
+
+    def find_fws(query: dict[str, Any], _projection: list[str]) -> list[dict]:
+        return [
+            {"fw_id": fw_id}
+            for fw_id, state in fw_states.items()
+            if fw_id in query["fw_id"]["$in"] and state in query["state"]["$in"]
+        ]
+
+    lpad = MagicMock()
+    lpad.workflows.find_one.side_effect = find_wf
+    lpad.fireworks.find.side_effect = find_fws
+    return lpad
+
+
+def test_defuse_doomed_wfs_skips_started_fws(launchpad: MagicMock) -> None:
+    defused = defuse_doomed_wfs(launchpad, [2, 3, 3], dry_run=False)
+
+    assert defused == [2, 4]
+    assert [call.args for call in launchpad.defuse_fw.call_args_list] == [(2,), (4,)]
+    # COMPLETED, RUNNING and FIZZLED Fireworks must never be rerun or defused
+    launchpad.rerun_fw.assert_not_called()
+    launchpad.defuse_wf.assert_not_called()
+
+
+def test_defuse_doomed_wfs_dry_run(launchpad: MagicMock, tmp_path: Path) -> None:
+    defused = defuse_doomed_wfs(launchpad, [4], stop_running_dirs=[str(tmp_path)])
+
+    assert defused == [4]
+    launchpad.defuse_fw.assert_not_called()
+    assert not (tmp_path / "STOPCAR").exists()
+
+    defuse_doomed_wfs(launchpad, [4], stop_running_dirs=[str(tmp_path)], dry_run=False)
+    assert (tmp_path / "STOPCAR").read_text() == "LABORT = .TRUE.\n"
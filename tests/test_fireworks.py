@@ -0,0 +1,86 @@
+import os
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from dielectrics import fireworks
+from dielectrics.fireworks import round_floats_in_csvs
+
+
+csv_text = """material_id,n_sites,diel_total,formula
+mp-1,1,12.345678,Si
+mp-2,2,1.5,
+mp-3,,2.0,GaAs
+mp-4,4,3,MgO
+mp-5,5,4,BaTiO3
+"""
+
+
+@pytest.mark.parametrize("chunksize", [2, 100])
+def test_round_floats_in_csvs_consistent_across_chunks(
+    tmp_path: Path, chunksize: int
+) -> None:
+    csv = tmp_path / "preds.csv"
+    csv.write_text(csv_text)
+
+    errors = round_floats_in_csvs(
+        f"{tmp_path}/*.csv",
+        chunksize=chunksize,
+        n_workers=1,
+        to_parquet=True,
+        manifest_path=f"{tmp_path}/manifest.json",
+    )
+
+    assert errors == {}
+    # integer column with a missing value stays integer, float column stays float
+    # even in chunks where all its values look like integers
+    assert csv.read_text() == (
+        "material_id,n_sites,diel_total,formula\n"
+        "mp-1,1,12.3457,Si\nmp-2,2,1.5,\nmp-3,,2.0,GaAs\n"
+        "mp-4,4,3.0,MgO\nmp-5,5,4.0,BaTiO3\n"
+    )
+    df_parquet = pd.read_parquet(tmp_path / "preds.parquet")
+    assert df_parquet.index.name == "material_id"
+    assert df_parquet["n_sites"].dtype == "Int64"
+    assert df_parquet["diel_total"].tolist() == [12.3457, 1.5, 2.0, 3.0, 4.0]
+
+
+def test_round_floats_in_csvs_manifest_skips_unchanged(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    csv = tmp_path / "preds.csv"
+    csv.write_text(csv_text)
+    kwargs = dict(n_workers=1, manifest_path=f"{tmp_path}/manifest.json")
+
+    round_floats_in_csvs(f"{tmp_path}/*.csv", **kwargs)
+    rounded = csv.read_text()
+
+    hashed: list[str] = []
+    file_hash = fireworks._file_hash  # noqa: SLF001
+
+    def spy_hash(path: str) -> str:
+        hashed.append(path)
+        return file_hash(path)
+
+    monkeypatch.setattr(fireworks, "_file_hash", spy_hash)
+    round_csv = fireworks._round_csv  # noqa: SLF001
+    monkeypatch.setattr(
+        fireworks, "_round_csv", lambda *_, **__: pytest.fail("re-rounded")
+    )
+
+    # unchanged size and mtime: skipped without hashing
+    round_floats_in_csvs(f"{tmp_path}/*.csv", **kwargs)
+    assert hashed == []
+
+    # touched but same content: hashed once, then skipped by stat again
+    os.utime(csv, ns=(0, 0))
+    round_floats_in_csvs(f"{tmp_path}/*.csv", **kwargs)
+    round_floats_in_csvs(f"{tmp_path}/*.csv", **kwargs)
+    assert hashed == [str(csv)]
+
+    # new content is rounded again
+    monkeypatch.setattr(fireworks, "_round_csv", round_csv)
+    csv.write_text(csv_text)
+    round_floats_in_csvs(f"{tmp_path}/*.csv", **kwargs)
+    assert csv.read_text() == rounded
@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+from scipy.constants import angstrom, e, epsilon_0
+
+from dielectrics.phonons import ph_freqs_from_dyn_mat_evs, vasp_to_THz
+from dielectrics.phonons.mode_decomposition import ionic_mode_contribs
+
+
+def random_dfpt_outputs(
+    n_sites: int, seed: int = 0
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Force constants (eV/Å^2), Born charges (e), masses (amu) and volume (Å^3) of a
+    fake stable crystal obeying the acoustic sum rules.
+    """
+    rng = np.random.default_rng(seed)
+    n_dof = 3 * n_sites
+    # positive definite matrix projected onto the complement of rigid translations
+    mat = rng.normal(size=(n_dof, n_dof))
+    translations = np.tile(np.eye(3), (n_sites, 1)) / np.sqrt(n_sites)
+    proj = np.eye(n_dof) - translations @ translations.T
+    force_consts = proj @ (mat @ mat.T + n_dof * np.eye(n_dof)) @ proj
+
+    born = rng.normal(size=(n_sites, 3, 3))
+    born -= born.mean(axis=0)  # charge neutrality
+    masses = rng.uniform(10, 200, size=n_sites)
+    volume = 20.0 * n_sites
+    return force_consts, born, masses, volume
+
+
+def test_vasp_to_thz() -> None:
+    # phonopy's VaspToTHz
+    assert vasp_to_THz == pytest.approx(15.633302, rel=1e-6)
+    # VASP writes stable modes as negative eigenvalues
+    assert ph_freqs_from_dyn_mat_evs([-4.0, 0.0, 1.0]) == pytest.approx(
+        [2 * vasp_to_THz, 0.0, -vasp_to_THz]
+    )
+
+
+@pytest.mark.parametrize("n_sites", [2, 5])
+def test_ionic_mode_contribs_sum_to_static_diel_ionic(n_sites: int) -> None:
+    force_consts, born, masses, volume = random_dfpt_outputs(n_sites)
+
+    # DFPT's static ε_ionic = e^2/(ε_0 Ω) Z^T Φ^+ Z, independent of phonon frequencies
+    z_mat = born.transpose(0, 2, 1).reshape(3 * n_sites, 3)  # (κ j, i)
+    diel_tensor = z_mat.T @ np.linalg.pinv(force_consts) @ z_mat
+    diel_ionic = e / (epsilon_0 * volume * angstrom) * np.trace(diel_tensor) / 3
+
+    # normal modes as written to vasprun.xml: eigenpairs of the mass-weighted
+    # dynamical matrix (eV/Å^2/amu) with flipped sign
+    inv_sqrt_m = np.repeat(masses, 3) ** -0.5
+    dyn_mat = force_consts * np.outer(inv_sqrt_m, inv_sqrt_m)
+    eigen_vals, eigen_vecs = np.linalg.eigh(dyn_mat)
+    ph_freqs = ph_freqs_from_dyn_mat_evs(-eigen_vals)
+
+    contribs = ionic_mode_contribs(
+        ph_freqs[None],
+        eigen_vecs.T.reshape(1, 3 * n_sites, n_sites, 3),
+        born[None],
+        masses[None],
+        np.array([volume]),
+    )
+
+    assert contribs.shape == (1, 3 * n_sites)
+    assert (contribs >= 0).all()
+    # 3 acoustic modes don't contribute
+    assert (contribs == 0).sum() >= 3
+    assert contribs.sum() == pytest.approx(diel_ionic, rel=1e-6)